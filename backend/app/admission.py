@@ -0,0 +1,141 @@
+# =================================================================
+# Vira Engine - Admission Control
+# =================================================================
+# Purpose: Bound the analysis work a worker accepts, so a traffic spike
+# is turned away quickly instead of piling up behind Gemini until every
+# client times out at once.
+#
+# Semantics:
+# - At most `max_in_flight` analyses run at a time
+# - Up to `max_queue` more wait for a slot, first come first served,
+#   each until its own deadline
+# - A request that finds the queue full is rejected at once (429); one
+#   whose deadline passes while queued is rejected then (503). Both
+#   carry a Retry-After estimate from recent analysis durations.
+# - Only the Gemini half of an analysis goes through here (see
+#   `run_admitted_analysis` in api.py); cached and pre-screened reports,
+#   /health and the other cheap endpoints never wait behind it
+# =================================================================
+
+import os
+import math
+import time
+import asyncio
+from collections import deque
+
+from executors import ANALYSIS_MAX_WORKERS
+
+# Analyses running at once in this worker (defaults to the analysis pool size)
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv('VERA_ADMISSION_MAX_IN_FLIGHT', str(ANALYSIS_MAX_WORKERS)))
+# Analyses allowed to wait for a slot
+ADMISSION_MAX_QUEUE = int(os.getenv('VERA_ADMISSION_MAX_QUEUE', '32'))
+# Longest a request waits for a slot (clients may ask for less)
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv('VERA_ADMISSION_QUEUE_TIMEOUT_SECONDS', '10'))
+# Bounds of the Retry-After hint
+RETRY_AFTER_MIN_SECONDS = 1
+RETRY_AFTER_MAX_SECONDS = 60
+
+
+class AdmissionRejected(Exception):
+    """No capacity for the request; carries the HTTP status and a Retry-After hint."""
+
+    def __init__(self, reason: str, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class AdmissionController:
+    """Caps concurrent analyses with a bounded FIFO wait queue and per-request deadlines."""
+
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters = deque()  # futures of queued requests, oldest first
+        self._average_seconds = None  # moving average of admitted work durations
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "deadline": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: queued work ahead, spread over the slots."""
+        average = self._average_seconds or 1.0
+        estimate = average * (self.queue_depth + 1) / self.max_in_flight
+        return int(min(RETRY_AFTER_MAX_SECONDS, max(RETRY_AFTER_MIN_SECONDS, math.ceil(estimate))))
+
+    def _reject(self, reason: str, status_code: int, detail: str):
+        self.rejected[reason] += 1
+        return AdmissionRejected(reason, status_code, self.retry_after(), detail)
+
+    def check(self):
+        """Raises AdmissionRejected if a request arriving now would be turned away at once."""
+        if self.in_flight >= self.max_in_flight and self.queue_depth >= self.max_queue:
+            raise self._reject("queue_full", 429, "Too many analyses in progress, try again later")
+
+    async def acquire(self, timeout: float = None):
+        """Waits for a slot for at most `timeout` seconds (capped by the queue timeout)."""
+        if self.in_flight < self.max_in_flight and not self.queue_depth:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        self.check()
+        timeout = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on.
+                self._release_slot()
+            else:
+                waiter.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject("deadline", 503, f"No analysis capacity within {timeout:g}s, try again later")
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+
+    def _release_slot(self):
+        # Hand the slot straight to the oldest waiter, so in_flight never
+        # dips below the cap while requests are queued.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def release(self, duration: float = None):
+        if duration is not None:
+            self._average_seconds = duration if self._average_seconds is None else (
+                0.8 * self._average_seconds + 0.2 * duration
+            )
+        self._release_slot()
+
+    async def run(self, coroutine_factory, timeout: float = None):
+        """Runs `coroutine_factory()` once admitted; raises AdmissionRejected if not."""
+        await self.acquire(timeout)
+        started = time.perf_counter()
+        try:
+            return await coroutine_factory()
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
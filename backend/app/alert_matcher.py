@@ -0,0 +1,252 @@
+# =================================================================
+# Vira Engine - Gazette Alert Matcher
+# =================================================================
+# Purpose: This module finds the gazette alerts that mention a property
+# owner. Instead of scanning every alert (or running an unanchored
+# $regex in MongoDB), alerts are indexed once into a token inverted
+# index with positions, and an owner name is matched as a phrase.
+#
+# Key Features:
+# - Case-insensitive whole-word phrase matching on headline and summary
+# - Query cost proportional to the owner name's postings, not the corpus
+# - Incremental updates as new alerts arrive, and periodic full rebuilds
+#   that pick up edited and deleted alerts
+# - Regex metacharacters in owner names are treated as plain text
+# =================================================================
+
+import re
+import time
+import threading
+
+from observability import get_logger
+
+logger = get_logger("alert_matcher")
+
+# Alert fields that are searched for owner names.
+MATCH_FIELDS = ("headline", "summary")
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list:
+    """Splits text into lowercase word tokens."""
+    if not text:
+        return []
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class AlertMatcher:
+    """
+    Token inverted index over gazette alerts.
+
+    Postings map a token to {(doc_number, field_number): [positions]}.
+    A phrase query starts from the rarest query token and only checks the
+    candidate fields listed in its postings.
+    """
+
+    def __init__(self, alerts=None):
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._alerts = {}        # doc_number -> alert
+        self._doc_numbers = {}   # alert_id -> doc_number
+        self._doc_tokens = {}    # doc_number -> set of tokens (for removal)
+        self._next_doc = 0
+        if alerts:
+            self.add_alerts(alerts)
+
+    def __len__(self):
+        return len(self._alerts)
+
+    def add_alert(self, alert: dict):
+        """Indexes a single alert. Re-adding an alert_id replaces the old entry."""
+        with self._lock:
+            alert_id = alert.get('alert_id')
+            if alert_id in self._doc_numbers:
+                self._remove(self._doc_numbers.pop(alert_id))
+
+            doc_number = self._next_doc
+            self._next_doc += 1
+            self._alerts[doc_number] = alert
+            if alert_id is not None:
+                self._doc_numbers[alert_id] = doc_number
+
+            doc_tokens = set()
+            for field_number, field in enumerate(MATCH_FIELDS):
+                for position, token in enumerate(tokenize(alert.get(field, ''))):
+                    self._postings.setdefault(token, {}).setdefault((doc_number, field_number), []).append(position)
+                    doc_tokens.add(token)
+            self._doc_tokens[doc_number] = doc_tokens
+
+    def add_alerts(self, alerts):
+        """Indexes several alerts."""
+        with self._lock:
+            for alert in alerts:
+                self.add_alert(alert)
+
+    def _remove(self, doc_number: int):
+        self._alerts.pop(doc_number, None)
+        for token in self._doc_tokens.pop(doc_number, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            for field_number in range(len(MATCH_FIELDS)):
+                postings.pop((doc_number, field_number), None)
+            if not postings:
+                del self._postings[token]
+
+    def _match_doc_numbers(self, name: str) -> list:
+        tokens = tokenize(name)
+        if not tokens:
+            return []
+        token_postings = []
+        for token in tokens:
+            postings = self._postings.get(token)
+            if not postings:
+                return []
+            token_postings.append(postings)
+
+        # Drive the search from the rarest token in the phrase.
+        anchor = min(range(len(tokens)), key=lambda i: len(token_postings[i]))
+        matches = set()
+        for key, anchor_positions in token_postings[anchor].items():
+            if key[0] in matches:
+                continue
+            for anchor_position in anchor_positions:
+                start = anchor_position - anchor
+                if start < 0:
+                    continue
+                if all(
+                    start + offset in token_postings[offset].get(key, ())
+                    for offset in range(len(tokens)) if offset != anchor
+                ):
+                    matches.add(key[0])
+                    break
+        return sorted(matches)
+
+    def match(self, name: str) -> list:
+        """Returns the alert_ids of alerts whose headline or summary contains the name."""
+        with self._lock:
+            return [self._alerts[n].get('alert_id') for n in self._match_doc_numbers(name)]
+
+    def match_alerts(self, name: str) -> list:
+        """Returns the alert documents whose headline or summary contains the name."""
+        with self._lock:
+            return [self._alerts[n] for n in self._match_doc_numbers(name)]
+
+    def get_alert(self, alert_id: str):
+        """Returns the indexed alert for an alert_id, or None."""
+        with self._lock:
+            doc_number = self._doc_numbers.get(alert_id)
+            return None if doc_number is None else self._alerts.get(doc_number)
+
+
+class CollectionAlertMatcher(AlertMatcher):
+    """
+    AlertMatcher kept in sync with a MongoDB collection.
+
+    New alerts are pulled incrementally using the `_id` of the last alert
+    seen as a watermark, at most once every `sync_interval` seconds. The
+    `_id` watermark cannot see edits to existing alerts, so every
+    `rebuild_interval` seconds the index is rebuilt from a full scan
+    (swapped in at once; matches keep using the old index meanwhile).
+
+    `start()` runs the syncs in a background thread; once it has built the
+    index, request handlers leave syncing to it (see `maintained`).
+    """
+
+    PROJECTION = {"alert_id": 1, "date": 1, "source": 1, "category": 1, "headline": 1, "summary": 1}
+
+    def __init__(self, sync_interval: float = 30.0, rebuild_interval: float = 600.0):
+        super().__init__()
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self._last_id = None
+        self._last_sync = 0.0
+        self._last_rebuild = None
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def maintained(self) -> bool:
+        """
+        True while a background thread keeps the index in sync and has built
+        it. Until the first build (e.g. MongoDB was down at boot) callers
+        still need to sync themselves.
+        """
+        return self._thread is not None and self._last_rebuild is not None
+
+    def _rebuild_due(self) -> bool:
+        return self._last_rebuild is None or (
+            self.rebuild_interval > 0 and time.monotonic() - self._last_rebuild >= self.rebuild_interval
+        )
+
+    def rebuild(self, collection) -> int:
+        """Re-indexes every alert in the collection. Returns how many were indexed."""
+        with self._sync_lock:
+            return self._rebuild(collection)
+
+    def _rebuild(self, collection) -> int:
+        alerts = list(collection.find({}, self.PROJECTION).sort("_id", 1))
+        fresh = AlertMatcher(alerts)
+        with self._lock:
+            self._postings = fresh._postings
+            self._alerts = fresh._alerts
+            self._doc_numbers = fresh._doc_numbers
+            self._doc_tokens = fresh._doc_tokens
+            self._next_doc = fresh._next_doc
+        self._last_id = alerts[-1]["_id"] if alerts else None
+        self._last_rebuild = self._last_sync = time.monotonic()
+        logger.info(f"Indexed {len(alerts)} alerts")
+        return len(alerts)
+
+    def sync(self, collection, force: bool = False) -> int:
+        """
+        Pulls alerts added since the last sync (or rebuilds the index when a
+        rebuild is due). Returns how many alerts were indexed.
+        """
+        if not force and time.monotonic() - self._last_sync < self.sync_interval:
+            return 0
+        with self._sync_lock:
+            if not force and time.monotonic() - self._last_sync < self.sync_interval:
+                return 0
+            if self._rebuild_due():
+                return self._rebuild(collection)
+            query = {} if self._last_id is None else {"_id": {"$gt": self._last_id}}
+            added = 0
+            for alert in collection.find(query, self.PROJECTION).sort("_id", 1):
+                self._last_id = alert["_id"]
+                self.add_alert(alert)
+                added += 1
+            self._last_sync = time.monotonic()
+            if added:
+                logger.info(f"Indexed {added} new alerts ({len(self)} total)")
+            return added
+
+    def start(self, get_collection):
+        """
+        Syncs now and then every `sync_interval` seconds in a background thread.
+        `get_collection()` returns the collection, or None while it is unavailable.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(get_collection,), name="vera-alert-index", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self, get_collection):
+        while True:
+            try:
+                collection = get_collection()
+                if collection is not None:
+                    self.sync(collection, force=True)
+            except Exception as e:
+                logger.warning(f"Alert index sync failed: {e}")
+            if self._stop.wait(self.sync_interval):
+                return
@@ -1,12 +1,16 @@
 # VERA AI - SPRINT 3, TASK 3.3: FULL API INTEGRATION
 # This script integrates the AI analysis and ZK simulation into the FastAPI endpoint.
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware # Import CORS middleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional
+import asyncio
+import time
 import uvicorn
-import traceback
 from datetime import datetime
-import pandas as pd
 import json
 
 # --- Import our custom modules ---
@@ -15,8 +19,28 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from main import perform_asset_analysis
-from zk_proof_simulator import generate_mock_zk_proof
+from main import (
+    prepare_asset_analysis, complete_asset_analysis, get_assets_data_bulk, get_mongodb_connection,
+    start_alert_index_sync, stop_alert_index_sync
+)
+from asset_records import is_ingestion_error
+from zk_proof_simulator import get_proof_batcher
+from responses import build_success_response
+from database import get_shared_database
+from executors import run_in_analysis_pool, run_in_io_pool, shutdown_executors
+from singleflight import SingleFlight
+from admission import AdmissionController, AdmissionRejected
+from report_cache import get_report_cache
+from proof_registry import get_proof_registry
+from refresh_service import REFRESH_ENABLED, get_refresh_service
+from owner_alert_links import OWNER_ALERT_LINKS_ENABLED, get_owner_alert_linker
+from job_queue import JOB_INPROCESS_WORKERS, JobWorker, get_job_queue, public_job
+from warmup import get_readiness
+from llm_gateway import all_llm_gateways
+from model_router import get_model_router
+from observability import HTTP_REQUEST_DURATION, REGISTRY, get_logger
+
+logger = get_logger("api")
 
 # --- Project Information ---
 DESCRIPTION = """
@@ -28,8 +52,48 @@ perform a deep analysis of off-chain data to provide a risk assessment and a
 verifiable proof hash.
 """
 
+# Serve with the offline stand-ins from stubs.py (in-memory MongoDB and a
+# fake Gemini), e.g. for load testing without quota or a database.
+OFFLINE_BACKENDS = os.getenv('VERA_OFFLINE_BACKENDS', 'false').lower() in ('1', 'true', 'yes')
+OFFLINE_LLM_LATENCY_MS = float(os.getenv('VERA_OFFLINE_LLM_LATENCY_MS', '0'))
+
+# --- Application Lifespan ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if OFFLINE_BACKENDS:
+        from stubs import install_offline_backends
+        install_offline_backends(latency_seconds=OFFLINE_LLM_LATENCY_MS / 1000)
+        logger.info(f"Serving with offline backends (simulated Gemini latency {OFFLINE_LLM_LATENCY_MS:.0f} ms)")
+    # Load data and SDKs in the background; /ready reports when it is done.
+    warmup = asyncio.ensure_future(run_in_io_pool(get_readiness().run))
+    # The warm-up builds the alert index; this thread keeps it current.
+    start_alert_index_sync()
+    if OWNER_ALERT_LINKS_ENABLED:
+        # Links alerts inserted since the last sync, off the request path.
+        get_owner_alert_linker().start(get_mongodb_connection)
+    if REFRESH_ENABLED:
+        get_refresh_service().start()
+    job_worker = None
+    if JOB_INPROCESS_WORKERS > 0:
+        job_worker = JobWorker(concurrency=JOB_INPROCESS_WORKERS)
+        job_worker.start()
+    yield
+    warmup.cancel()
+    if job_worker is not None:
+        job_worker.stop()
+    if REFRESH_ENABLED:
+        get_refresh_service().stop()
+    if OWNER_ALERT_LINKS_ENABLED:
+        get_owner_alert_linker().stop()
+    stop_alert_index_sync()
+    # Release the pooled MongoDB client and the analysis thread pools
+    # when the worker shuts down.
+    get_shared_database().close()
+    shutdown_executors()
+
 # --- Initialize the FastAPI App ---
 app = FastAPI(
+    lifespan=lifespan,
     title="Vera AI Oracle",
     description=DESCRIPTION,
     version="1.0.0", # Version bump to 1.0.0 for our first complete version
@@ -51,6 +115,163 @@ app.add_middleware(
 )
 
 
+# Concurrent requests for the same token share one analysis run.
+analysis_flights = SingleFlight()
+
+# Bounds the analyses running and waiting in this worker (see admission.py).
+analysis_admission = AdmissionController()
+
+
+def request_queue_timeout(request: Request):
+    """The client's `X-Request-Timeout-Ms` header in seconds, or None (server default)."""
+    value = request.headers.get("x-request-timeout-ms")
+    try:
+        return max(0.0, float(value) / 1000) if value else None
+    except ValueError:
+        return None
+
+
+def rejection_exception(rejection: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=rejection.status_code,
+        detail=rejection.detail,
+        headers={"Retry-After": str(rejection.retry_after)}
+    )
+
+
+async def run_admitted_analysis(token_id: str, asset_data=None, progress=None, queue_timeout: float = None) -> dict:
+    """
+    Runs `perform_asset_analysis` on the analysis pool in two halves. Only
+    the Gemini call waits for an admission slot: pre-screened and cached
+    reports are served even while the worker is at capacity.
+    """
+    final_report, investigation = await run_in_analysis_pool(prepare_asset_analysis, token_id, asset_data, progress)
+    if final_report is not None:
+        return final_report
+    return await analysis_admission.run(
+        lambda: run_in_analysis_pool(complete_asset_analysis, token_id, investigation, progress), queue_timeout
+    )
+
+
+# --- Request timing for /metrics ---
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/analyze/{token_id}), not the raw path.
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - started,
+            method=request.method, route=getattr(route, "path", "unmatched"), status=status
+        )
+
+
+def collect_component_metrics():
+    """Exposes cache, LLM, routing, coalescing and MongoDB breaker state to /metrics."""
+    cache = get_report_cache().stats()
+    cache_lookups = [
+        ({"tier": "memory", "result": "hit"}, cache["memory_hits"]),
+        ({"tier": "persistent", "result": "hit"}, cache["persistent_hits"]),
+        ({"tier": "all", "result": "miss"}, cache["misses"]),
+    ]
+    families = [
+        ("vera_report_cache_lookups_total", "counter", "Report cache lookups by tier and result",
+         [("vera_report_cache_lookups_total", labels, value) for labels, value in cache_lookups]),
+        ("vera_report_cache_hit_ratio", "gauge", "Report cache hit ratio since start",
+         [("vera_report_cache_hit_ratio", {}, cache["hit_rate"])]),
+        ("vera_report_cache_entries", "gauge", "Reports held in the in-process cache",
+         [("vera_report_cache_entries", {}, cache["entries"])]),
+    ]
+
+    llm_tokens, llm_calls, llm_limits = [], [], []
+    for gateway in all_llm_gateways():
+        stats = gateway.stats()
+        model = {"model": gateway.model_name}
+        llm_tokens.append(("vera_llm_tokens_total", dict(model, kind="prompt"), stats["prompt_tokens"]))
+        llm_tokens.append(("vera_llm_tokens_total", dict(model, kind="output"), stats["output_tokens"]))
+        for outcome in ("successes", "failures", "retries", "throttled"):
+            llm_calls.append(("vera_llm_calls_total", dict(model, outcome=outcome), stats[outcome]))
+        llm_limits.append(("vera_llm_concurrency_limit", model, stats["concurrency_limit"]))
+    families += [
+        ("vera_llm_tokens_total", "counter", "Gemini tokens used, by model and kind", llm_tokens),
+        ("vera_llm_calls_total", "counter", "Gemini call outcomes by model", llm_calls),
+        ("vera_llm_concurrency_limit", "gauge", "Current adaptive concurrency limit per model", llm_limits),
+    ]
+
+    router = get_model_router().stats()
+    families.append((
+        "vera_llm_escalations_total", "counter", "Cases escalated from the fast to the pro model, by reason",
+        [("vera_llm_escalations_total", {"reason": reason}, count)
+         for reason, count in router["escalation_reasons"].items()]
+    ))
+    families.append((
+        "vera_analysis_coalesced_total", "counter", "Requests that joined an analysis already in flight",
+        [("vera_analysis_coalesced_total", {}, analysis_flights.coalesced)]
+    ))
+    proofs = get_proof_registry().stats()
+    families.append((
+        "vera_proof_verifications_total", "counter", "Proof verifications by result",
+        [("vera_proof_verifications_total", {"result": "verified"}, proofs["verified"]),
+         ("vera_proof_verifications_total", {"result": "failed"}, proofs["mismatches"])]
+    ))
+    families.append((
+        "vera_proofs_registered_total", "counter", "Proofs added to the proof registry",
+        [("vera_proofs_registered_total", {}, proofs["registered"])]
+    ))
+    admission = analysis_admission.stats()
+    families += [
+        ("vera_admission_in_flight", "gauge", "Analyses currently admitted",
+         [("vera_admission_in_flight", {}, admission["in_flight"])]),
+        ("vera_admission_queue_depth", "gauge", "Analyses waiting for admission",
+         [("vera_admission_queue_depth", {}, admission["queue_depth"])]),
+        ("vera_admission_rejected_total", "counter", "Analyses rejected for lack of capacity, by reason",
+         [("vera_admission_rejected_total", {"reason": reason}, count)
+          for reason, count in admission["rejected"].items()]),
+    ]
+    families.append((
+        "vera_refresh_queue_depth", "gauge", "Tokens waiting for a background report refresh",
+        [("vera_refresh_queue_depth", {}, get_refresh_service().stats()["queue_depth"])]
+    ))
+    breaker = get_shared_database().breaker
+    families.append((
+        "vera_mongo_circuit_open", "gauge", "1 while the MongoDB circuit breaker is open",
+        [("vera_mongo_circuit_open", {}, 0 if breaker.allow_request() else 1)]
+    ))
+    return families
+
+
+REGISTRY.register_collector(collect_component_metrics)
+
+# Batch analysis limits
+BATCH_MAX_TOKENS = int(os.getenv('VERA_BATCH_MAX_TOKENS', '500'))
+BATCH_CONCURRENCY = int(os.getenv('VERA_BATCH_CONCURRENCY', '4'))
+
+# Batch verification limit
+VERIFY_BATCH_MAX_ITEMS = int(os.getenv('VERA_VERIFY_BATCH_MAX_ITEMS', '50000'))
+
+
+class BatchAnalysisRequest(BaseModel):
+    token_ids: List[str]
+
+
+class ProofVerificationItem(BaseModel):
+    proof_hash: str
+    report: Optional[dict] = None
+
+
+class BatchVerificationRequest(BaseModel):
+    items: List[ProofVerificationItem]
+
+
+class AnalysisJobRequest(BaseModel):
+    token_id: str
+
+
 # ========================================
 # --- API Endpoints ---
 # ========================================
@@ -62,7 +283,7 @@ async def root():
     Root endpoint to check the status of the API.
     Returns a welcome message confirming the server is running.
     """
-    print("[API] Status check endpoint was hit.")
+    logger.debug("Status check endpoint was hit.")
     return {"message": "Welcome to the Vera AI Oracle. The API is running."}
 
 # --- Health Check Endpoint for Render ---
@@ -73,6 +294,26 @@ async def health_check():
     """
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat() + "Z"}
 
+# --- Readiness Check ---
+@app.get("/ready", tags=["Status"])
+async def readiness_check():
+    """
+    Readiness probe: 200 once this worker has loaded its data, opened its
+    MongoDB pool and prepared the Gemini models, 503 while it is still
+    warming up. `/health` only says the process is alive.
+    """
+    readiness = get_readiness()
+    return JSONResponse(readiness.status(), status_code=200 if readiness.ready else 503)
+
+# --- Prometheus Metrics Endpoint ---
+@app.get("/metrics", tags=["Status"], response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics: per-stage and HTTP latency histograms, report cache
+    hit rates, fallback-path counts, LLM token usage and escalations.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # --- API Info Endpoint ---
 @app.get("/api/info", tags=["Status"])
 async def api_info():
@@ -85,7 +326,16 @@ async def api_info():
         "description": "AI-Powered Risk Oracle for Real-World Assets",
         "endpoints": {
             "analyze": "/analyze/{token_id}",
+            "analyze_batch": "/analyze/batch",
+            "analyze_stream": "/analyze/{token_id}/stream",
             "health": "/health",
+            "ready": "/ready",
+            "metrics": "/metrics",
+            "proof_batch": "/proofs/batches/{batch_id}/{leaf_index}",
+            "verify": "/verify/{proof_hash}",
+            "verify_batch": "/verify/batch",
+            "jobs_analyze": "/jobs/analyze",
+            "job_status": "/jobs/{job_id}",
             "docs": "/docs"
         }
     }
@@ -93,7 +343,7 @@ async def api_info():
 
 # --- Endpoint 2: The Main Analysis Endpoint (NOW FULLY IMPLEMENTED) ---
 @app.get("/analyze/{token_id}", tags=["Analysis"])
-async def analyze_asset(token_id: str):
+async def analyze_asset(token_id: str, request: Request):
     """
     Triggers the enhanced VERA-AI risk analysis for a given asset token ID.
     
@@ -104,36 +354,38 @@ async def analyze_asset(token_id: str):
     4. ZK-Proof Simulation
     
     Returns detailed risk assessment with scores from 15-95 based on risk category.
+    
+    When the worker is at capacity, a request that needs a Gemini call is
+    rejected with 429 (wait queue full) or 503 (no slot within the
+    deadline) and a Retry-After header; pre-screened and cached reports
+    are still served. Send `X-Request-Timeout-Ms` to wait for a slot for less than
+    the server default.
     """
-    print(f"[API] Received enhanced analysis request for token_id: {token_id}")
+    logger.info(f"Received enhanced analysis request for token_id: {token_id}")
+    get_refresh_service().record_request(token_id)
     
     try:
-        # Use the enhanced perform_asset_analysis function
-        analysis_result = perform_asset_analysis(token_id)
+        # Run the blocking analysis pipeline on the bounded analysis pool
+        # so the event loop keeps serving other requests meanwhile. If an
+        # analysis for this token is already running, wait for its result.
+        queue_timeout = request_queue_timeout(request)
+        analysis_result = await analysis_flights.do(
+            token_id, lambda: run_admitted_analysis(token_id, queue_timeout=queue_timeout)
+        )
         
         # Handle different analysis statuses
         if analysis_result.get("status") == "Success":
-            # Generate ZK-proof for successful analysis
-            mock_proof = generate_mock_zk_proof(analysis_result)
-            
-            # Create enhanced API response
-            final_response = {
-                "token_id": token_id,
-                "status": "Success",
-                "analysis_report": analysis_result,
-                "onchain_proof_simulation": mock_proof,
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-                "api_version": "2.0_enhanced"
-            }
+            final_response = build_success_response(token_id, analysis_result)
             
             # Log enhanced details
             risk_score = analysis_result.get("risk_score", "N/A")
             risk_category = analysis_result.get("risk_assessment", {}).get("risk_category", "N/A")
             data_source = analysis_result.get("risk_assessment", {}).get("data_source", "unknown")
             
-            print(f"[API] ✅ Enhanced analysis completed for {token_id}")
-            print(f"[API] Risk Score: {risk_score}/100, Category: {risk_category}")
-            print(f"[API] Data Source: {data_source}")
+            logger.info(
+                f"✅ Enhanced analysis completed for {token_id}: "
+                f"Risk Score {risk_score}/100, Category {risk_category}, Data Source {data_source}"
+            )
             
             return final_response
             
@@ -146,7 +398,7 @@ async def analyze_asset(token_id: str):
         else:
             # Partial success or failure
             error_details = analysis_result.get("details", "Analysis failed")
-            print(f"[API] ⚠️ Analysis issue for {token_id}: {error_details}")
+            logger.warning(f"⚠️ Analysis issue for {token_id}: {error_details}")
             
             raise HTTPException(
                 status_code=500,
@@ -156,16 +408,277 @@ async def analyze_asset(token_id: str):
     except HTTPException as http_exc:
         # Re-raise HTTP exceptions
         raise http_exc
+    
+    except AdmissionRejected as rejection:
+        logger.warning(f"Rejected analysis of {token_id}: {rejection.detail}")
+        raise rejection_exception(rejection)
         
     except Exception as e:
-        print(f"[API] ❌ CRITICAL ERROR in enhanced /analyze endpoint: {e}")
-        traceback.print_exc()
+        logger.exception(f"CRITICAL ERROR in enhanced /analyze endpoint: {e}")
         raise HTTPException(
             status_code=500, 
             detail=f"Internal server error during enhanced analysis: {str(e)}"
         )
 
 
+# --- Endpoint 2b: Analysis Progress Stream (Server-Sent Events) ---
+def format_sse(event: str, data: dict) -> str:
+    """Formats one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.get("/analyze/{token_id}/stream", tags=["Analysis"])
+async def analyze_asset_stream(token_id: str, request: Request):
+    """
+    Same analysis as `/analyze/{token_id}`, streamed as Server-Sent Events.
+    
+    Events (each carries `elapsed_ms` since the request started):
+    - `data_ingested`: registry record, matched alerts and deed size
+    - `prescreen_verdict`: the rules engine settled a clear-cut case without the AI
+    - `report_cached`: an identical earlier report was reused
+    - `llm_started`, `llm_token` (streamed Gemini text), `llm_completed`
+    - `llm_escalated`: the fast model's verdict was escalated to the pro model;
+      `llm_token` text that follows replaces what was streamed before
+    - `proof_generated`: the ZK-proof simulation
+    - `result`: the final response, same shape as `/analyze/{token_id}`
+    - `error`: the analysis failed (`status` is "Not Found" or "Failed"), or
+      found no capacity within the deadline (`status` "Rejected", with `retry_after`)
+    """
+    logger.info(f"Received streaming analysis request for token_id: {token_id}")
+    get_refresh_service().record_request(token_id)
+    queue_timeout = request_queue_timeout(request)
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    started = time.perf_counter()
+    
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - started) * 1000, 1)
+    
+    def progress(stage: str, data: dict):
+        # Called from the analysis thread; hand the event to the event loop.
+        data["elapsed_ms"] = elapsed_ms()
+        loop.call_soon_threadsafe(events.put_nowait, (stage, data))
+    
+    async def stream_events():
+        analysis = asyncio.ensure_future(run_admitted_analysis(token_id, None, progress, queue_timeout))
+        analysis.add_done_callback(lambda _task: events.put_nowait(None))
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield format_sse(*event)
+            
+            analysis_result = analysis.result()
+            if analysis_result.get("status") == "Success":
+                final_response = build_success_response(token_id, analysis_result)
+                yield format_sse("proof_generated", {
+                    **final_response["onchain_proof_simulation"], "elapsed_ms": elapsed_ms()
+                })
+                yield format_sse("result", {**final_response, "elapsed_ms": elapsed_ms()})
+            else:
+                yield format_sse("error", {
+                    "token_id": token_id,
+                    "status": analysis_result.get("status", "Failed"),
+                    "detail": analysis_result.get("details", "Analysis failed"),
+                    "elapsed_ms": elapsed_ms()
+                })
+        except AdmissionRejected as rejection:
+            yield format_sse("error", {
+                "token_id": token_id, "status": "Rejected", "detail": rejection.detail,
+                "retry_after": rejection.retry_after, "elapsed_ms": elapsed_ms()
+            })
+        except Exception as e:
+            logger.exception(f"Streaming analysis failed for {token_id}: {e}")
+            yield format_sse("error", {
+                "token_id": token_id, "status": "Failed", "detail": str(e), "elapsed_ms": elapsed_ms()
+            })
+    
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# --- Endpoint 3: Batch Analysis (NDJSON stream) ---
+@app.post("/analyze/batch", tags=["Analysis"])
+async def analyze_batch(request: BatchAnalysisRequest):
+    """
+    Analyzes many asset tokens in one request.
+    
+    Metadata, registry records and alerts for all tokens are fetched with
+    bulk queries, then the AI analyses run with bounded parallelism. Each
+    report is streamed back as one line of newline-delimited JSON as soon
+    as it is ready, so results arrive in completion order. A failure for
+    one token is reported on its own line and does not stop the batch;
+    tokens turned away by admission control have status "Rejected".
+    """
+    # Drop duplicates but keep the caller's order.
+    token_ids = list(dict.fromkeys(request.token_ids))
+    if not token_ids:
+        raise HTTPException(status_code=400, detail="token_ids must not be empty")
+    if len(token_ids) > BATCH_MAX_TOKENS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(token_ids)} tokens (max {BATCH_MAX_TOKENS})"
+        )
+    
+    logger.info(f"Received batch analysis request for {len(token_ids)} tokens")
+    for token_id in token_ids:
+        get_refresh_service().record_request(token_id)
+    
+    async def analyze_one(token_id: str, asset_data, semaphore: asyncio.Semaphore) -> dict:
+        try:
+            if is_ingestion_error(asset_data):
+                message = asset_data.get("message", "Ingestion failed")
+                status = "Not Found" if message == "Asset not found" else "Failed"
+                return {"token_id": token_id, "status": status, "error": message}
+            
+            async with semaphore:
+                analysis_result = await analysis_flights.do(
+                    token_id, lambda: run_admitted_analysis(token_id, asset_data)
+                )
+            if analysis_result.get("status") == "Success":
+                return build_success_response(token_id, analysis_result)
+            return {
+                "token_id": token_id,
+                "status": analysis_result.get("status", "Failed"),
+                "error": analysis_result.get("details", "Analysis failed")
+            }
+        except AdmissionRejected as rejection:
+            return {"token_id": token_id, "status": "Rejected", "error": rejection.detail,
+                    "retry_after": rejection.retry_after}
+        except Exception as e:
+            logger.exception(f"Batch analysis failed for {token_id}: {e}")
+            return {"token_id": token_id, "status": "Failed", "error": str(e)}
+    
+    async def stream_results():
+        assets = await run_in_analysis_pool(get_assets_data_bulk, token_ids)
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        tasks = [
+            asyncio.ensure_future(analyze_one(token_id, assets.get(token_id, {"error": True, "message": "Asset not found"}), semaphore))
+            for token_id in token_ids
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                yield json.dumps(result, default=str) + "\n"
+        finally:
+            # Client disconnected or the stream ended early: stop pending work.
+            for task in tasks:
+                task.cancel()
+        logger.info(f"✅ Batch analysis completed for {len(token_ids)} tokens")
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+# --- Endpoint 4: Merkle Batch Inclusion Proofs ---
+@app.get("/proofs/batches/{batch_id}/{leaf_index}", tags=["Proofs"])
+async def get_batch_inclusion_proof(batch_id: str, leaf_index: int):
+    """
+    Returns the leaf hash, batch root and inclusion path for a report that
+    joined a Merkle proof batch (the `merkle_batch` field of its proof).
+    Responds 409 while the batch is still open.
+    """
+    batch = get_proof_batcher().get_batch(batch_id)
+    if batch is None:
+        # Sealed on another worker, or no longer retained in memory here
+        batch = await run_in_io_pool(get_proof_registry().get_batch, batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired proof batch '{batch_id}'")
+    if not batch.sealed:
+        raise HTTPException(status_code=409, detail=f"Proof batch '{batch_id}' is still open")
+    try:
+        return batch.inclusion_proof(leaf_index)
+    except IndexError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+# --- Endpoint 5: Proof Verification ---
+def summarize_verifications(results: list) -> dict:
+    verified = sum(1 for result in results if result["verified"])
+    return {
+        "total": len(results),
+        "verified": verified,
+        "failed": len(results) - verified,
+        "not_registered": sum(1 for result in results if not result["registered"]),
+    }
+
+
+# Registered before /verify/{proof_hash} so "batch" is not taken as a hash.
+@app.post("/verify/batch", tags=["Proofs"])
+async def verify_proof_batch(request: BatchVerificationRequest):
+    """
+    Verifies many proofs in one call. For each item, the report's hash is
+    recomputed (or, without a report, the stored report bytes are
+    re-hashed) and compared with the registered proof hash.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="items must not be empty")
+    if len(request.items) > VERIFY_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch may contain at most {VERIFY_BATCH_MAX_ITEMS} items"
+        )
+    items = [{"proof_hash": item.proof_hash, "report": item.report} for item in request.items]
+    results = await run_in_io_pool(get_proof_registry().verify_many, items)
+    return {"summary": summarize_verifications(results), "results": results}
+
+
+@app.get("/verify/{proof_hash}", tags=["Proofs"])
+async def verify_proof(proof_hash: str):
+    """
+    Looks up a proof returned by /analyze, re-hashes the stored report and
+    returns the verification result with the proof and the report.
+    """
+    registry = get_proof_registry()
+    record = await run_in_io_pool(registry.get_record, proof_hash)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Proof '{proof_hash}' is not registered")
+    result = registry.verify_many([{"proof_hash": record["proof_hash"]}])[0]
+    result["proof"] = record["proof"]
+    result["report"] = json.loads(record["report_bytes"])
+    return result
+
+
+# --- Asynchronous Analysis Jobs ---
+@app.post("/jobs/analyze", tags=["Jobs"], status_code=202)
+async def submit_analysis_job(request: AnalysisJobRequest):
+    """
+    Queues an analysis and returns its job id at once. The analysis runs on
+    a job worker (`python app/job_queue.py worker`); poll `/jobs/{job_id}`
+    for its status and, once it succeeded, the same response as
+    `/analyze/{token_id}`. A job already queued or running for the token
+    is returned instead of queuing another.
+    """
+    token_id = request.token_id.strip()
+    if not token_id:
+        raise HTTPException(status_code=400, detail="token_id must not be empty")
+    db = await run_in_io_pool(get_mongodb_connection)
+    if db is None:
+        raise HTTPException(status_code=503, detail="The job queue is unavailable (MongoDB is not reachable)")
+    get_refresh_service().record_request(token_id)
+    job = await run_in_io_pool(get_job_queue().enqueue, db, token_id)
+    return dict(public_job(job), status_url=f"/jobs/{job['_id']}")
+
+
+@app.get("/jobs/{job_id}", tags=["Jobs"])
+async def get_analysis_job(job_id: str):
+    """
+    Returns a job's status: `queued`, `running`, `succeeded` (with `result`),
+    `failed` (with `error`; e.g. unknown token) or `dead_lettered` (every
+    attempt failed). `last_error` shows why the previous attempt failed
+    while a retry is pending.
+    """
+    db = await run_in_io_pool(get_mongodb_connection)
+    if db is None:
+        raise HTTPException(status_code=503, detail="The job queue is unavailable (MongoDB is not reachable)")
+    job = await run_in_io_pool(get_job_queue().get_job, db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return public_job(job)
+
+
 # ========================================
 # --- Main Execution Block ---
 # ========================================
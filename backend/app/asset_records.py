@@ -0,0 +1,122 @@
+# =================================================================
+# Vira Engine - Typed Ingestion Records
+# =================================================================
+# Purpose: Carry ingested asset data as compact `__slots__` records
+# holding only the fields the analysis uses, instead of whole MongoDB
+# documents (with `_id`, `created_at`, `data_source`, ...) in nested
+# dicts.
+#
+# - RegistryRecord: the land registry fields sent to the AI
+# - Alert: the gazette alert fields sent to the AI
+# - AssetBundle: everything ingested for one token
+#
+# The *_PROJECTION constants ask MongoDB for exactly these fields, so
+# the rest of each document never crosses the wire. Ingestion failures
+# stay plain {"error": True, "message": ...} dicts.
+# =================================================================
+
+REGISTRY_FIELDS = (
+    "c_of_o_id", "plot_number", "block_number", "area_name",
+    "state", "owner_name", "date_registered", "status",
+)
+ALERT_FIELDS = ("alert_id", "date", "source", "category", "headline", "summary")
+
+REGISTRY_PROJECTION = dict({field: 1 for field in REGISTRY_FIELDS}, _id=0)
+# The registry search key is one of the metadata attributes.
+METADATA_PROJECTION = {"token_id": 1, "attributes": 1, "_id": 0}
+
+
+def is_ingestion_error(asset_data) -> bool:
+    return isinstance(asset_data, dict) and bool(asset_data.get("error"))
+
+
+class RegistryRecord:
+    """The land registry fields used by the analysis (missing fields are None)."""
+    __slots__ = REGISTRY_FIELDS
+
+    def __init__(self, c_of_o_id=None, plot_number=None, block_number=None, area_name=None,
+                 state=None, owner_name=None, date_registered=None, status=None):
+        self.c_of_o_id = c_of_o_id
+        self.plot_number = plot_number
+        self.block_number = block_number
+        self.area_name = area_name
+        self.state = state
+        self.owner_name = owner_name
+        self.date_registered = date_registered
+        self.status = status
+
+    @classmethod
+    def from_document(cls, document: dict) -> "RegistryRecord":
+        get = document.get
+        return cls(get("c_of_o_id"), get("plot_number"), get("block_number"), get("area_name"),
+                   get("state"), get("owner_name"), get("date_registered"), get("status"))
+
+    def to_dict(self) -> dict:
+        return {
+            "c_of_o_id": self.c_of_o_id,
+            "plot_number": self.plot_number,
+            "block_number": self.block_number,
+            "area_name": self.area_name,
+            "state": self.state,
+            "owner_name": self.owner_name,
+            "date_registered": self.date_registered,
+            "status": self.status,
+        }
+
+
+class Alert:
+    """The gazette alert fields used by the analysis (missing fields are "N/A")."""
+    __slots__ = ALERT_FIELDS
+
+    def __init__(self, alert_id="N/A", date="N/A", source="N/A", category="N/A", headline="N/A", summary="N/A"):
+        self.alert_id = alert_id
+        self.date = date
+        self.source = source
+        self.category = category
+        self.headline = headline
+        self.summary = summary
+
+    @classmethod
+    def from_document(cls, document: dict) -> "Alert":
+        get = document.get
+        return cls(get("alert_id", "N/A"), get("date", "N/A"), get("source", "N/A"),
+                   get("category", "N/A"), get("headline", "N/A"), get("summary", "N/A"))
+
+    def to_dict(self) -> dict:
+        return {
+            "alert_id": self.alert_id,
+            "date": self.date,
+            "source": self.source,
+            "category": self.category,
+            "headline": self.headline,
+            "summary": self.summary,
+        }
+
+
+class AssetBundle:
+    """Everything ingested for one token."""
+    __slots__ = ("token_id", "registry_key", "registry", "alerts", "deed_content", "data_source")
+
+    def __init__(self, token_id: str, registry_key: str, registry: RegistryRecord, alerts: list,
+                 deed_content: str, data_source: str):
+        self.token_id = token_id
+        self.registry_key = registry_key
+        self.registry = registry
+        self.alerts = alerts
+        self.deed_content = deed_content
+        self.data_source = data_source
+
+    @classmethod
+    def from_documents(cls, token_id: str, registry_key: str, registry_document: dict, alert_documents,
+                       deed_content: str, data_source: str) -> "AssetBundle":
+        return cls(
+            token_id, registry_key,
+            RegistryRecord.from_document(registry_document),
+            [Alert.from_document(alert) for alert in alert_documents],
+            deed_content, data_source
+        )
+
+    @property
+    def deed_loaded(self) -> bool:
+        """False when no deed document was found for the token (`deed_content` is None)."""
+        return bool(self.deed_content and self.deed_content.strip())
@@ -0,0 +1,346 @@
+# =================================================================
+# Vira Engine - Streaming Bulk Loader for MongoDB
+# =================================================================
+# Purpose: Load the land registry, news alerts and property metadata
+# into MongoDB and make sure the request path's lookups are indexed.
+#
+# - Sources are streamed: JSON arrays are decoded one element at a time
+#   and CSV rows are read lazily, so memory stays bounded by the batch
+#   size rather than the file size.
+# - Documents are written in batches, either with
+#   `insert_many(ordered=False)` (fast first load; rows whose key already
+#   exists are counted as duplicates) or as unordered upserts keyed on
+#   each collection's natural key (idempotent re-runs).
+# - Unique indexes on the natural keys and a text index on the alert
+#   headline/summary are created before loading, so upserts never scan.
+# - Owner -> alert links (owner_alert_links.py) are maintained batch by
+#   batch: loaded owners get link documents and loaded alerts are linked
+#   to the owners they mention. Skip with --no-links.
+#
+# Usage:
+#   python app/bulk_loader.py                        # mongodb_ready_data exports
+#   python app/bulk_loader.py --source raw           # nigeria_demo_data CSV/JSON
+#   python app/bulk_loader.py --mode insert --drop --batch-size 5000
+#   python app/bulk_loader.py --indexes-only
+# =================================================================
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from datetime import datetime
+
+from pymongo import ASCENDING, TEXT, ReplaceOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from observability import get_logger
+
+logger = get_logger("bulk_loader")
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+READY_DATA_FOLDER = os.path.join(BACKEND_DIR, "mongodb_ready_data")
+RAW_DATA_FOLDER = os.path.join(BACKEND_DIR, "nigeria_demo_data")
+
+BULK_LOAD_BATCH_SIZE = int(os.getenv('VERA_BULK_LOAD_BATCH_SIZE', '1000'))
+DUPLICATE_KEY_ERROR = 11000
+
+# Collection -> natural key, source files and how raw rows are converted
+DATASETS = {
+    "land_registry": {
+        "key": "c_of_o_id",
+        "prepared": "land_registry_prepared.json",
+        "raw": "Nigerian_Land_Registry_Mock.csv",
+        "data_source": "Nigerian_Land_Registry_Mock",
+        "int_fields": ("plot_number", "block_number"),
+    },
+    "news_alerts": {
+        "key": "alert_id",
+        "prepared": "news_alerts_prepared.json",
+        "raw": "Nigerian_Gazette_Alerts.json",
+        "data_source": "Nigerian_Gazette_Alerts",
+    },
+    "property_metadata": {
+        "key": "token_id",
+        "prepared": "property_metadata_prepared.json",
+        "raw": "metadata",
+        "data_source": "property_metadata",
+    },
+}
+
+# Collection -> [(keys, create_index options)]
+INDEXES = {
+    "land_registry": [
+        ([("c_of_o_id", ASCENDING)], {"name": "c_of_o_id_unique", "unique": True}),
+        ([("owner_name", ASCENDING)], {"name": "owner_name"}),
+    ],
+    "news_alerts": [
+        ([("alert_id", ASCENDING)], {"name": "alert_id_unique", "unique": True}),
+        ([("headline", TEXT), ("summary", TEXT)], {"name": "alert_text", "default_language": "english"}),
+    ],
+    "property_metadata": [
+        ([("token_id", ASCENDING)], {"name": "token_id_unique", "unique": True}),
+    ],
+    "owner_alert_links": [
+        ([("alert_ids", ASCENDING)], {"name": "alert_ids"}),
+    ],
+}
+
+
+# ========================================
+# STREAMING SOURCES
+# ========================================
+def iter_json_array(path: str, chunk_size: int = 64 * 1024):
+    """Yields the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer, position, eof = "", 0, False
+
+        def refill():
+            nonlocal buffer, position, eof
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+
+        def next_char():
+            nonlocal position
+            while True:
+                while position < len(buffer) and buffer[position].isspace():
+                    position += 1
+                if position < len(buffer) or eof:
+                    return buffer[position] if position < len(buffer) else ""
+                refill()
+
+        if next_char() != "[":
+            raise ValueError(f"{path} does not contain a JSON array")
+        position += 1
+        if next_char() == "]":
+            return
+        while True:
+            if not next_char():
+                raise ValueError(f"Unexpected end of file in {path}")
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+                # A number at the very end of the buffer may continue in the next chunk.
+                truncated = end == len(buffer) and not eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                truncated = True
+            if truncated:
+                refill()
+                continue
+            yield element
+            position = end
+            separator = next_char()
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or ']' in {path}, found {separator!r}")
+            position += 1
+
+
+def iter_csv_rows(path: str, int_fields=()):
+    """Yields CSV rows as dicts, converting `int_fields` to integers where possible."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            for field in int_fields:
+                try:
+                    row[field] = int(row[field])
+                except (KeyError, TypeError, ValueError):
+                    pass
+            yield row
+
+
+def iter_metadata_files(folder: str):
+    """Yields `metadata/<token_id>.json` documents with their token_id added."""
+    for file_name in sorted(os.listdir(folder)):
+        if not file_name.endswith(".json"):
+            continue
+        with open(os.path.join(folder, file_name), 'r', encoding='utf-8') as f:
+            document = json.load(f)
+        document.setdefault("token_id", file_name[:-len(".json")])
+        yield document
+
+
+def iter_source_documents(collection_name: str, source: str = "prepared",
+                          ready_folder: str = READY_DATA_FOLDER, raw_folder: str = RAW_DATA_FOLDER):
+    """Yields the documents to load into a collection from the prepared exports or the raw files."""
+    dataset = DATASETS[collection_name]
+    if source == "prepared":
+        yield from iter_json_array(os.path.join(ready_folder, dataset["prepared"]))
+        return
+
+    path = os.path.join(raw_folder, dataset["raw"])
+    if path.endswith(".csv"):
+        documents = iter_csv_rows(path, dataset.get("int_fields", ()))
+    elif os.path.isdir(path):
+        documents = iter_metadata_files(path)
+    else:
+        documents = iter_json_array(path)
+    # Stamp raw rows the same way the prepared exports are stamped.
+    for document in documents:
+        document.setdefault("created_at", datetime.utcnow().isoformat())
+        document.setdefault("data_source", dataset["data_source"])
+        yield document
+
+
+# ========================================
+# INDEXES AND LOADING
+# ========================================
+def ensure_indexes(db, collection_names=None) -> list:
+    """
+    Creates the indexes the request path relies on. Returns the index names.
+
+    Raises:
+        OperationFailure: If an index cannot be built, e.g. a unique index
+            over a collection that already holds duplicate keys.
+    """
+    created = []
+    for collection_name in collection_names or INDEXES:
+        for keys, options in INDEXES.get(collection_name, []):
+            try:
+                created.append(db[collection_name].create_index(keys, **options))
+            except OperationFailure as e:
+                logger.error(f"Could not create index {options.get('name')} on {collection_name}: {e}")
+                raise
+    return created
+
+
+def _flush(collection, batch, key, mode, stats):
+    if mode == "insert":
+        try:
+            result = collection.insert_many(batch, ordered=False)
+            stats["inserted"] += len(result.inserted_ids)
+        except BulkWriteError as e:
+            details = e.details
+            duplicates = sum(1 for error in details.get("writeErrors", []) if error.get("code") == DUPLICATE_KEY_ERROR)
+            stats["inserted"] += details.get("nInserted", 0)
+            stats["duplicates"] += duplicates
+            stats["errors"] += len(details.get("writeErrors", [])) - duplicates
+    else:
+        result = collection.bulk_write(
+            [ReplaceOne({key: document[key]}, document, upsert=True) for document in batch],
+            ordered=False
+        )
+        stats["upserted"] += result.upserted_count
+        stats["matched"] += result.matched_count
+
+
+def load_collection(db, collection_name: str, documents, mode: str = "upsert",
+                    batch_size: int = BULK_LOAD_BATCH_SIZE, on_batch=None) -> dict:
+    """
+    Writes `documents` into a collection in batches of `batch_size`.
+
+    Args:
+        db: A pymongo Database (or the in-memory stand-in from stubs.py).
+        collection_name (str): One of DATASETS.
+        documents: Any iterable of dicts; consumed lazily.
+        mode (str): "upsert" (replace by natural key) or "insert".
+        on_batch: Optional callback given each written batch.
+
+    Returns:
+        dict: Row counts, elapsed seconds and rows per second.
+    """
+    if mode not in ("upsert", "insert"):
+        raise ValueError(f"Unknown load mode '{mode}'")
+    key = DATASETS[collection_name]["key"]
+    collection = db[collection_name]
+    stats = {"collection": collection_name, "rows": 0, "skipped": 0, "inserted": 0, "upserted": 0,
+             "matched": 0, "duplicates": 0, "errors": 0}
+    started = time.perf_counter()
+    batch = []
+    for document in documents:
+        if document.get(key) in (None, ""):
+            stats["skipped"] += 1
+            continue
+        batch.append(document)
+        stats["rows"] += 1
+        if len(batch) >= batch_size:
+            _flush(collection, batch, key, mode, stats)
+            if on_batch is not None:
+                on_batch(batch)
+            batch = []
+    if batch:
+        _flush(collection, batch, key, mode, stats)
+        if on_batch is not None:
+            on_batch(batch)
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["rows_per_sec"] = round(stats["rows"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    return stats
+
+
+def link_batch_callback(db, collection_name: str, linker):
+    """Returns the on_batch callback that keeps owner -> alert links current, or None."""
+    if collection_name == "land_registry":
+        return lambda batch: linker.link_owners(
+            db, {document.get("owner_name") for document in batch}, only_missing=True
+        )
+    if collection_name == "news_alerts":
+        return lambda batch: linker.update_alerts(db, batch)
+    return None
+
+
+def main_cli():
+    from database import ViraDatabase
+    from owner_alert_links import OwnerAlertLinker
+
+    parser = argparse.ArgumentParser(description="Stream the Vera AI datasets into MongoDB")
+    parser.add_argument("--source", choices=("prepared", "raw"), default="prepared",
+                        help="mongodb_ready_data exports or the raw nigeria_demo_data files")
+    parser.add_argument("--collections", help=f"Comma-separated subset of: {', '.join(DATASETS)}")
+    parser.add_argument("--mode", choices=("upsert", "insert"), default="upsert")
+    parser.add_argument("--batch-size", type=int, default=BULK_LOAD_BATCH_SIZE)
+    parser.add_argument("--drop", action="store_true", help="Drop each collection before loading")
+    parser.add_argument("--indexes-only", action="store_true", help="Only create the indexes")
+    parser.add_argument("--no-links", action="store_true", help="Do not maintain owner -> alert links")
+    parser.add_argument("--ready-folder", default=READY_DATA_FOLDER)
+    parser.add_argument("--raw-folder", default=RAW_DATA_FOLDER)
+    args = parser.parse_args()
+
+    collection_names = args.collections.split(",") if args.collections else list(DATASETS)
+    unknown = [name for name in collection_names if name not in DATASETS]
+    if unknown:
+        parser.error(f"Unknown collections: {', '.join(unknown)}")
+
+    database = ViraDatabase()
+    try:
+        db = database.db
+        if args.drop:
+            for collection_name in collection_names:
+                db[collection_name].drop()
+        try:
+            indexes = ensure_indexes(db, collection_names + ["owner_alert_links"])
+        except OperationFailure as e:
+            print(f"❌ Index creation failed: {e}")
+            return 1
+        print(f"Indexes ready: {', '.join(indexes)}")
+        if args.indexes_only:
+            return 0
+
+        linker = None if args.no_links else OwnerAlertLinker()
+        total_rows, total_seconds = 0, 0.0
+        print(f"{'collection':<20}{'rows':>9}{'inserted':>10}{'upserted':>10}{'matched':>9}"
+              f"{'dupes':>7}{'errors':>8}{'seconds':>9}{'rows/s':>10}")
+        for collection_name in collection_names:
+            documents = iter_source_documents(collection_name, args.source, args.ready_folder, args.raw_folder)
+            on_batch = link_batch_callback(db, collection_name, linker) if linker else None
+            stats = load_collection(db, collection_name, documents, args.mode, args.batch_size, on_batch)
+            total_rows += stats["rows"]
+            total_seconds += stats["seconds"]
+            print(f"{collection_name:<20}{stats['rows']:>9}{stats['inserted']:>10}{stats['upserted']:>10}"
+                  f"{stats['matched']:>9}{stats['duplicates']:>7}{stats['errors']:>8}"
+                  f"{stats['seconds']:>9.2f}{stats['rows_per_sec']:>10.0f}")
+        rate = total_rows / total_seconds if total_seconds else 0.0
+        if linker is not None:
+            # Record the newest alert as linked so later syncs start after it.
+            linker.sync(db, force=True)
+        print(f"\n✅ Loaded {total_rows} rows in {total_seconds:.2f}s ({rate:.0f} rows/s)")
+        return 0
+    finally:
+        database.close_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,225 @@
+# =================================================================
+# Vira Engine - Prebuilt Binary Data Snapshot
+# =================================================================
+# Purpose: Compile the local demo data (land registry CSV, gazette alerts
+# JSON and per-token metadata) once at build time into one binary file
+# that workers map with `mmap` instead of parsing the sources at start.
+# The mapping is read-only and file-backed, so several uvicorn workers
+# on one machine share its pages, and each worker only touches the
+# pages of the records it actually looks up.
+#
+# Layout (all integers little-endian):
+#   magic "VERASNAP" | version u32 | header length u32 | header JSON
+#   then per table: entries sorted by key, 24 bytes each
+#     (key offset u64, key length u32, value offset u64, value length u32)
+#   followed by the keys and values (compact UTF-8 JSON)
+#
+# The header records the size and mtime of every source file the
+# snapshot was built from. The fallback store only serves a table from
+# the snapshot while its source is unchanged, so editing the CSV or a
+# metadata file still takes effect without a rebuild.
+#
+# Build it with:
+#   python app/data_snapshot.py build nigeria_demo_data data_snapshot.bin
+# =================================================================
+
+import os
+import sys
+import json
+import mmap
+import struct
+import threading
+
+from observability import get_logger
+
+logger = get_logger("data_snapshot")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_SNAPSHOT_PATH = os.getenv('VERA_DATA_SNAPSHOT_PATH', os.path.join(BASE_DIR, "..", "data_snapshot.bin"))
+
+MAGIC = b"VERASNAP"
+VERSION = 1
+PREAMBLE = struct.Struct("<8sII")
+ENTRY = struct.Struct("<QIQI")
+# Decoded values kept per table, so hot keys skip the search and JSON decode
+DECODED_CACHE_ENTRIES = 4096
+
+
+def _encode(value) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class SnapshotTable:
+    """Read-only key -> JSON value table inside the mapped snapshot, searched in place."""
+
+    def __init__(self, buffer, offset: int, count: int):
+        self._buffer = buffer
+        self._offset = offset
+        self.count = count
+        self._decoded = {}
+
+    def __len__(self):
+        return self.count
+
+    def _entry(self, position: int):
+        return ENTRY.unpack_from(self._buffer, self._offset + position * ENTRY.size)
+
+    def _key(self, entry) -> bytes:
+        return self._buffer[entry[0]:entry[0] + entry[1]]
+
+    def get(self, key: str):
+        """Returns (a shallow copy of) the decoded value for the key, or None."""
+        value = self._decoded.get(key)
+        if value is None:
+            value = self._search(key)
+            if value is None:
+                return None
+            if len(self._decoded) >= DECODED_CACHE_ENTRIES:
+                self._decoded.clear()
+            self._decoded[key] = value
+        return dict(value) if isinstance(value, dict) else value
+
+    def _search(self, key: str):
+        """Binary search over the sorted entries, reading keys straight from the mapping."""
+        target = key.encode("utf-8")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            entry = self._entry(middle)
+            current = self._key(entry)
+            if current < target:
+                low = middle + 1
+            elif current > target:
+                high = middle
+            else:
+                return json.loads(self._buffer[entry[2]:entry[2] + entry[3]])
+        return None
+
+    def keys(self):
+        return [self._key(self._entry(i)).decode("utf-8") for i in range(self.count)]
+
+    def values(self):
+        for i in range(self.count):
+            entry = self._entry(i)
+            yield json.loads(self._buffer[entry[2]:entry[2] + entry[3]])
+
+
+class DataSnapshot:
+    """A mapped snapshot file: its header and tables."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_length = PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} data snapshot")
+        self.header = json.loads(self._map[PREAMBLE.size:PREAMBLE.size + header_length])
+        self.sources = self.header["sources"]
+        self.tables = {
+            name: SnapshotTable(self._map, table["offset"], table["count"])
+            for name, table in self.header["tables"].items()
+        }
+        logger.info(f"Mapped data snapshot {path} ({len(self._map)} bytes)")
+
+    def table(self, name: str) -> SnapshotTable:
+        return self.tables[name]
+
+    def close(self):
+        self._map.close()
+
+
+def build_snapshot(data_folder: str, output_path: str) -> dict:
+    """Compiles the data folder into a snapshot file (written atomically). Returns table sizes."""
+    # Registry records are stored exactly as the fallback store's RegistryTable returns them.
+    from fallback_store import ALERTS_FILENAME, METADATA_DIRNAME, REGISTRY_FILENAME, RegistryTable, file_signature
+
+    registry_path = os.path.join(data_folder, REGISTRY_FILENAME)
+    alerts_path = os.path.join(data_folder, ALERTS_FILENAME)
+    metadata_folder = os.path.join(data_folder, METADATA_DIRNAME)
+
+    registry = RegistryTable.from_csv(registry_path)
+    tables = {"registry": {key: registry.get(key) for key in registry.index}}
+    with open(alerts_path, 'r') as f:
+        # Keep the file order: the alert list is served in that order.
+        tables["alerts"] = {f"{position:08d}": alert for position, alert in enumerate(json.load(f))}
+    tables["metadata"] = {}
+    metadata_signatures = {}
+    for file_name in sorted(os.listdir(metadata_folder)):
+        if file_name.endswith(".json"):
+            token_id = file_name[:-len(".json")]
+            path = os.path.join(metadata_folder, file_name)
+            with open(path, 'r') as f:
+                tables["metadata"][token_id] = json.load(f)
+            metadata_signatures[token_id] = file_signature(path)
+
+    sources = {
+        "registry": file_signature(registry_path),
+        "alerts": file_signature(alerts_path),
+        "metadata": metadata_signatures,
+    }
+    # Lay out the header first with placeholder offsets to learn its size.
+    encoded = {
+        name: sorted((key.encode("utf-8"), _encode(value)) for key, value in rows.items())
+        for name, rows in tables.items()
+    }
+    header = {"sources": sources, "tables": {name: {"offset": 0, "count": len(rows)} for name, rows in encoded.items()}}
+    header_length = len(_encode(header)) + 64 * len(encoded)  # room for the real offsets
+    position = PREAMBLE.size + header_length
+    layout = {}
+    for name, rows in encoded.items():
+        layout[name] = position
+        position += ENTRY.size * len(rows) + sum(len(key) + len(value) for key, value in rows)
+    header["tables"] = {name: {"offset": layout[name], "count": len(rows)} for name, rows in encoded.items()}
+    header_bytes = _encode(header).ljust(header_length, b" ")
+
+    temporary_path = output_path + ".tmp"
+    with open(temporary_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, header_length))
+        f.write(header_bytes)
+        for name, rows in encoded.items():
+            data_offset = layout[name] + ENTRY.size * len(rows)
+            entries, blobs = [], []
+            for key, value in rows:
+                entries.append(ENTRY.pack(data_offset, len(key), data_offset + len(key), len(value)))
+                blobs.append(key)
+                blobs.append(value)
+                data_offset += len(key) + len(value)
+            f.write(b"".join(entries))
+            f.write(b"".join(blobs))
+        f.flush()
+        os.fsync(f.fileno())
+    # Running workers keep their mapping of the old file until they reopen.
+    os.replace(temporary_path, output_path)
+    return {name: len(rows) for name, rows in encoded.items()}
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_unreadable = set()  # paths that failed to map, so the warning is logged once
+
+
+def get_data_snapshot(path: str = DATA_SNAPSHOT_PATH):
+    """Returns the process-wide mapped snapshot at `path`, or None if none has been built there."""
+    global _snapshot
+    if _snapshot is None or _snapshot.path != path:
+        if path in _unreadable or not os.path.exists(path):
+            return None
+        with _snapshot_lock:
+            if _snapshot is None or _snapshot.path != path:
+                try:
+                    _snapshot = DataSnapshot(path)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Ignoring unreadable data snapshot {path}: {e}")
+                    _unreadable.add(path)
+                    return None
+    return _snapshot
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or sys.argv[1] != "build":
+        print("Usage: python app/data_snapshot.py build <data_folder> <snapshot_file>")
+        sys.exit(1)
+    counts = build_snapshot(sys.argv[2], sys.argv[3])
+    print(f"Built {sys.argv[3]}: " + ", ".join(f"{count} {name}" for name, count in counts.items()))
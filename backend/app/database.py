@@ -3,25 +3,47 @@
 # =================================================================
 # Purpose: This module handles MongoDB connection and basic operations
 # for storing property analysis data and results.
+#
+# The request path uses one process-wide pooled client (see
+# `get_shared_database`) guarded by a circuit breaker, so a MongoDB
+# outage sends requests straight to the local fallback instead of
+# waiting on a connection timeout every time.
 # =================================================================
 
 import os
+import threading
+import time
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 from dotenv import load_dotenv
 import json
 from datetime import datetime
 
+from observability import get_logger
+
+logger = get_logger("database")
+
 # Load environment variables
 load_dotenv()
 
+# Connection pool and circuit breaker settings for the shared client
+MONGO_MAX_POOL_SIZE = int(os.getenv('VERA_MONGO_MAX_POOL_SIZE', '50'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('VERA_MONGO_MIN_POOL_SIZE', '0'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('VERA_MONGO_SERVER_SELECTION_TIMEOUT_MS', '1000'))
+MONGO_FAILURE_THRESHOLD = int(os.getenv('VERA_MONGO_FAILURE_THRESHOLD', '3'))
+MONGO_PROBE_INTERVAL_SECONDS = float(os.getenv('VERA_MONGO_PROBE_INTERVAL_SECONDS', '5'))
+
 class ViraDatabase:
-    def __init__(self):
+    def __init__(self, mongo_uri=None, max_pool_size=None, min_pool_size=None,
+                 server_selection_timeout_ms=3000):
         """Initialize MongoDB connection"""
-        self.mongo_uri = os.getenv('MONGO_URI')
+        self.mongo_uri = mongo_uri or os.getenv('MONGO_URI')
         if not self.mongo_uri:
             raise ValueError("MONGO_URI not found in environment variables")
         
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
+        self.server_selection_timeout_ms = server_selection_timeout_ms
         self.client = None
         self.db = None
         self.connect()
@@ -29,24 +51,33 @@ class ViraDatabase:
     def connect(self):
         """Establish connection to MongoDB"""
         try:
-            print("[Database] Connecting to MongoDB...")
-            # Shorter timeout for faster testing
-            self.client = MongoClient(self.mongo_uri, serverSelectionTimeoutMS=3000)
+            logger.info("Connecting to MongoDB...")
+            pool_options = {}
+            if self.max_pool_size is not None:
+                pool_options['maxPoolSize'] = self.max_pool_size
+            if self.min_pool_size is not None:
+                pool_options['minPoolSize'] = self.min_pool_size
+            self.client = MongoClient(
+                self.mongo_uri,
+                serverSelectionTimeoutMS=self.server_selection_timeout_ms,
+                **pool_options
+            )
             
             # Test the connection with timeout
-            print("[Database] Testing connection...")
+            logger.info("Testing connection...")
             self.client.admin.command('ping')
             
             # Use the database (extract from URI or use default)
             self.db = self.client['vira_engine']
-            print("[Database] Successfully connected to MongoDB")
+            logger.info("Successfully connected to MongoDB")
             
         except (ConnectionFailure, ServerSelectionTimeoutError) as e:
-            print(f"[Database] Failed to connect to MongoDB: {e}")
-            print("[Database] This might be due to network issues or incorrect credentials")
+            logger.warning(f"Failed to connect to MongoDB: {e}")
+            logger.info("This might be due to network issues or incorrect credentials")
+            self.close_connection()
             raise
         except Exception as e:
-            print(f"[Database] Unexpected error: {e}")
+            logger.error(f"Unexpected error: {e}")
             raise
     
     def test_connection(self):
@@ -54,27 +85,187 @@ class ViraDatabase:
         try:
             # Simple ping test
             result = self.client.admin.command('ping')
-            print(f"[Database] Connection test successful: {result}")
+            logger.info(f"Connection test successful: {result}")
             return True
         except Exception as e:
-            print(f"[Database] Connection test failed: {e}")
+            logger.warning(f"Connection test failed: {e}")
             return False
     
     def get_collections_info(self):
         """Get information about existing collections"""
         try:
             collections = self.db.list_collection_names()
-            print(f"[Database] Available collections: {collections}")
+            logger.info(f"Available collections: {collections}")
             return collections
         except Exception as e:
-            print(f"[Database] Error getting collections: {e}")
+            logger.warning(f"Error getting collections: {e}")
             return []
     
     def close_connection(self):
         """Close MongoDB connection"""
         if self.client:
             self.client.close()
-            print("[Database] MongoDB connection closed")
+            self.client = None
+            self.db = None
+            logger.info("MongoDB connection closed")
+
+# ========================================
+# SHARED CONNECTION WITH CIRCUIT BREAKER
+# ========================================
+class CircuitBreaker:
+    """
+    Tracks MongoDB health for the request path.
+
+    The breaker opens after `failure_threshold` consecutive failures. While
+    open, `allow_request()` is False and callers go straight to the
+    fallback. It only closes again when `record_success()` is called,
+    which the background probe does once a ping succeeds.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+
+    def __init__(self, failure_threshold=MONGO_FAILURE_THRESHOLD):
+        self.failure_threshold = failure_threshold
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state != self.CLOSED:
+                logger.info("Circuit breaker closed, MongoDB is healthy again")
+            self.state = self.CLOSED
+            self.opened_at = None
+
+    def record_failure(self):
+        """Records a failure. Returns True if this failure opened the breaker."""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                logger.warning(f"Circuit breaker opened after {self.consecutive_failures} consecutive failures")
+                return True
+            return False
+
+
+class SharedDatabase:
+    """
+    Process-wide pooled MongoDB connection used by the analysis pipeline.
+
+    The underlying ViraDatabase is created once and reused by every request.
+    Request code reports connection failures back through `record_failure`;
+    once the breaker opens, a daemon thread pings MongoDB every
+    `probe_interval` seconds and closes the breaker when it answers.
+    """
+
+    def __init__(self, mongo_uri=None, max_pool_size=MONGO_MAX_POOL_SIZE,
+                 min_pool_size=MONGO_MIN_POOL_SIZE,
+                 server_selection_timeout_ms=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                 failure_threshold=MONGO_FAILURE_THRESHOLD,
+                 probe_interval=MONGO_PROBE_INTERVAL_SECONDS):
+        self.mongo_uri = mongo_uri or os.getenv('MONGO_URI')
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
+        self.server_selection_timeout_ms = server_selection_timeout_ms
+        self.probe_interval = probe_interval
+        self.breaker = CircuitBreaker(failure_threshold)
+        self._database = None
+        self._lock = threading.Lock()
+        self._probe_thread = None
+
+    @property
+    def configured(self):
+        return bool(self.mongo_uri)
+
+    def _connect(self):
+        return ViraDatabase(
+            mongo_uri=self.mongo_uri,
+            max_pool_size=self.max_pool_size,
+            min_pool_size=self.min_pool_size,
+            server_selection_timeout_ms=self.server_selection_timeout_ms
+        )
+
+    def get_db(self):
+        """Returns the shared database handle, or None if MongoDB should not be used right now."""
+        if not self.configured or not self.breaker.allow_request():
+            return None
+        database = self._database
+        if database is not None:
+            return database.db
+        with self._lock:
+            if self._database is None:
+                try:
+                    self._database = self._connect()
+                except Exception as e:
+                    logger.warning(f"Shared connection unavailable: {e}")
+                    database = None
+            database = self._database
+        if database is None:
+            self.record_failure()
+            return None
+        return database.db
+
+    def record_success(self):
+        if self.breaker.consecutive_failures:
+            self.breaker.record_success()
+
+    def record_failure(self):
+        if self.breaker.record_failure():
+            self._start_probe()
+
+    def _start_probe(self):
+        with self._lock:
+            if self._probe_thread is not None and self._probe_thread.is_alive():
+                return
+            self._probe_thread = threading.Thread(
+                target=self._probe_loop, name="vera-mongo-probe", daemon=True
+            )
+            self._probe_thread.start()
+
+    def _probe_loop(self):
+        while not self.breaker.allow_request():
+            time.sleep(self.probe_interval)
+            try:
+                with self._lock:
+                    if self._database is None:
+                        self._database = self._connect()
+                    else:
+                        self._database.client.admin.command('ping')
+                self.breaker.record_success()
+            except Exception as e:
+                logger.warning(f"Health probe failed, staying on fallback: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._database is not None:
+                self._database.close_connection()
+                self._database = None
+
+
+_shared_database = None
+_shared_database_lock = threading.Lock()
+
+def get_shared_database():
+    """Returns the process-wide SharedDatabase, creating it on first use."""
+    global _shared_database
+    if _shared_database is None:
+        with _shared_database_lock:
+            if _shared_database is None:
+                _shared_database = SharedDatabase()
+    return _shared_database
+
+def set_shared_database(shared_database):
+    """Replaces the process-wide SharedDatabase (e.g. with the in-memory stand-in in stubs.py)."""
+    global _shared_database
+    with _shared_database_lock:
+        _shared_database = shared_database
 
 # Test function
 def test_mongodb_connection():
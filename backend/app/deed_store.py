@@ -0,0 +1,230 @@
+# =================================================================
+# Vira Engine - Packed Deed Document Store
+# =================================================================
+# Purpose: Serve Deed of Assignment documents without one file (and one
+# path probe plus full read) per deed. Documents are packed back to back
+# into segment files and located through a token_id -> (segment, offset,
+# length) index; reads go through `mmap` and return memoryview slices,
+# so the bytes are not copied until the caller decodes them.
+#
+# Layout of a store directory:
+#   segment-00000.dat, segment-00001.dat, ...   packed UTF-8 documents
+#   index.log                                   one line per append:
+#                                               token_id<TAB>segment<TAB>offset<TAB>length
+#                                               [<TAB>source mtime_ns<TAB>source size]
+#
+# Appends write the document first and the index line second, so a crash
+# can at worst leave unreferenced bytes in a segment. A partial last index
+# line is ignored on load. A later entry for the same token_id replaces
+# the earlier one.
+#
+# Deeds imported from a folder record the size and mtime of their source
+# file (like data_snapshot.py does). A read given the source path checks
+# it and returns None once the file has changed, so the caller reads the
+# edited file until the import is run again; re-running the import
+# repacks exactly the deeds whose source changed.
+#
+# Import the demo layout with:
+#   python app/deed_store.py import nigeria_demo_data deed_store
+# =================================================================
+
+import os
+import sys
+import mmap
+import threading
+
+from fallback_store import file_signature
+from observability import get_logger
+
+logger = get_logger("deed_store")
+
+DEED_SEGMENT_MAX_BYTES = int(os.getenv('VERA_DEED_SEGMENT_MAX_BYTES', str(64 * 1024 * 1024)))
+DEED_FILE_SUFFIX = "_Deed_of_Assignment.txt"
+INDEX_FILE = "index.log"
+
+
+def _segment_name(segment: int) -> str:
+    return f"segment-{segment:05d}.dat"
+
+
+class DeedStore:
+    """Append-only packed deed documents with an in-memory offset index."""
+
+    def __init__(self, path: str, segment_max_bytes: int = DEED_SEGMENT_MAX_BYTES):
+        self.path = path
+        self.segment_max_bytes = segment_max_bytes
+        self._index = {}     # token_id -> (segment, offset, length)
+        self._sources = {}   # token_id -> [mtime_ns, size] of the file it was imported from
+        self._maps = {}      # segment -> mmap covering the segment as last mapped
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._load_index()
+        self._active_segment = max((entry[0] for entry in self._index.values()), default=0)
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.exists(os.path.join(path, INDEX_FILE))
+
+    def _load_index(self):
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    logger.warning(f"Ignoring incomplete index entry in {index_path}")
+                    break
+                fields = line.rstrip("\n").split("\t")
+                token_id, segment, offset, length = fields[:4]
+                self._index[token_id] = (int(segment), int(offset), int(length))
+                if len(fields) == 6:
+                    self._sources[token_id] = [int(fields[4]), int(fields[5])]
+                else:
+                    self._sources.pop(token_id, None)
+        logger.info(f"Loaded deed index with {len(self._index)} documents from {self.path}")
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, token_id):
+        return token_id in self._index
+
+    def token_ids(self):
+        return list(self._index)
+
+    def source_signature(self, token_id: str):
+        """The [mtime_ns, size] of the file the deed was imported from, or None."""
+        return self._sources.get(token_id)
+
+    def is_current(self, token_id: str, source_path: str) -> bool:
+        """False if the deed's source file exists and differs from what was packed."""
+        current = file_signature(source_path)
+        return current is None or current == self._sources.get(token_id)
+
+    # --- Reads ---
+    def _segment_map(self, segment: int, end: int):
+        segment_map = self._maps.get(segment)
+        if segment_map is None or len(segment_map) < end:
+            with self._lock:
+                segment_map = self._maps.get(segment)
+                if segment_map is None or len(segment_map) < end:
+                    # The segment grew since it was mapped; map it again. The old
+                    # map stays valid for memoryviews still holding it.
+                    with open(os.path.join(self.path, _segment_name(segment)), 'rb') as f:
+                        segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._maps[segment] = segment_map
+        return segment_map
+
+    def read(self, token_id: str):
+        """Returns the deed as a zero-copy memoryview, or None if it is not stored."""
+        entry = self._index.get(token_id)
+        if entry is None:
+            return None
+        segment, offset, length = entry
+        return memoryview(self._segment_map(segment, offset + length))[offset:offset + length]
+
+    def read_text(self, token_id: str, source_path: str = None):
+        """
+        Returns the deed decoded as text, or None if it is not stored. With
+        `source_path`, also None if that file changed since it was packed.
+        """
+        if source_path is not None and token_id in self._index and not self.is_current(token_id, source_path):
+            logger.debug(f"Packed deed for {token_id} is older than {source_path}")
+            return None
+        view = self.read(token_id)
+        if view is None:
+            return None
+        try:
+            return str(view, 'utf-8')
+        finally:
+            view.release()
+
+    # --- Appends ---
+    def append(self, token_id: str, content, source_signature=None) -> tuple:
+        """
+        Stores a deed (str or bytes), replacing any earlier version. Returns its
+        index entry. `source_signature` is the [mtime_ns, size] of the file the
+        content was read from.
+        """
+        data = content.encode('utf-8') if isinstance(content, str) else bytes(content)
+        with self._lock:
+            segment = self._active_segment
+            segment_path = os.path.join(self.path, _segment_name(segment))
+            size = os.path.getsize(segment_path) if os.path.exists(segment_path) else 0
+            if size and size + len(data) > self.segment_max_bytes:
+                segment += 1
+                self._active_segment = segment
+                segment_path = os.path.join(self.path, _segment_name(segment))
+                size = 0
+            with open(segment_path, 'ab') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            entry = (segment, size, len(data))
+            line = f"{token_id}\t{segment}\t{size}\t{len(data)}"
+            if source_signature is not None:
+                line += f"\t{source_signature[0]}\t{source_signature[1]}"
+            with open(os.path.join(self.path, INDEX_FILE), 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+            self._index[token_id] = entry
+            if source_signature is not None:
+                self._sources[token_id] = list(source_signature)
+            else:
+                self._sources.pop(token_id, None)
+        return entry
+
+    def close(self):
+        with self._lock:
+            for segment_map in self._maps.values():
+                try:
+                    segment_map.close()
+                except BufferError:
+                    # A caller still holds a memoryview; the map is freed with it.
+                    pass
+            self._maps.clear()
+
+
+def import_deed_folder(data_folder: str, store: DeedStore, overwrite: bool = False) -> int:
+    """
+    Imports every `<token_id>_Deed_of_Assignment.txt` in a folder that is new
+    or changed since it was packed (all of them with `overwrite`). Returns the
+    count imported.
+    """
+    imported = 0
+    for file_name in sorted(os.listdir(data_folder)):
+        if not file_name.endswith(DEED_FILE_SUFFIX):
+            continue
+        token_id = file_name[:-len(DEED_FILE_SUFFIX)]
+        path = os.path.join(data_folder, file_name)
+        if token_id in store and not overwrite and store.is_current(token_id, path):
+            continue
+        signature = file_signature(path)
+        with open(path, 'rb') as f:
+            store.append(token_id, f.read(), source_signature=signature)
+        imported += 1
+    return imported
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_deed_store(path: str):
+    """Returns the process-wide deed store at `path`, or None if no store has been imported there."""
+    global _store
+    if _store is None or _store.path != path:
+        if not DeedStore.exists(path):
+            return None
+        with _store_lock:
+            if _store is None or _store.path != path:
+                _store = DeedStore(path)
+    return _store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or sys.argv[1] != "import":
+        print("Usage: python app/deed_store.py import <data_folder> <store_dir> [--overwrite]")
+        sys.exit(1)
+    deed_store = DeedStore(sys.argv[3])
+    count = import_deed_folder(sys.argv[2], deed_store, overwrite="--overwrite" in sys.argv)
+    print(f"Imported {count} deeds into {sys.argv[3]} ({len(deed_store)} total)")
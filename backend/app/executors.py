@@ -0,0 +1,50 @@
+# =================================================================
+# Vira Engine - Shared Thread Pools
+# =================================================================
+# Purpose: The analysis pipeline (pymongo queries, file reads and the
+# Gemini SDK) is blocking code. This module owns the bounded thread
+# pools it runs on, so the FastAPI event loop stays free to serve
+# /health and other requests while analyses are in progress.
+#
+# Pools:
+# - analysis: runs `perform_asset_analysis` calls (the API runs its
+#   two halves, see `prepare_asset_analysis`)
+# - io: runs independent ingestion lookups (deed reads, alert queries)
+#   in parallel within a single analysis
+# =================================================================
+
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# Maximum number of analyses running at the same time in this worker
+ANALYSIS_MAX_WORKERS = int(os.getenv('VERA_ANALYSIS_MAX_WORKERS', '8'))
+
+# Maximum number of parallel ingestion lookups across all analyses
+INGESTION_IO_WORKERS = int(os.getenv('VERA_INGESTION_IO_WORKERS', '16'))
+
+analysis_executor = ThreadPoolExecutor(
+    max_workers=ANALYSIS_MAX_WORKERS, thread_name_prefix="vera-analysis"
+)
+io_executor = ThreadPoolExecutor(
+    max_workers=INGESTION_IO_WORKERS, thread_name_prefix="vera-io"
+)
+
+
+async def run_in_analysis_pool(func, *args, **kwargs):
+    """Runs a blocking pipeline function on the analysis pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(analysis_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_in_io_pool(func, *args, **kwargs):
+    """Runs a short blocking lookup on the io pool, so it never queues behind long analyses."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executors():
+    """Stops both pools. Called when the API worker shuts down."""
+    analysis_executor.shutdown(wait=False, cancel_futures=True)
+    io_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,265 @@
+# =================================================================
+# Vira Engine - Local Fallback Data Store
+# =================================================================
+# Purpose: This module keeps the local demo data (land registry CSV,
+# gazette alerts JSON and per-token metadata) in memory so that the
+# fallback ingestion path does not re-parse the files on every request.
+#
+# Key Features:
+# - Registry loaded once into compact columnar storage
+# - O(1) lookups by c_of_o_id and token_id
+# - Gazette alerts indexed for owner-name matching
+# - Atomic reload when a source file's mtime changes
+# - Served from the prebuilt mmap snapshot (data_snapshot.py) while the
+#   source files are unchanged since it was built
+# =================================================================
+
+import os
+import csv
+import json
+import threading
+from array import array
+
+from alert_matcher import AlertMatcher
+from data_snapshot import DATA_SNAPSHOT_PATH, get_data_snapshot
+from observability import get_logger
+
+logger = get_logger("fallback_store")
+
+# Columns whose distinct values are repeated a lot (area, state, status)
+# are dictionary-encoded instead of storing one string per row.
+DICTIONARY_ENCODING_MAX_VALUES = 65535
+
+REGISTRY_FILENAME = "Nigerian_Land_Registry_Mock.csv"
+ALERTS_FILENAME = "Nigerian_Gazette_Alerts.json"
+METADATA_DIRNAME = "metadata"
+
+
+def file_signature(path: str):
+    """Returns [mtime_ns, size] for a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class _IntColumn:
+    """Integer column stored in a packed array."""
+    __slots__ = ("values",)
+
+    def __init__(self, raw_values):
+        self.values = array('q', (int(v) for v in raw_values))
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+
+class _DictionaryColumn:
+    """String column stored as small integer codes into a table of distinct values."""
+    __slots__ = ("codes", "table")
+
+    def __init__(self, raw_values, distinct):
+        self.table = list(distinct)
+        lookup = {value: code for code, value in enumerate(self.table)}
+        self.codes = array('H', (lookup[v] for v in raw_values))
+
+    def __getitem__(self, i):
+        return self.table[self.codes[i]]
+
+
+class _StringColumn:
+    """Plain string column for high-cardinality values (ids, names, dates)."""
+    __slots__ = ("values",)
+
+    def __init__(self, raw_values):
+        self.values = raw_values
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+
+def _build_column(raw_values: list):
+    """Picks the most compact representation for a column of raw CSV strings."""
+    try:
+        return _IntColumn(raw_values)
+    except ValueError:
+        pass
+    distinct = dict.fromkeys(raw_values)
+    if len(distinct) <= DICTIONARY_ENCODING_MAX_VALUES and len(distinct) * 4 < len(raw_values):
+        return _DictionaryColumn(raw_values, distinct)
+    return _StringColumn(raw_values)
+
+
+class RegistryTable:
+    """Columnar, read-only view of the land registry with a c_of_o_id index."""
+
+    def __init__(self, field_names: list, rows: list):
+        self.field_names = list(field_names)
+        self.columns = [
+            _build_column([row[i] for row in rows]) for i in range(len(self.field_names))
+        ]
+        key_position = self.field_names.index('c_of_o_id')
+        self.index = {}
+        for row_number, row in enumerate(rows):
+            # Keep the first occurrence, matching the old `iloc[0]` behaviour.
+            self.index.setdefault(row[key_position], row_number)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "RegistryTable":
+        with open(path, 'r', newline='') as f:
+            reader = csv.reader(f)
+            field_names = next(reader)
+            rows = [row for row in reader if row]
+        return cls(field_names, rows)
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, c_of_o_id: str):
+        """Returns the registry record as a dict, or None if not found."""
+        row_number = self.index.get(c_of_o_id)
+        if row_number is None:
+            return None
+        return {name: column[row_number] for name, column in zip(self.field_names, self.columns)}
+
+
+class _Snapshot:
+    """Immutable set of loaded files. Replaced as a whole on reload."""
+    __slots__ = ("registry", "registry_signature", "alerts", "alert_matcher", "alerts_signature")
+
+    def __init__(self, registry, registry_signature, alerts, alert_matcher, alerts_signature):
+        self.registry = registry
+        self.registry_signature = registry_signature
+        self.alerts = alerts
+        self.alert_matcher = alert_matcher
+        self.alerts_signature = alerts_signature
+
+
+class FallbackStore:
+    """
+    Process-wide cache of the local demo data.
+
+    Every lookup stats the underlying file and, if its mtime or size has
+    changed, builds a fresh snapshot and swaps it in under a lock. Readers
+    always see either the old or the new snapshot, never a partial one.
+    """
+
+    def __init__(self, data_folder: str, snapshot_path: str = DATA_SNAPSHOT_PATH):
+        self.data_folder = data_folder
+        self.snapshot_path = snapshot_path
+        self.registry_path = os.path.join(data_folder, REGISTRY_FILENAME)
+        self.alerts_path = os.path.join(data_folder, ALERTS_FILENAME)
+        self.metadata_folder = os.path.join(data_folder, METADATA_DIRNAME)
+        self._lock = threading.Lock()
+        self._snapshot = _Snapshot(None, None, None, None, None)
+        self._metadata = {}
+
+    def _snapshot_table(self, name: str, source_signature, token_id: str = None):
+        """The snapshot table `name` if the snapshot was built from this exact source file, else None."""
+        data_snapshot = get_data_snapshot(self.snapshot_path)
+        if data_snapshot is None:
+            return None
+        built_from = data_snapshot.sources.get(name)
+        if token_id is not None:
+            built_from = built_from.get(token_id) if built_from else None
+        return data_snapshot.table(name) if built_from == source_signature else None
+
+    def warm(self) -> dict:
+        """Loads the registry and alerts ahead of the first request. Returns what was loaded."""
+        registry = self._current_registry()
+        return {
+            "registry_records": len(registry),
+            "alerts": len(self.get_alerts()),
+            "snapshot": get_data_snapshot(self.snapshot_path) is not None,
+        }
+
+    # --- Registry ---
+    def _current_registry(self) -> RegistryTable:
+        signature = file_signature(self.registry_path)
+        snapshot = self._snapshot
+        if signature is None:
+            raise FileNotFoundError(self.registry_path)
+        if snapshot.registry is not None and snapshot.registry_signature == signature:
+            return snapshot.registry
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot.registry is None or snapshot.registry_signature != signature:
+                registry = self._snapshot_table("registry", signature)
+                if registry is None:
+                    logger.info(f"Loading registry from {self.registry_path}")
+                    registry = RegistryTable.from_csv(self.registry_path)
+                snapshot = _Snapshot(registry, signature, snapshot.alerts, snapshot.alert_matcher, snapshot.alerts_signature)
+                self._snapshot = snapshot
+                logger.info(f"Indexed {len(registry)} registry records")
+            return snapshot.registry
+
+    def get_registry_record(self, c_of_o_id: str):
+        """Returns the registry record for a C-of-O id, or None."""
+        return self._current_registry().get(c_of_o_id)
+
+    # --- Gazette alerts ---
+    def _current_alerts(self) -> _Snapshot:
+        signature = file_signature(self.alerts_path)
+        snapshot = self._snapshot
+        if signature is None:
+            raise FileNotFoundError(self.alerts_path)
+        if snapshot.alerts is not None and snapshot.alerts_signature == signature:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot.alerts is None or snapshot.alerts_signature != signature:
+                snapshot_alerts = self._snapshot_table("alerts", signature)
+                if snapshot_alerts is not None:
+                    alerts = list(snapshot_alerts.values())
+                else:
+                    logger.info(f"Loading gazette alerts from {self.alerts_path}")
+                    with open(self.alerts_path, 'r') as f:
+                        alerts = json.load(f)
+                alert_matcher = AlertMatcher(alerts)
+                snapshot = _Snapshot(snapshot.registry, snapshot.registry_signature, alerts, alert_matcher, signature)
+                self._snapshot = snapshot
+            return snapshot
+
+    def get_alerts(self) -> list:
+        """Returns the full list of gazette alerts (shared, do not mutate)."""
+        return self._current_alerts().alerts
+
+    def find_alerts_for_owner(self, owner_name: str) -> list:
+        """Returns the gazette alerts that mention the owner name."""
+        if not owner_name:
+            return []
+        return self._current_alerts().alert_matcher.match_alerts(owner_name)
+
+    # --- Property metadata ---
+    def get_metadata(self, token_id: str):
+        """Returns the metadata for a token id, or None if no metadata file exists."""
+        path = os.path.join(self.metadata_folder, f"{token_id}.json")
+        signature = file_signature(path)
+        if signature is None:
+            self._metadata.pop(token_id, None)
+            return None
+        cached = self._metadata.get(token_id)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        snapshot_metadata = self._snapshot_table("metadata", signature, token_id)
+        metadata = snapshot_metadata.get(token_id) if snapshot_metadata is not None else None
+        if metadata is None:
+            with open(path, 'r') as f:
+                metadata = json.load(f)
+        self._metadata[token_id] = (signature, metadata)
+        return metadata
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_fallback_store(data_folder: str) -> FallbackStore:
+    """Returns the process-wide fallback store, creating it on first use."""
+    global _store
+    if _store is None or _store.data_folder != data_folder:
+        with _store_lock:
+            if _store is None or _store.data_folder != data_folder:
+                _store = FallbackStore(data_folder)
+    return _store
@@ -0,0 +1,414 @@
+# =================================================================
+# Vira Engine - Durable Analysis Job Queue
+# =================================================================
+# Purpose: Run analyses outside the HTTP request. `POST /jobs/analyze`
+# stores a job in MongoDB and returns its id; worker processes (scaled
+# separately from the web tier) claim jobs, run the analysis and store
+# the response for `GET /jobs/{job_id}`.
+#
+# Collection `analysis_jobs`, one document per job:
+#   {_id: job_id, token_id, status, active, attempts, max_attempts, available_at,
+#    lease_token, lease_expires_at, worker_id, result, error, last_error,
+#    created_at, started_at, finished_at, expires_at}
+#
+# - A unique partial index keeps one queued or running job per token;
+#   a concurrent duplicate submission gets the existing job back.
+# - Claiming is one atomic find_one_and_update, so a job runs on one
+#   worker at a time. The claim leases the job for
+#   JOB_VISIBILITY_TIMEOUT_SECONDS; the worker renews the lease while the
+#   analysis runs. If the worker dies, the lease expires and another
+#   worker claims the job again.
+# - Failed attempts are retried with exponential backoff. A job that
+#   fails (or loses its worker) JOB_MAX_ATTEMPTS times is dead-lettered:
+#   marked `dead_lettered` and copied to `analysis_jobs_dead_letter`.
+# - An unknown token fails the job at once; retrying cannot help.
+# - Finished jobs expire after JOB_RESULT_TTL_SECONDS (TTL index).
+#
+# Run workers with:
+#   python app/job_queue.py worker [--processes N] [--concurrency M]
+# =================================================================
+
+import os
+import uuid
+import signal
+import socket
+import argparse
+import threading
+import multiprocessing
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from observability import JOBS, get_logger, span
+
+logger = get_logger("jobs")
+
+# How long a claimed job stays invisible to other workers without a lease renewal
+JOB_VISIBILITY_TIMEOUT_SECONDS = float(os.getenv('VERA_JOB_VISIBILITY_TIMEOUT_SECONDS', '120'))
+JOB_MAX_ATTEMPTS = int(os.getenv('VERA_JOB_MAX_ATTEMPTS', '3'))
+# Delay before the first retry; doubles with every further attempt
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv('VERA_JOB_RETRY_BACKOFF_SECONDS', '10'))
+JOB_RESULT_TTL_SECONDS = int(os.getenv('VERA_JOB_RESULT_TTL_SECONDS', '86400'))
+JOB_POLL_SECONDS = float(os.getenv('VERA_JOB_POLL_SECONDS', '1'))
+# Concurrent jobs per worker process (analyses mostly wait on Gemini)
+JOB_WORKER_CONCURRENCY = int(os.getenv('VERA_JOB_WORKER_CONCURRENCY', '4'))
+# Job runner threads inside the API process, for single-process deployments
+JOB_INPROCESS_WORKERS = int(os.getenv('VERA_JOB_INPROCESS_WORKERS', '0'))
+
+JOBS_COLLECTION = 'analysis_jobs'
+DEAD_LETTER_COLLECTION = 'analysis_jobs_dead_letter'
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, DEAD_LETTERED = "queued", "running", "succeeded", "failed", "dead_lettered"
+
+INDEXES = [
+    ([("status", ASCENDING), ("available_at", ASCENDING)], {"name": "status_available_at"}),
+    ([("status", ASCENDING), ("lease_expires_at", ASCENDING)], {"name": "status_lease_expires_at"}),
+    ([("token_id", ASCENDING), ("status", ASCENDING)], {"name": "token_id_status"}),
+    # At most one queued or running job per token, even under concurrent
+    # submissions. Queued and running jobs carry `active: true`; a flag
+    # rather than a status $in filter, which needs MongoDB 6.0.
+    ([("token_id", ASCENDING)], {"name": "token_id_active_unique", "unique": True,
+                                 "partialFilterExpression": {"active": True}}),
+    ([("expires_at", ASCENDING)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+]
+
+
+class PermanentJobError(Exception):
+    """The job cannot succeed on retry (e.g. the token does not exist)."""
+
+
+def public_job(job: dict) -> dict:
+    """The job fields returned by GET /jobs/{job_id}."""
+    view = {
+        "job_id": job["_id"],
+        "token_id": job.get("token_id"),
+        "status": job.get("status"),
+        "attempts": job.get("attempts", 0),
+        "max_attempts": job.get("max_attempts"),
+    }
+    for field in ("created_at", "started_at", "finished_at"):
+        if job.get(field) is not None:
+            view[field] = job[field].isoformat() + "Z"
+    if job.get("status") == SUCCEEDED:
+        view["result"] = job.get("result")
+    if job.get("error"):
+        view["error"] = job["error"]
+    elif job.get("last_error"):
+        view["last_error"] = job["last_error"]
+    return view
+
+
+class JobQueue:
+    """MongoDB-backed queue of analysis jobs with leases, retries and dead-lettering."""
+
+    def __init__(self, visibility_timeout=JOB_VISIBILITY_TIMEOUT_SECONDS, max_attempts=JOB_MAX_ATTEMPTS,
+                 retry_backoff=JOB_RETRY_BACKOFF_SECONDS, result_ttl=JOB_RESULT_TTL_SECONDS):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.result_ttl = result_ttl
+        self._indexed = set()  # id() of databases whose indexes were ensured
+
+    def ensure_indexes(self, db):
+        if id(db) in self._indexed:
+            return
+        for keys, options in INDEXES:
+            db[JOBS_COLLECTION].create_index(keys, **options)
+        self._indexed.add(id(db))
+
+    # --- Producer side ---
+    def enqueue(self, db, token_id: str) -> dict:
+        """
+        Queues an analysis of `token_id` and returns the job. A job already
+        queued or running for the same token is returned instead, so
+        repeated submissions share one analysis.
+        """
+        self.ensure_indexes(db)
+        jobs = db[JOBS_COLLECTION]
+        for _ in range(3):
+            existing = jobs.find_one({"token_id": token_id, "status": {"$in": [QUEUED, RUNNING]}})
+            if existing is not None:
+                return existing
+            now = datetime.utcnow()
+            job = {
+                "_id": uuid.uuid4().hex,
+                "token_id": token_id,
+                "status": QUEUED,
+                "active": True,
+                "attempts": 0,
+                "max_attempts": self.max_attempts,
+                "available_at": now,
+                "created_at": now,
+                "updated_at": now,
+            }
+            try:
+                with span("mongo_query", JOBS_COLLECTION):
+                    jobs.insert_one(job)
+            except DuplicateKeyError:
+                # A concurrent submission queued the token first; return its job
+                # (or try again if that job already finished).
+                continue
+            JOBS.inc(event="enqueued")
+            return job
+        raise RuntimeError(f"Could not queue a job for '{token_id}'")
+
+    def get_job(self, db, job_id: str):
+        with span("mongo_query", JOBS_COLLECTION):
+            return db[JOBS_COLLECTION].find_one({"_id": job_id})
+
+    # --- Worker side ---
+    def claim(self, db, worker_id: str):
+        """
+        Leases the oldest job that is due, or one whose previous lease
+        expired. Returns the job (with a fresh `lease_token`) or None.
+        A job whose lease expired on its last attempt is dead-lettered
+        instead of being returned.
+        """
+        while True:
+            now = datetime.utcnow()
+            job = db[JOBS_COLLECTION].find_one_and_update(
+                {"$or": [
+                    {"status": QUEUED, "available_at": {"$lte": now}},
+                    {"status": RUNNING, "lease_expires_at": {"$lte": now}},
+                ]},
+                {
+                    "$set": {
+                        "status": RUNNING,
+                        "worker_id": worker_id,
+                        "lease_token": uuid.uuid4().hex,
+                        "lease_expires_at": now + timedelta(seconds=self.visibility_timeout),
+                        "started_at": now,
+                        "updated_at": now,
+                    },
+                    "$inc": {"attempts": 1},
+                },
+                sort=[("available_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER
+            )
+            if job is None:
+                return None
+            if job["attempts"] <= job.get("max_attempts", self.max_attempts):
+                return job
+            self.dead_letter(db, job, job.get("last_error") or "Worker lease expired on the final attempt")
+
+    def _owned(self, job: dict) -> dict:
+        """Filter matching the job only while this worker still holds its lease."""
+        return {"_id": job["_id"], "lease_token": job["lease_token"]}
+
+    def renew_lease(self, db, job: dict) -> bool:
+        """Extends the lease. False if the lease was lost (expired and claimed by another worker)."""
+        result = db[JOBS_COLLECTION].update_one(self._owned(job), {"$set": {
+            "lease_expires_at": datetime.utcnow() + timedelta(seconds=self.visibility_timeout),
+        }})
+        return result.matched_count == 1
+
+    def _finish(self, db, job: dict, status: str, fields: dict) -> bool:
+        now = datetime.utcnow()
+        result = db[JOBS_COLLECTION].update_one(self._owned(job), {
+            "$set": dict(fields, status=status, finished_at=now, updated_at=now,
+                         expires_at=now + timedelta(seconds=self.result_ttl)),
+            "$unset": {"lease_token": "", "lease_expires_at": "", "active": ""},
+        })
+        if result.matched_count == 1:
+            JOBS.inc(event=status)
+        return result.matched_count == 1
+
+    def complete(self, db, job: dict, result: dict) -> bool:
+        return self._finish(db, job, SUCCEEDED, {"result": result})
+
+    def fail(self, db, job: dict, error: str, retryable: bool = True) -> bool:
+        """Schedules a retry with backoff, or fails / dead-letters the job when retrying is pointless."""
+        if not retryable:
+            return self._finish(db, job, FAILED, {"error": error})
+        if job["attempts"] >= job.get("max_attempts", self.max_attempts):
+            return self.dead_letter(db, job, error)
+        delay = self.retry_backoff * 2 ** (job["attempts"] - 1)
+        now = datetime.utcnow()
+        result = db[JOBS_COLLECTION].update_one(self._owned(job), {
+            "$set": {"status": QUEUED, "available_at": now + timedelta(seconds=delay),
+                     "last_error": error, "updated_at": now},
+            "$unset": {"lease_token": "", "lease_expires_at": ""},
+        })
+        if result.matched_count == 1:
+            JOBS.inc(event="retried")
+            logger.warning(f"Job {job['_id']} ({job['token_id']}) attempt {job['attempts']} failed, retrying in {delay:g}s: {error}")
+        return result.matched_count == 1
+
+    def dead_letter(self, db, job: dict, error: str) -> bool:
+        if not self._finish(db, job, DEAD_LETTERED, {"error": error}):
+            return False
+        # Keep a copy for inspection after the job itself expires.
+        dead = db[JOBS_COLLECTION].find_one({"_id": job["_id"]}, {"expires_at": 0, "result": 0})
+        if dead is not None:
+            db[DEAD_LETTER_COLLECTION].replace_one({"_id": job["_id"]}, dead, upsert=True)
+        logger.error(f"Job {job['_id']} ({job['token_id']}) dead-lettered after {job['attempts']} attempts: {error}")
+        return True
+
+
+def run_analysis_job(token_id: str) -> dict:
+    """Runs one analysis and returns the same response body as GET /analyze/{token_id}."""
+    from main import perform_asset_analysis
+    from responses import build_success_response
+
+    analysis_result = perform_asset_analysis(token_id)
+    status = analysis_result.get("status")
+    if status == "Success":
+        return build_success_response(token_id, analysis_result)
+    if status == "Not Found":
+        raise PermanentJobError(f"Asset token '{token_id}' not found in system")
+    raise RuntimeError(f"Analysis failed: {analysis_result.get('details', 'Analysis failed')}")
+
+
+class JobWorker:
+    """Threads that claim and run jobs until stopped."""
+
+    def __init__(self, queue: "JobQueue" = None, concurrency: int = JOB_WORKER_CONCURRENCY,
+                 poll_seconds: float = JOB_POLL_SECONDS, handler=run_analysis_job, worker_id: str = None):
+        self.queue = queue or get_job_queue()
+        self.concurrency = max(1, concurrency)
+        self.poll_seconds = poll_seconds
+        self.handler = handler
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stop.clear()
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._run, name=f"vera-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Job worker {self.worker_id} started with {self.concurrency} runners")
+
+    def stop(self, timeout: float = None):
+        """Stops claiming jobs and waits for the running ones to finish."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        from main import get_mongodb_connection
+
+        while not self._stop.is_set():
+            try:
+                db = get_mongodb_connection()
+                if db is None:
+                    self._stop.wait(self.poll_seconds)
+                    continue
+                try:
+                    job = self.queue.claim(db, self.worker_id)
+                except PyMongoError as e:
+                    logger.warning(f"Could not claim a job: {e}")
+                    self._stop.wait(self.poll_seconds)
+                    continue
+                if job is None:
+                    self._stop.wait(self.poll_seconds)
+                    continue
+                self.process(db, job)
+            except Exception as e:
+                # A runner thread that dies silently shrinks the worker for good.
+                logger.exception(f"Job runner error: {e}")
+                self._stop.wait(self.poll_seconds)
+
+    def _renew_until(self, db, job: dict, done: threading.Event):
+        while not done.wait(self.queue.visibility_timeout / 3):
+            try:
+                if not self.queue.renew_lease(db, job):
+                    logger.warning(f"Job {job['_id']} lease lost; another worker may run it again")
+                    return
+            except PyMongoError as e:
+                logger.warning(f"Could not renew the lease of job {job['_id']}: {e}")
+
+    def process(self, db, job: dict):
+        done = threading.Event()
+        renewer = threading.Thread(target=self._renew_until, args=(db, job, done), daemon=True)
+        renewer.start()
+        logger.info(f"Job {job['_id']} ({job['token_id']}) started attempt {job['attempts']}")
+        result, error, retryable = None, None, True
+        try:
+            # A fixed label: one time series per token would grow without bound.
+            with span("job", "analyze"):
+                result = self.handler(job["token_id"])
+        except PermanentJobError as e:
+            error, retryable = str(e), False
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        done.set()
+        try:
+            if error is not None:
+                self.queue.fail(db, job, error, retryable=retryable)
+            elif self.queue.complete(db, job, result):
+                logger.info(f"Job {job['_id']} ({job['token_id']}) succeeded on attempt {job['attempts']}")
+        except PyMongoError as e:
+            # The lease expires and the job is claimed again (or dead-lettered).
+            logger.warning(f"Could not record the outcome of job {job['_id']}: {e}")
+        renewer.join()
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Returns the process-wide job queue, creating it on first use."""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue()
+    return _job_queue
+
+
+def run_worker_process(concurrency: int):
+    """Runs one worker process until SIGTERM/SIGINT, then lets the running jobs finish."""
+    stopped = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stopped.set())
+    from main import start_alert_index_sync, stop_alert_index_sync, warm_alert_index
+
+    # Index the gazette alerts before taking jobs, then keep them current.
+    warm_alert_index()
+    start_alert_index_sync()
+    worker = JobWorker(concurrency=concurrency)
+    worker.start()
+    stopped.wait()
+    logger.info(f"Job worker {worker.worker_id} stopping")
+    worker.stop()
+    stop_alert_index_sync()
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Run analysis job workers")
+    parser.add_argument("command", choices=["worker"])
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to start")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY, help="jobs per process")
+    args = parser.parse_args(argv)
+
+    if args.processes <= 1:
+        run_worker_process(args.concurrency)
+        return
+    # Spawned (not forked) children set up their own logging and MongoDB client.
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker_process, args=(args.concurrency,), name=f"vera-job-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, _frame):
+        # Each child finishes its running jobs before exiting.
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main_cli()
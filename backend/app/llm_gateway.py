@@ -0,0 +1,357 @@
+# =================================================================
+# Vira Engine - Gemini Gateway
+# =================================================================
+# Purpose: One place that talks to Gemini. The gateway holds a model
+# configured once with a native system instruction and JSON-schema
+# response mode, and wraps every call with:
+#
+# - a per-call deadline (covering retries and time spent waiting for
+#   a concurrency slot)
+# - retries with full-jitter exponential backoff on transient errors
+#   (429, 5xx, timeouts, malformed JSON)
+# - adaptive concurrency (AIMD): the number of concurrent calls grows
+#   by about one per window of successes and is halved on every 429,
+#   so throughput stays close to the quota without retry storms
+# =================================================================
+
+import os
+import json
+import time
+import random
+import threading
+
+from observability import get_logger, span
+
+logger = get_logger("llm_gateway")
+
+GEMINI_MODEL = os.getenv('VERA_GEMINI_MODEL', 'gemini-pro-latest')
+
+# Deadline for one report, including retries and waiting for a slot
+LLM_DEADLINE_SECONDS = float(os.getenv('VERA_LLM_DEADLINE_SECONDS', '90'))
+# Timeout for a single Gemini request
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv('VERA_LLM_REQUEST_TIMEOUT_SECONDS', '45'))
+LLM_MAX_RETRIES = int(os.getenv('VERA_LLM_MAX_RETRIES', '3'))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv('VERA_LLM_BACKOFF_BASE_SECONDS', '0.5'))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv('VERA_LLM_BACKOFF_MAX_SECONDS', '8'))
+
+# Adaptive concurrency bounds
+LLM_INITIAL_CONCURRENCY = int(os.getenv('VERA_LLM_INITIAL_CONCURRENCY', '4'))
+LLM_MIN_CONCURRENCY = int(os.getenv('VERA_LLM_MIN_CONCURRENCY', '1'))
+LLM_MAX_CONCURRENCY = int(os.getenv('VERA_LLM_MAX_CONCURRENCY', '32'))
+
+SYSTEM_INSTRUCTION = (
+    "You are VERA-AI, a comprehensive risk oracle for Nigerian real estate assets. Your task is to "
+    "analyze property data from multiple sources and generate a detailed structured JSON risk "
+    "assessment report.\n\n"
+    "CRITICAL: Respond ONLY with the JSON object. No markdown, no explanations, no additional text."
+)
+
+RISK_CATEGORIES = ["Title Dispute", "Financial Pledge", "Government Revocation", "No Risk Found"]
+
+# Response schema enforced by Gemini's JSON mode
+RISK_REPORT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "risk_score": {"type": "integer"},
+        "risk_category": {"type": "string", "enum": RISK_CATEGORIES},
+        "summary": {"type": "string"},
+        "evidence_summary": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "source": {"type": "string"},
+                    "result": {"type": "string"},
+                    "detail": {"type": "string"}
+                },
+                "required": ["source", "result", "detail"]
+            }
+        },
+        "data_source": {"type": "string"},
+        "property_id": {"type": "string"}
+    },
+    "required": ["risk_score", "risk_category", "summary", "evidence_summary"]
+}
+
+# Triage replies use the same schema plus the model's confidence in its verdict
+TRIAGE_REPORT_SCHEMA = {
+    "type": "object",
+    "properties": dict(RISK_REPORT_SCHEMA["properties"], confidence={"type": "number"}),
+    "required": RISK_REPORT_SCHEMA["required"] + ["confidence"]
+}
+
+
+class LLMError(Exception):
+    """Raised when the gateway cannot produce a report."""
+
+
+class LLMConfigurationError(LLMError):
+    """The Gemini API key is missing or the model cannot be configured."""
+
+
+class LLMDeadlineExceeded(LLMError):
+    """The per-call deadline passed before a valid report was received."""
+
+
+class _TransientLLMError(Exception):
+    """Internal: a failed attempt that is worth retrying."""
+
+    def __init__(self, message, throttled=False):
+        super().__init__(message)
+        self.throttled = throttled
+
+
+def _classify_error(error):
+    """Returns a _TransientLLMError for retryable SDK errors, or None."""
+    try:
+        from google.api_core import exceptions as api_exceptions
+    except ImportError:
+        return None
+    if isinstance(error, (api_exceptions.ResourceExhausted, api_exceptions.TooManyRequests)):
+        return _TransientLLMError(str(error), throttled=True)
+    if isinstance(error, (api_exceptions.ServiceUnavailable, api_exceptions.DeadlineExceeded,
+                          api_exceptions.InternalServerError)):
+        return _TransientLLMError(str(error))
+    return None
+
+
+def parse_report_json(response_text: str) -> dict:
+    """Parses a JSON report, tolerating stray ```json fences."""
+    text = response_text.strip()
+    if text.startswith("```"):
+        text = text.replace("```json", "").replace("```", "").strip()
+    result = json.loads(text)
+    if not isinstance(result, dict):
+        raise ValueError("Expected a JSON object")
+    return result
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on concurrent calls.
+
+    Each success raises the limit by 1/limit (about +1 per full window of
+    successes); each throttling response halves it, bounded by min/max.
+    """
+
+    def __init__(self, initial=LLM_INITIAL_CONCURRENCY, minimum=LLM_MIN_CONCURRENCY,
+                 maximum=LLM_MAX_CONCURRENCY):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: float) -> bool:
+        """Waits up to `timeout` seconds for a slot. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+    def on_throttled(self):
+        with self._condition:
+            self.limit = max(self.minimum, self.limit / 2.0)
+
+
+class GeminiGateway:
+    """Configured Gemini model plus deadline, retry and concurrency policy."""
+
+    def __init__(self, model_name=GEMINI_MODEL, api_key=None, system_instruction=SYSTEM_INSTRUCTION,
+                 response_schema=RISK_REPORT_SCHEMA, deadline_seconds=LLM_DEADLINE_SECONDS,
+                 request_timeout_seconds=LLM_REQUEST_TIMEOUT_SECONDS, max_retries=LLM_MAX_RETRIES,
+                 limiter=None):
+        self.model_name = model_name
+        # Read at construction time so a .env loaded after import is honoured.
+        self.api_key = api_key or os.getenv('GEMINI_API_KEY')
+        self.system_instruction = system_instruction
+        self.response_schema = response_schema
+        self.deadline_seconds = deadline_seconds
+        self.request_timeout_seconds = request_timeout_seconds
+        self.max_retries = max_retries
+        self.limiter = limiter or AdaptiveConcurrencyLimiter()
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.counters = {
+            "calls": 0,
+            "successes": 0,
+            "retries": 0,
+            "throttled": 0,
+            "failures": 0,
+            "prompt_tokens": 0,
+            "output_tokens": 0,
+        }
+        self._counters_lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key) and self.api_key != "YOUR_GOOGLE_API_KEY_HERE"
+
+    def _count(self, name, amount=1):
+        with self._counters_lock:
+            self.counters[name] += amount
+
+    def _get_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    if not self.configured:
+                        raise LLMConfigurationError("API key missing")
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(
+                        self.model_name,
+                        system_instruction=self.system_instruction,
+                        generation_config={
+                            "response_mime_type": "application/json",
+                            "response_schema": self.response_schema,
+                        }
+                    )
+                    logger.info(f"Configured model {self.model_name} with JSON response mode")
+        return self._model
+
+    def warm(self) -> bool:
+        """Imports the Gemini SDK and builds the model ahead of the first call. False if not configured."""
+        if not self.configured:
+            return False
+        self._get_model()
+        return True
+
+    def install_model(self, model):
+        """Uses a ready-made model object (e.g. the offline fake in stubs.py) instead of Gemini."""
+        with self._model_lock:
+            self._model = model
+            if not self.configured:
+                self.api_key = "offline"
+
+    def _record_usage(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self._count("prompt_tokens", getattr(usage, "prompt_token_count", 0) or 0)
+            self._count("output_tokens", getattr(usage, "candidates_token_count", 0) or 0)
+
+    def _attempt(self, prompt: str, timeout: float, on_chunk=None, response_schema=None) -> dict:
+        model = self._get_model()
+        options = {"request_options": {"timeout": timeout}}
+        if response_schema is not None:
+            options["generation_config"] = {
+                "response_mime_type": "application/json",
+                "response_schema": response_schema,
+            }
+        try:
+            with span("llm_call", self.model_name):
+                if on_chunk is None:
+                    response = model.generate_content(prompt, **options)
+                    response_text = response.text
+                else:
+                    response = model.generate_content(prompt, stream=True, **options)
+                    chunks = []
+                    for chunk in response:
+                        chunks.append(chunk.text)
+                        on_chunk(chunk.text)
+                    response_text = "".join(chunks)
+        except Exception as e:
+            transient = _classify_error(e)
+            if transient is not None:
+                raise transient from e
+            raise
+        self._record_usage(response)
+        try:
+            with span("json_parse"):
+                return parse_report_json(response_text)
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError; a malformed reply is worth one more try.
+            raise _TransientLLMError(f"Malformed JSON reply: {e}") from e
+
+    def generate_report(self, prompt: str, on_chunk=None, response_schema=None) -> dict:
+        """
+        Sends the prompt and returns the parsed JSON report.
+        `on_chunk(text)` is called for each streamed chunk if given, and
+        `response_schema` overrides the gateway's schema for this call.
+        Raises LLMError subclasses when no valid report can be produced.
+        """
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline_seconds
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.limiter.acquire(remaining):
+                break
+            try:
+                timeout = max(min(self.request_timeout_seconds, deadline - time.monotonic()), 1.0)
+                result = self._attempt(prompt, timeout, on_chunk, response_schema)
+                self.limiter.on_success()
+                self._count("successes")
+                return result
+            except _TransientLLMError as e:
+                last_error = e
+                if e.throttled:
+                    self._count("throttled")
+                    self.limiter.on_throttled()
+                logger.warning(f"Attempt {attempt + 1} failed ({e}), limit now {self.limiter.limit:.1f}")
+            except LLMError:
+                self._count("failures")
+                raise
+            except Exception as e:
+                self._count("failures")
+                raise LLMError(str(e)) from e
+            finally:
+                self.limiter.release()
+
+            if attempt < self.max_retries:
+                # Full jitter: sleep a random time up to the exponential cap.
+                backoff = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * (2 ** attempt)))
+                if time.monotonic() + backoff >= deadline:
+                    break
+                self._count("retries")
+                time.sleep(backoff)
+
+        self._count("failures")
+        if last_error is None or time.monotonic() >= deadline:
+            raise LLMDeadlineExceeded(f"No report within {self.deadline_seconds:.0f}s deadline (last error: {last_error})")
+        raise LLMError(f"Gave up after {self.max_retries + 1} attempts: {last_error}")
+
+    def stats(self) -> dict:
+        """Returns call counters, token usage and the current concurrency limit."""
+        with self._counters_lock:
+            stats = dict(self.counters)
+        stats["concurrency_limit"] = round(self.limiter.limit, 2)
+        stats["in_flight"] = self.limiter.in_flight
+        return stats
+
+
+_gateways = {}
+_gateways_lock = threading.Lock()
+
+
+def get_llm_gateway(model_name: str = GEMINI_MODEL) -> GeminiGateway:
+    """Returns the process-wide gateway for a model, creating it on first use."""
+    gateway = _gateways.get(model_name)
+    if gateway is None:
+        with _gateways_lock:
+            gateway = _gateways.get(model_name)
+            if gateway is None:
+                gateway = GeminiGateway(model_name=model_name)
+                _gateways[model_name] = gateway
+    return gateway
+
+
+def all_llm_gateways() -> list:
+    """Returns every gateway created so far (for metrics)."""
+    with _gateways_lock:
+        return list(_gateways.values())
@@ -16,11 +16,25 @@
 import os
 import json
 import sys
-import traceback
-import google.generativeai as genai  # Gemini AI SDK for risk analysis
-import pandas as pd  # For handling structured data
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+from pymongo.errors import ConnectionFailure
+
+from database import get_shared_database
+from alert_matcher import CollectionAlertMatcher
+from owner_alert_links import (
+    OWNER_ALERT_LINKS_ENABLED, get_linked_alerts, get_linked_alerts_bulk
+)
+from fallback_store import get_fallback_store
+from asset_records import METADATA_PROJECTION, REGISTRY_PROJECTION, AssetBundle, is_ingestion_error
+from deed_store import get_deed_store
+from executors import io_executor
+from report_cache import evidence_cache_key, get_report_cache
+from prescreen import PRESCREEN_ENABLED, get_prescreen_engine
+from prompt_builder import assemble_investigation_prompt
+from llm_gateway import LLMError
+from model_router import get_model_router
+from observability import ANALYSES, FALLBACKS, get_logger, span
+
+logger = get_logger("main")
 
 # ========================================
 # CONFIGURATION
@@ -29,393 +43,557 @@ from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 from dotenv import load_dotenv
 load_dotenv()
 
-# Get API keys from environment variables
-API_KEY = os.getenv('GEMINI_API_KEY')
+# Get API keys from environment variables (the Gemini key is read by llm_gateway)
 MONGO_URI = os.getenv('MONGO_URI')
 
 # Define data folders relative to this script's location (fallback for deed documents)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_FOLDER = os.path.join(BASE_DIR, "..", "nigeria_demo_data")
 
+# Packed deed store (see deed_store.py); deeds missing from it, or edited since
+# they were packed, are read from DATA_FOLDER
+DEED_STORE_PATH = os.getenv('VERA_DEED_STORE_PATH', os.path.join(BASE_DIR, "..", "deed_store"))
+
+# How often (in seconds) the in-process alert matcher pulls new alerts from MongoDB
+ALERT_SYNC_SECONDS = float(os.getenv('VERA_ALERT_SYNC_SECONDS', '30'))
+# How often (in seconds) it re-reads every alert, to pick up edited and deleted ones
+ALERT_REBUILD_SECONDS = float(os.getenv('VERA_ALERT_REBUILD_SECONDS', '600'))
+
+# Owner-name matcher over the MongoDB news_alerts collection
+mongo_alert_matcher = CollectionAlertMatcher(sync_interval=ALERT_SYNC_SECONDS, rebuild_interval=ALERT_REBUILD_SECONDS)
+
+# Version of the investigation prompt. Part of the report cache key, so
+# bump it whenever the prompt or model changes to invalidate old reports.
+PROMPT_VERSION = "vera-risk-v5"
+
 # ========================================
 # DATABASE CONNECTION
 # ========================================
 def get_mongodb_connection():
-    """Get MongoDB connection"""
-    try:
-        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=1000)  # Shorter timeout
-        client.admin.command('ping')  # Test connection
-        return client['vira_engine']
-    except Exception as e:
-        print(f"[Database] MongoDB connection timeout, using fallback: {e}")
-        return None
+    """Get the shared, pooled MongoDB database (None while MongoDB is unavailable)"""
+    with span("mongo_connect"):
+        return get_shared_database().get_db()
+
+def get_registry_search_key(metadata: dict):
+    """Returns the 'Registry Search Key' attribute from token metadata, or None"""
+    for attribute in metadata.get("attributes", []):
+        if attribute.get("trait_type") == "Registry Search Key":
+            return attribute.get("value")
+    return None
+
+def load_deed_document(token_id: str):
+    """Reads the Deed of Assignment for a token from the packed deed store or the data folder (None if missing)"""
+    deed_filename = f"{token_id}_Deed_of_Assignment.txt"
+    deed_path = os.path.join(DATA_FOLDER, deed_filename)
+    
+    with span("deed_read"):
+        deed_store = get_deed_store(DEED_STORE_PATH)
+        # The store skips a packed deed whose file in DATA_FOLDER was edited since.
+        deed_content = deed_store.read_text(token_id, deed_path) if deed_store is not None else None
+        if deed_content is not None:
+            logger.debug(f"[Ingestion] Loaded deed document for {token_id} from the deed store")
+        elif os.path.exists(deed_path):
+            with open(deed_path, 'r') as f:
+                deed_content = f.read()
+            logger.debug(f"[Ingestion] Loaded deed document: {deed_filename}")
+        else:
+            logger.warning(f"Deed document not found: {deed_filename}")
+    return deed_content
+
+def sync_mongo_alerts(news_collection, force: bool = False):
+    """Pulls new alerts from MongoDB into the owner-name matcher, unless a background thread has built and syncs it"""
+    if mongo_alert_matcher.maintained and not force:
+        return
+    with span("mongo_query", "news_alerts"):
+        mongo_alert_matcher.sync(news_collection, force=force)
+
+def get_news_alerts_collection():
+    """The news_alerts collection, or None while MongoDB is unavailable"""
+    db = get_mongodb_connection()
+    return None if db is None else db['news_alerts']
+
+def warm_alert_index() -> dict:
+    """Builds the owner-name matcher up front, so no request pays for the first full scan"""
+    news_collection = get_news_alerts_collection()
+    if news_collection is None:
+        return {"alerts": 0, "connected": False}
+    sync_mongo_alerts(news_collection, force=True)
+    return {"alerts": len(mongo_alert_matcher), "connected": True}
 
-def get_asset_data_fallback(token_id: str) -> dict:
+def start_alert_index_sync():
+    """Keeps the owner-name matcher in sync from a background thread instead of request handlers"""
+    mongo_alert_matcher.start(get_news_alerts_collection)
+
+def stop_alert_index_sync():
+    mongo_alert_matcher.stop()
+
+def find_owner_alerts(db, owner_name: str) -> list:
+    """
+    Returns the alerts mentioning an owner: the materialized links if they
+    exist for this owner, otherwise a match against the in-process matcher.
+    """
+    if not owner_name:
+        return []
+    if OWNER_ALERT_LINKS_ENABLED:
+        alerts = get_linked_alerts(db, owner_name)
+        if alerts is not None:
+            return alerts
+    sync_mongo_alerts(db['news_alerts'])
+    return mongo_alert_matcher.match_alerts(owner_name)
+
+def get_asset_data_fallback(token_id: str):
     """Fallback method using local files when MongoDB is unavailable"""
-    print(f"[Fallback Ingestion] Using local files for token_id: '{token_id}'")
+    logger.debug(f"[Fallback Ingestion] Using local files for token_id: '{token_id}'")
     
     try:
-        # Load metadata from local file
-        metadata_filename = f"{token_id}.json"
-        metadata_filepath = os.path.join(DATA_FOLDER, "metadata", metadata_filename)
+        # The deed only depends on the token id, so read it while the
+        # metadata, registry and alert lookups run.
+        deed_future = io_executor.submit(load_deed_document, token_id)
+        store = get_fallback_store(DATA_FOLDER)
         
-        if not os.path.exists(metadata_filepath):
-            print(f"[Error] Metadata file not found: {metadata_filepath}")
-            return {"error": True, "message": "Asset not found"}
+        # Load metadata from the local store
+        metadata = store.get_metadata(token_id)
         
-        with open(metadata_filepath, 'r') as f:
-            metadata = json.load(f)
+        if metadata is None:
+            logger.error(f"Metadata file not found for token_id: '{token_id}'")
+            return {"error": True, "message": "Asset not found"}
         
         # Extract registry key
-        registry_key = None
-        for attribute in metadata.get("attributes", []):
-            if attribute.get("trait_type") == "Registry Search Key":
-                registry_key = attribute.get("value")
-                break
+        registry_key = get_registry_search_key(metadata)
         
         if not registry_key:
             return {"error": True, "message": "Registry key missing"}
         
-        # Load registry data from CSV
-        registry_csv_path = os.path.join(DATA_FOLDER, "Nigerian_Land_Registry_Mock.csv")
-        registry_df = pd.read_csv(registry_csv_path)
-        registry_row = registry_df[registry_df['c_of_o_id'] == registry_key]
+        # Look up registry data in the indexed registry
+        registry_record = store.get_registry_record(registry_key)
         
-        if registry_row.empty:
+        if registry_record is None:
             return {"error": True, "message": "Registry record not found"}
         
-        registry_record = registry_row.iloc[0].to_dict()
-        
-        # Load news data
-        news_path = os.path.join(DATA_FOLDER, "Nigerian_Gazette_Alerts.json")
-        with open(news_path, 'r') as f:
-            all_news = json.load(f)
-        
         # Find relevant news
         owner_name = registry_record.get('owner_name', '')
-        relevant_news = [alert for alert in all_news if owner_name and owner_name in alert.get('summary', '')]
+        relevant_news = store.find_alerts_for_owner(owner_name)
         
-        # Load deed document
-        deed_filename = f"{token_id}_Deed_of_Assignment.txt"
-        deed_path = os.path.join(DATA_FOLDER, deed_filename)
-        
-        if os.path.exists(deed_path):
-            with open(deed_path, 'r') as f:
-                deed_content = f.read()
-        else:
-            deed_content = f"Deed document for {token_id} not available."
+        # Collect the deed document read in parallel
+        deed_content = deed_future.result()
         
-        print(f"[Fallback Ingestion] Successfully loaded data from local files")
+        logger.debug(f"[Fallback Ingestion] Successfully loaded data from local files")
         
-        return {
-            "token_id": token_id,
-            "metadata": metadata,
-            "registry_record": registry_record,
-            "news_alerts": relevant_news,
-            "deed_content": deed_content,
-            "registry_key": registry_key,
-            "data_source": "local_files"
-        }
+        return AssetBundle.from_documents(
+            token_id, registry_key, registry_record, relevant_news, deed_content, "local_files"
+        )
         
     except Exception as e:
-        print(f"[Error] Fallback ingestion failed: {e}")
+        logger.error(f"Fallback ingestion failed: {e}")
         return {"error": True, "message": f"Fallback failed: {str(e)}"}
 
 # ========================================
 # --- Task 2.1: MongoDB Data Ingestion Module ---
 # ========================================
-def get_asset_data_from_mongodb(token_id: str) -> dict:
-    """Retrieves all necessary data for a given asset token ID from MongoDB with fallback."""
-    print(f"\n[MongoDB Ingestion] Received request for token_id: '{token_id}'")
+def get_asset_data_from_mongodb(token_id: str):
+    """
+    Retrieves all necessary data for a given asset token ID from MongoDB with fallback.
+    Returns an AssetBundle, or an {"error": True, "message": ...} dict.
+    """
+    logger.debug(f"[MongoDB Ingestion] Received request for token_id: '{token_id}'")
     
     # Connect to MongoDB
     db = get_mongodb_connection()
     if db is None:
-        print("[Warning] Could not connect to MongoDB, falling back to local files")
+        logger.warning("Could not connect to MongoDB, falling back to local files")
+        FALLBACKS.inc(reason="mongo_unavailable")
         return get_asset_data_fallback(token_id)
     
     try:
+        # The deed read does not depend on the metadata or registry
+        # lookups, so start it in parallel.
+        deed_future = io_executor.submit(load_deed_document, token_id)
+        
         # Get property metadata from MongoDB
         metadata_collection = db['property_metadata']
-        metadata = metadata_collection.find_one({"token_id": token_id})
+        with span("mongo_query", "property_metadata"):
+            metadata = metadata_collection.find_one({"token_id": token_id}, METADATA_PROJECTION)
+        get_shared_database().record_success()
         
         if not metadata:
-            print(f"[Error] Property metadata not found for token_id: '{token_id}'")
+            logger.error(f"Property metadata not found for token_id: '{token_id}'")
             return {"error": True, "message": "Asset not found"}
         
-        print(f"[MongoDB Ingestion] Found metadata for {token_id}")
+        logger.debug(f"[MongoDB Ingestion] Found metadata for {token_id}")
         
         # Extract registry search key from metadata
-        registry_key = None
-        for attribute in metadata.get("attributes", []):
-            if attribute.get("trait_type") == "Registry Search Key":
-                registry_key = attribute.get("value")
-                break
+        registry_key = get_registry_search_key(metadata)
         
         if not registry_key:
-            print("[Error] Registry search key not found in metadata")
+            logger.error("Registry search key not found in metadata")
             return {"error": True, "message": "Registry key missing"}
         
         # Get registry data from MongoDB
         registry_collection = db['land_registry']
-        registry_record = registry_collection.find_one({"c_of_o_id": registry_key})
+        with span("mongo_query", "land_registry"):
+            registry_record = registry_collection.find_one({"c_of_o_id": registry_key}, REGISTRY_PROJECTION)
         
         if not registry_record:
-            print(f"[Error] Registry record not found for key: '{registry_key}'")
+            logger.error(f"Registry record not found for key: '{registry_key}'")
             return {"error": True, "message": "Registry record not found"}
         
-        print(f"[MongoDB Ingestion] Found registry record for {registry_key}")
+        logger.debug(f"[MongoDB Ingestion] Found registry record for {registry_key}")
         
         # Get news alerts from MongoDB
-        news_collection = db['news_alerts']
         owner_name = registry_record.get('owner_name', '')
         
         # Find relevant news alerts mentioning the owner
-        relevant_news = []
-        if owner_name:
-            news_cursor = news_collection.find({
-                "$or": [
-                    {"summary": {"$regex": owner_name, "$options": "i"}},
-                    {"headline": {"$regex": owner_name, "$options": "i"}}
-                ]
-            })
-            relevant_news = list(news_cursor)
-        
-        print(f"[MongoDB Ingestion] Found {len(relevant_news)} relevant news alerts")
-        
-        # Get deed document (still from file system for now)
-        deed_content = ""
-        deed_filename = f"{token_id}_Deed_of_Assignment.txt"
-        deed_path = os.path.join(DATA_FOLDER, deed_filename)
-        
-        if os.path.exists(deed_path):
-            with open(deed_path, 'r') as f:
-                deed_content = f.read()
-            print(f"[MongoDB Ingestion] Loaded deed document: {deed_filename}")
-        else:
-            print(f"[Warning] Deed document not found: {deed_filename}")
-            deed_content = f"Deed document for {token_id} not available."
+        relevant_news = find_owner_alerts(db, owner_name)
+        
+        logger.debug(f"[MongoDB Ingestion] Found {len(relevant_news)} relevant news alerts")
+        
+        # Get deed document (packed deed store, or the data folder)
+        deed_content = deed_future.result()
         
         # Compile all data
-        asset_data = {
-            "token_id": token_id,
-            "metadata": metadata,
-            "registry_record": registry_record,
-            "news_alerts": relevant_news,
-            "deed_content": deed_content,
-            "registry_key": registry_key,
-            "data_source": "mongodb"
-        }
-        
-        print("[MongoDB Ingestion] Successfully compiled all asset data from MongoDB")
+        asset_data = AssetBundle.from_documents(
+            token_id, registry_key, registry_record, relevant_news, deed_content, "mongodb"
+        )
+        
+        logger.debug("[MongoDB Ingestion] Successfully compiled all asset data from MongoDB")
         return asset_data
         
+    except ConnectionFailure as e:
+        # Covers server selection timeouts and dropped connections. Count it
+        # against the circuit breaker and serve this request from local files.
+        logger.warning(f"MongoDB connection failed mid-request, falling back to local files: {e}")
+        get_shared_database().record_failure()
+        FALLBACKS.inc(reason="connection_failure")
+        return get_asset_data_fallback(token_id)
+        
     except Exception as e:
-        print(f"[Error] Failed to retrieve data from MongoDB: {e}")
-        traceback.print_exc()
+        logger.exception(f"Failed to retrieve data from MongoDB: {e}")
         return {"error": True, "message": f"Database query failed: {str(e)}"}
 
 # ========================================
-# --- Task 2.2: AI Investigation Module (Using Gemini ChatSession) ---
+# --- Bulk Ingestion (Batch Analysis) ---
 # ========================================
-def run_llm_investigation_with_mongodb(token_id: str) -> dict:
-    """Performs the AI Investigation using MongoDB data and Gemini ChatSession method."""
-    print(f"\n[LLM Investigator] Starting MongoDB-powered investigation for token_id: '{token_id}'")
+def get_assets_data_bulk(token_ids: list) -> dict:
+    """
+    Retrieves asset data for many tokens at once. Uses one `$in` query per
+    collection instead of one `find_one` per token, and reads deeds in
+    parallel. Returns {token_id: AssetBundle}; per-token problems are
+    reported as error dicts in the same shape as `get_asset_data_from_mongodb`.
+    """
+    logger.info(f"[Bulk Ingestion] Received request for {len(token_ids)} tokens")
+    deed_futures = {token_id: io_executor.submit(load_deed_document, token_id) for token_id in token_ids}
+    
+    db = get_mongodb_connection()
+    if db is None:
+        logger.warning("Could not connect to MongoDB, falling back to local files")
+        FALLBACKS.inc(len(token_ids), reason="mongo_unavailable")
+        return _get_assets_data_bulk_fallback(token_ids, deed_futures)
+    
+    try:
+        with span("mongo_query", "property_metadata"):
+            metadata_by_token = {
+                metadata['token_id']: metadata
+                for metadata in db['property_metadata'].find({"token_id": {"$in": list(token_ids)}}, METADATA_PROJECTION)
+            }
+        get_shared_database().record_success()
+        
+        registry_keys = {}
+        for token_id, metadata in metadata_by_token.items():
+            registry_key = get_registry_search_key(metadata)
+            if registry_key:
+                registry_keys[token_id] = registry_key
+        
+        with span("mongo_query", "land_registry"):
+            registry_by_key = {
+                record['c_of_o_id']: record
+                for record in db['land_registry'].find(
+                    {"c_of_o_id": {"$in": list(set(registry_keys.values()))}}, REGISTRY_PROJECTION
+                )
+            }
+        
+        owner_names = {record.get('owner_name', '') for record in registry_by_key.values()}
+        linked_alerts = {}
+        if OWNER_ALERT_LINKS_ENABLED:
+            linked_alerts = get_linked_alerts_bulk(db, owner_names)
+        if any(owner_name and owner_name not in linked_alerts for owner_name in owner_names):
+            sync_mongo_alerts(db['news_alerts'])
+        
+        results = {}
+        for token_id in token_ids:
+            metadata = metadata_by_token.get(token_id)
+            registry_key = registry_keys.get(token_id)
+            registry_record = registry_by_key.get(registry_key)
+            if metadata is None:
+                results[token_id] = {"error": True, "message": "Asset not found"}
+            elif not registry_key:
+                results[token_id] = {"error": True, "message": "Registry key missing"}
+            elif registry_record is None:
+                results[token_id] = {"error": True, "message": "Registry record not found"}
+            else:
+                owner_name = registry_record.get('owner_name', '')
+                alerts = linked_alerts.get(owner_name) if owner_name in linked_alerts else (
+                    mongo_alert_matcher.match_alerts(owner_name) if owner_name else []
+                )
+                results[token_id] = AssetBundle.from_documents(
+                    token_id, registry_key, registry_record, alerts, deed_futures[token_id].result(), "mongodb"
+                )
+        
+        logger.debug(f"[Bulk Ingestion] Compiled asset data for {len(results)} tokens from MongoDB")
+        return results
+        
+    except ConnectionFailure as e:
+        logger.warning(f"MongoDB connection failed mid-request, falling back to local files: {e}")
+        get_shared_database().record_failure()
+        FALLBACKS.inc(len(token_ids), reason="connection_failure")
+        return _get_assets_data_bulk_fallback(token_ids, deed_futures)
     
-    # --- 1. Configure the API Key ---
+    except Exception as e:
+        logger.exception(f"Bulk retrieval from MongoDB failed: {e}")
+        return {token_id: {"error": True, "message": f"Database query failed: {str(e)}"} for token_id in token_ids}
+
+def _get_assets_data_bulk_fallback(token_ids: list, deed_futures: dict) -> dict:
+    """Bulk variant of `get_asset_data_fallback` backed by the indexed local store"""
+    results = {}
     try:
-        if not API_KEY or API_KEY == "YOUR_GOOGLE_API_KEY_HERE":
-            print("[Error] Google API Key is missing. Please edit the script and paste your key.")
-            return {"error": True, "message": "API key missing"}
-        genai.configure(api_key=API_KEY)
+        store = get_fallback_store(DATA_FOLDER)
+        for token_id in token_ids:
+            metadata = store.get_metadata(token_id)
+            registry_key = get_registry_search_key(metadata) if metadata is not None else None
+            registry_record = store.get_registry_record(registry_key) if registry_key else None
+            if metadata is None:
+                results[token_id] = {"error": True, "message": "Asset not found"}
+            elif not registry_key:
+                results[token_id] = {"error": True, "message": "Registry key missing"}
+            elif registry_record is None:
+                results[token_id] = {"error": True, "message": "Registry record not found"}
+            else:
+                results[token_id] = AssetBundle.from_documents(
+                    token_id, registry_key, registry_record,
+                    store.find_alerts_for_owner(registry_record.get('owner_name', '')),
+                    deed_futures[token_id].result(), "local_files"
+                )
     except Exception as e:
-        print(f"[Error] Failed to configure Gemini: {e}")
-        traceback.print_exc()
-        return {"error": True, "message": f"Gemini configuration failed: {str(e)}"}
-
-    # --- 2. Get Asset Data from MongoDB ---
-    asset_data = get_asset_data_from_mongodb(token_id)
-    if asset_data.get("error"):
-        return asset_data  # Return the error from MongoDB ingestion
+        logger.error(f"Bulk fallback ingestion failed: {e}")
+        for token_id in token_ids:
+            results.setdefault(token_id, {"error": True, "message": f"Fallback failed: {str(e)}"})
     
+    logger.debug(f"[Bulk Ingestion] Compiled asset data for {len(results)} tokens from local files")
+    return results
+
+# ========================================
+# --- Task 2.2: AI Investigation Module (Using Gemini ChatSession) ---
+# ========================================
+def report_progress(progress, stage: str, **data):
+    """
+    Sends a progress event to the optional `progress(stage, data)` callback.
+    Used by the streaming API; a failing callback never breaks the analysis.
+    """
+    if progress is None:
+        return
     try:
-        # Extract data from MongoDB results
-        deed_content = asset_data['deed_content']
-        registry_record = asset_data['registry_record']
-        news_alerts = asset_data['news_alerts']
-        
-        # Format registry data for AI analysis
-        registry_content = f"""
-Property Registration Details:
-- Certificate of Occupancy ID: {registry_record.get('c_of_o_id')}
-- Plot Number: {registry_record.get('plot_number')}
-- Block Number: {registry_record.get('block_number')}
-- Area: {registry_record.get('area_name')}
-- State: {registry_record.get('state')}
-- Owner Name: {registry_record.get('owner_name')}
-- Date Registered: {registry_record.get('date_registered')}
-- Status: {registry_record.get('status')}
-"""
-        
-        # Format news content for AI analysis
-        if news_alerts:
-            news_content = "Relevant News Alerts:\n"
-            for alert in news_alerts:
-                news_content += f"""
-Alert ID: {alert.get('alert_id', 'N/A')}
-Date: {alert.get('date', 'N/A')}
-Source: {alert.get('source', 'N/A')}
-Category: {alert.get('category', 'N/A')}
-Headline: {alert.get('headline', 'N/A')}
-Summary: {alert.get('summary', 'N/A')}
----
-"""
-        else:
-            news_content = "No relevant news alerts found for this property owner."
-        
-        print(f"[LLM Investigator] Prepared data from MongoDB:")
-        print(f"  - Deed document: {len(deed_content)} characters")
-        print(f"  - Registry record: {registry_record.get('owner_name')} in {registry_record.get('area_name')}")
-        print(f"  - News alerts: {len(news_alerts)} relevant alerts")
+        progress(stage, data)
+    except Exception as e:
+        logger.warning(f"[Progress] Failed to report stage '{stage}': {e}")
+
+def build_evidence_bundle(token_id: str, asset_data: AssetBundle) -> dict:
+    """
+    Normalizes ingested asset data into the evidence sent to the AI.
+    Only the fields the prompt uses are kept, so the bundle is a stable
+    cache key for the report.
+    """
+    data_source_info = "MongoDB database" if asset_data.data_source == "mongodb" else "local files (MongoDB unavailable)"
+    return {
+        "token_id": token_id,
+        "data_source": data_source_info,
+        "registry": asset_data.registry.to_dict(),
+        "alerts": [alert.to_dict() for alert in asset_data.alerts],
+        "deed": asset_data.deed_content if asset_data.deed_loaded else f"Deed document for {token_id} not available."
+    }
+
+def run_llm_investigation_with_mongodb(token_id: str, asset_data: AssetBundle = None, progress=None) -> dict:
+    """
+    Performs the AI Investigation using MongoDB data and the Gemini gateway.
+    If `asset_data` is given (e.g. from bulk ingestion), ingestion is skipped.
+    If `progress` is given, stage events are reported to it and the Gemini
+    response is streamed chunk by chunk.
+    """
+    result, investigation = prepare_llm_investigation(token_id, asset_data, progress)
+    if result is not None:
+        return result
+    return run_model_investigation(token_id, investigation, progress)
+
+def prepare_llm_investigation(token_id: str, asset_data: AssetBundle = None, progress=None):
+    """
+    Everything before the Gemini call: ingestion, the pre-screen and the
+    report cache. Returns (result, None) if one of them settled the
+    investigation, otherwise (None, investigation) for `run_model_investigation`.
+    """
+    logger.info(f"[LLM Investigator] Starting MongoDB-powered investigation for token_id: '{token_id}'")
+    
+    # --- 1. Get Asset Data from MongoDB ---
+    if asset_data is None:
+        asset_data = get_asset_data_from_mongodb(token_id)
+    if is_ingestion_error(asset_data):
+        return asset_data, None  # Return the error from MongoDB ingestion
+    
+    try:
+        evidence = build_evidence_bundle(token_id, asset_data)
+        registry = asset_data.registry
+        logger.debug(
+            f"[LLM Investigator] Prepared data: deed {len(asset_data.deed_content or '')} characters, "
+            f"registry record {registry.owner_name} in {registry.area_name}, "
+            f"{len(asset_data.alerts)} relevant news alerts"
+        )
+        
+        report_progress(
+            progress, "data_ingested",
+            data_source=evidence["data_source"],
+            registry=evidence["registry"],
+            alerts=evidence["alerts"],
+            deed_length=len(asset_data.deed_content or '')
+        )
         
     except Exception as e:
-        print(f"[Error] Failed to process MongoDB data: {e}")
-        traceback.print_exc()
-        return {"error": True, "message": f"Data processing failed: {str(e)}"}
+        logger.exception(f"Failed to process MongoDB data: {e}")
+        return {"error": True, "message": f"Data processing failed: {str(e)}"}, None
+
+    # --- 2. Rule-based pre-screen: skip the AI for clear-cut clean assets ---
+    prescreen = None
+    if PRESCREEN_ENABLED:
+        try:
+            prescreen_engine = get_prescreen_engine()
+            with span("prescreen"):
+                prescreen = prescreen_engine.evaluate(evidence, deed_loaded=asset_data.deed_loaded)
+            if prescreen.verdict is not None:
+                result = prescreen_engine.build_report(token_id, evidence, prescreen)
+                logger.info(f"[LLM Investigator] Pre-screen verdict for {token_id}: {prescreen.verdict} (AI call skipped)")
+                report_progress(progress, "prescreen_verdict", risk_category=prescreen.verdict, confidence=prescreen.confidence)
+                ANALYSES.inc(path="rules_prescreen")
+                return result, None
+            logger.info(f"[LLM Investigator] Pre-screen found {len(prescreen.signals)} risk signals, escalating to AI")
+        except Exception as e:
+            logger.warning(f"Pre-screen failed, continuing with AI analysis: {e}", exc_info=True)
 
-    # --- 3. Start a Chat Session with the AI ---
+    # --- Reuse a previous report if the evidence is unchanged ---
+    report_cache = get_report_cache()
+    with span("report_cache_lookup"):
+        cache_key = evidence_cache_key(evidence, PROMPT_VERSION)
+        cached_report = report_cache.get(cache_key)
+    if cached_report is not None:
+        logger.info(f"[LLM Investigator] Report cache hit for {token_id} (key {cache_key[:12]}...)")
+        report_progress(progress, "report_cached", cache_key=cache_key)
+        ANALYSES.inc(path="report_cache")
+        return cached_report, None
+    return None, {"evidence": evidence, "prescreen": prescreen, "cache_key": cache_key}
+
+def run_model_investigation(token_id: str, investigation: dict, progress=None) -> dict:
+    """The Gemini call for an investigation the pre-screen and the report cache did not settle."""
+    evidence = investigation["evidence"]
+    prescreen = investigation["prescreen"]
+    cache_key = investigation["cache_key"]
+
+    # --- 3. Check the Gemini gateway is configured ---
+    router = get_model_router()
+    if not router.configured:
+        logger.error("Google API Key is missing. Please set GEMINI_API_KEY.")
+        return {"error": True, "message": "API key missing"}
+
+    # --- 4. Send the Data to AI: fast model first, pro model on escalation ---
+    # The gateways' models carry the system instruction and JSON response
+    # schema, and apply the deadline, retry and concurrency policy.
     try:
-        print("[LLM Investigator] Initializing Gemini model and chat session...")
-        # Use latest pro model
-        model = genai.GenerativeModel('gemini-pro-latest')
-        
-        system_instruction = """
-        You are VERA-AI, a comprehensive risk oracle for Nigerian real estate assets. Your task is to analyze property data from multiple sources and generate a detailed structured JSON risk assessment report.
-        
-        CRITICAL: Respond ONLY with the JSON object. No markdown, no explanations, no additional text.
-        """
-        
-        chat = model.start_chat(history=[
-            {'role': 'user', 'parts': [system_instruction]},
-            {'role': 'model', 'parts': ["Understood. I will only respond with the specified JSON object."]}
-        ])
-
-        # --- 4. Send the Data to AI with Enhanced Prompt ---
-        data_source_info = "MongoDB database" if asset_data.get("data_source") == "mongodb" else "local files (MongoDB unavailable)"
-        
-        # Prepare structured data for AI analysis
-        registry_data_json = {
-            "c_of_o_id": registry_record.get('c_of_o_id'),
-            "plot_number": registry_record.get('plot_number'),
-            "block_number": registry_record.get('block_number'),
-            "area_name": registry_record.get('area_name'),
-            "state": registry_record.get('state'),
-            "owner_name": registry_record.get('owner_name'),
-            "date_registered": registry_record.get('date_registered'),
-            "status": registry_record.get('status')
-        }
-        
-        # Format news alerts as structured data
-        news_data_json = []
-        for alert in news_alerts:
-            news_data_json.append({
-                "alert_id": alert.get('alert_id', 'N/A'),
-                "date": alert.get('date', 'N/A'),
-                "source": alert.get('source', 'N/A'),
-                "category": alert.get('category', 'N/A'),
-                "headline": alert.get('headline', 'N/A'),
-                "summary": alert.get('summary', 'N/A')
-            })
-        
-        # Deed content as structured data
-        deed_data_json = {
-            "document_type": "Deed of Assignment",
-            "property_id": token_id,
-            "content_length": len(deed_content),
-            "full_content": deed_content[:2000] + "..." if len(deed_content) > 2000 else deed_content  # Truncate if too long
-        }
-        
-        prompt = f"""
-You are VERA-AI, a professional risk oracle for Nigerian real estate assets. Your task is to analyze the provided data from three sources and generate a realistic structured JSON report for property {token_id}.
-
-CONTEXT: Nigerian real estate carries inherent risks due to complex land laws, documentation challenges, and regulatory environment. Even the cleanest properties should reflect baseline investment risks.
-
---- INSTRUCTIONS ---
-1. Assess the risk based on all three data sources.
-2. The 'risk_score' must be an integer using these REALISTIC ranges:
-   - "No Risk Found": 15-25 (Even clean properties have baseline market/regulatory risks)
-   - "Financial Pledge": 45-65 (Moderate risk due to financial encumbrances)
-   - "Title Dispute": 70-85 (High risk due to ownership conflicts)
-   - "Government Revocation": 80-95 (Very high risk due to potential seizure)
-3. The 'risk_category' must be one of: "Title Dispute", "Financial Pledge", "Government Revocation", or "No Risk Found".
-4. The 'summary' must be a concise, one-paragraph explanation of your findings and why this risk score was assigned.
-5. The 'evidence_summary' must detail the findings from each of the three sources.
-6. IMPORTANT: Always assign realistic risk scores that reflect real-world property investment risks.
-7. Data retrieved from: {data_source_info}
-
---- NIGERIAN PROPERTY DATA ---
-1. NIGERIAN LAND REGISTRY DATA: {json.dumps(registry_data_json)}
-2. DEED OF ASSIGNMENT DOCUMENT: {json.dumps(deed_data_json)}
-3. NIGERIAN GAZETTE ALERTS: {json.dumps(news_data_json)}
-
---- RISK SCORING EXAMPLES ---
-- Property with clear title, recent registration, no news alerts: Risk Score 18-22
-- Property with financial encumbrance mentioned in deed: Risk Score 50-60
-- Property with ownership disputes in deed/news: Risk Score 75-82
-- Property with government acquisition notices: Risk Score 85-92
-
---- REQUIRED JSON OUTPUT FORMAT ---
-Provide only the JSON object, nothing else.
-{{
-    "risk_score": <integer>,
-    "risk_category": "<string>",
-    "summary": "<string>",
-    "evidence_summary": [
-        {{"source": "Nigerian Land Registry", "result": "Success/Failure", "detail": "<string>"}},
-        {{"source": "Deed of Assignment", "result": "Success/Failure", "detail": "<string>"}},
-        {{"source": "Nigerian Gazette Alerts", "result": "Success/Failure", "detail": "<string>"}}
-    ],
-    "data_source": "{data_source_info}",
-    "property_id": "{token_id}"
-}}
-"""
-        
-        print("[LLM Investigator] Sending structured data to VERA-AI via chat...")
-        response = chat.send_message(prompt)
-        
-        response_text = response.text.strip()
-        print(f"[LLM Investigator] Received enhanced response: {response_text[:200]}...")
-        
-        # Clean up the response
-        json_text = response_text.replace("```json", "").replace("```", "").strip()
-        
-        # Parse the enhanced JSON response
-        result = json.loads(json_text)
+        # Alerts are ranked by relevance and packed into the prompt budget.
+        with span("prompt_build"):
+            assembly = assemble_investigation_prompt(token_id, evidence)
+        prompt = assembly.prompt
+        if assembly.alerts_dropped:
+            logger.info(f"[LLM Investigator] Prompt budget: dropped {len(assembly.alerts_dropped)} lower-relevance alerts")
+        
+        has_risk_signals = prescreen is not None and prescreen.has_risk_signals
+        first_model = router.triage_model if router.enabled and not has_risk_signals else router.escalation_model
+        logger.info(f"[LLM Investigator] Sending structured data to VERA-AI ({first_model})...")
+        report_progress(progress, "llm_started", model=first_model, prompt_length=len(prompt))
+        on_chunk = on_escalate = None
+        if progress is not None:
+            # Stream the reply so the client can render it as it arrives.
+            on_chunk = lambda text: report_progress(progress, "llm_token", text=text)
+            on_escalate = lambda reason: report_progress(
+                progress, "llm_escalated", model=router.escalation_model, reason=reason
+            )
+        result = router.investigate(prompt, has_risk_signals, on_chunk=on_chunk, on_escalate=on_escalate)
         
         # Ensure backward compatibility by adding the old format
         if "risk_category" in result:
             result["potential_risk_type"] = result["risk_category"]
-        
-        print(f"[LLM Investigator] Risk Score: {result.get('risk_score', 'N/A')}")
-        print(f"[LLM Investigator] Risk Category: {result.get('risk_category', 'N/A')}")
-        
+        result["analysis_path"] = "llm"
+        result["prompt_budget"] = assembly.summary()
+        
+        logger.info(
+            f"[LLM Investigator] Risk Score: {result.get('risk_score', 'N/A')}, "
+            f"Category: {result.get('risk_category', 'N/A')}"
+        )
+        report_progress(
+            progress, "llm_completed",
+            risk_score=result.get('risk_score'), risk_category=result.get('risk_category')
+        )
+        
+        get_report_cache().put(cache_key, result, token_id)
+        ANALYSES.inc(path=f"llm_{result['model_routing']['tier']}")
         return result
 
+    except LLMError as e:
+        logger.error(f"Gemini gateway could not produce a report: {e}")
+        return {"error": True, "message": f"AI analysis failed: {str(e)}"}
     except Exception as e:
-        print(f"\n[Error] An error occurred during the Gemini chat session: {e}")
-        traceback.print_exc()
+        logger.exception(f"An error occurred during the AI analysis: {e}")
         return {"error": True, "message": f"AI analysis failed: {str(e)}"}
 
 # ========================================
 # --- Task 2.3: Create Core Analysis Function ---
 # ========================================
-def perform_asset_analysis(token_id: str) -> dict:
+def perform_asset_analysis(token_id: str, asset_data: AssetBundle = None, progress=None) -> dict:
     """
     Orchestrates the full asset risk analysis for a given token_id.
     This function acts as the main entry point for the API.
+    Pass `asset_data` to analyze data that was already ingested, and
+    `progress` to receive stage events (see `report_progress`).
     """
-    print(f"\n[Core Analysis] Starting full analysis for token_id: '{token_id}'")
-    
+    logger.info(f"[Core Analysis] Starting full analysis for token_id: '{token_id}'")
+    final_report = build_final_report(token_id, lambda: run_llm_investigation_with_mongodb(token_id, asset_data, progress))
+    logger.info(f"[Core Analysis] Analysis complete for {token_id}.")
+    return final_report
+
+def prepare_asset_analysis(token_id: str, asset_data: AssetBundle = None, progress=None):
+    """
+    The part of `perform_asset_analysis` that never calls Gemini. Returns
+    (final_report, None) if ingestion, the pre-screen or the report cache
+    settled the analysis, otherwise (None, investigation) for
+    `complete_asset_analysis`. The API calls the two halves separately so
+    that only the Gemini call waits for an admission slot.
+    """
+    logger.info(f"[Core Analysis] Starting full analysis for token_id: '{token_id}'")
+    pending = []
+
+    def investigate():
+        result, investigation = prepare_llm_investigation(token_id, asset_data, progress)
+        if result is None:
+            pending.append(investigation)
+        return result
+
+    final_report = build_final_report(token_id, investigate)
+    if pending:
+        return None, pending[0]
+    logger.info(f"[Core Analysis] Analysis complete for {token_id}.")
+    return final_report, None
+
+def complete_asset_analysis(token_id: str, investigation: dict, progress=None) -> dict:
+    """Runs the Gemini call of an analysis `prepare_asset_analysis` left open."""
+    final_report = build_final_report(token_id, lambda: run_model_investigation(token_id, investigation, progress))
+    logger.info(f"[Core Analysis] Analysis complete for {token_id}.")
+    return final_report
+
+def build_final_report(token_id: str, investigate) -> dict:
+    """Runs `investigate()` (returning an LLM investigator result) and wraps it in the final report format."""
     # Start with a default "failed" report structure.
     # This ensures we always return a consistent format, even on error.
     final_report = {
@@ -427,16 +605,16 @@ def perform_asset_analysis(token_id: str) -> dict:
 
     try:
         # Call the MongoDB-powered LLM investigator function.
-        llm_result = run_llm_investigation_with_mongodb(token_id)
+        llm_result = investigate()
         
         # Check for errors returned from the investigator.
         if llm_result and "error" in llm_result:
             final_report["details"] = llm_result.get("message", "LLM investigation failed.")
             # Specifically check for the "Asset not found" error to set the status correctly.
-            if llm_result.get("message") == "Asset not found.":
+            if llm_result.get("message") == "Asset not found":
                 final_report["status"] = "Not Found"
                 final_report["risk_assessment"]["potential_risk_type"] = "Asset Not Found"
-            print(f"[Core Analysis] LLM investigation failed: {final_report['details']}")
+            logger.warning(f"[Core Analysis] LLM investigation failed: {final_report['details']}")
 
         # Check if the result from the LLM is valid and successful.
         elif llm_result and ("potential_risk_type" in llm_result or "risk_category" in llm_result):
@@ -455,15 +633,13 @@ def perform_asset_analysis(token_id: str) -> dict:
             final_report["status"] = "Partial Success"
             final_report["risk_assessment"] = {"potential_risk_type": "Unknown Risk"}
             final_report["details"] = "LLM investigation returned an unexpected or empty result."
-            print(f"[Core Analysis] Warning: LLM result was unexpected: {llm_result}")
+            logger.warning(f"[Core Analysis] LLM result was unexpected: {llm_result}")
 
     except Exception as e:
         # Catch any critical errors during the process.
         final_report["details"] = f"Critical error during LLM investigation: {e}"
-        print(f"[Core Analysis] Critical error: {e}")
-        traceback.print_exc()
+        logger.exception(f"[Core Analysis] Critical error: {e}")
 
-    print(f"[Core Analysis] Analysis complete for {token_id}.")
     return final_report
 
 # ========================================
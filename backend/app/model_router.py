@@ -0,0 +1,145 @@
+# =================================================================
+# Vira Engine - Tiered Model Routing
+# =================================================================
+# Purpose: Most assets come back as "No Risk Found" in the 15-25 band,
+# so sending every token to the pro model wastes latency and cost.
+# A fast model triages each case with the same prompt and schema (plus
+# a confidence value); the pro model is only called when the case
+# needs depth:
+#
+# - the evidence already contains risk signals (from the pre-screen)
+# - the fast verdict is anything other than "No Risk Found"
+# - the fast model's confidence is below the threshold
+# - the fast model could not produce a report at all
+# =================================================================
+
+import os
+import threading
+
+from llm_gateway import GEMINI_MODEL, LLMError, TRIAGE_REPORT_SCHEMA, get_llm_gateway
+from observability import get_logger
+
+logger = get_logger("model_router")
+
+TIERED_ROUTING_ENABLED = os.getenv('VERA_TIERED_ROUTING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+TRIAGE_MODEL = os.getenv('VERA_TRIAGE_MODEL', 'gemini-flash-latest')
+ESCALATION_MODEL = os.getenv('VERA_ESCALATION_MODEL', GEMINI_MODEL)
+# Triage verdicts below this confidence (0-1) are escalated
+TRIAGE_MIN_CONFIDENCE = float(os.getenv('VERA_TRIAGE_MIN_CONFIDENCE', '0.8'))
+
+# The only triage verdict that may be accepted without escalation
+TRIAGE_ACCEPTED_CATEGORY = "No Risk Found"
+
+ESCALATION_REASONS = ("risk_signals", "risk_verdict", "low_confidence", "triage_failed")
+
+
+class ModelRouter:
+    """Runs the fast triage model and escalates to the pro model when needed."""
+
+    def __init__(self, triage_model=TRIAGE_MODEL, escalation_model=ESCALATION_MODEL,
+                 min_confidence=TRIAGE_MIN_CONFIDENCE, enabled=TIERED_ROUTING_ENABLED):
+        self.triage_model = triage_model
+        self.escalation_model = escalation_model
+        self.min_confidence = min_confidence
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.counters = {
+            "analyses": 0,
+            "triage_calls": 0,
+            "triage_accepted": 0,
+            "escalations": 0,
+        }
+        self.escalation_reasons = {reason: 0 for reason in ESCALATION_REASONS}
+
+    @property
+    def configured(self) -> bool:
+        return get_llm_gateway(self.escalation_model).configured
+
+    def warm(self) -> dict:
+        """Prepares the gateways this router calls. Returns {model: configured}."""
+        models = [self.triage_model, self.escalation_model] if self.enabled else [self.escalation_model]
+        return {model: get_llm_gateway(model).warm() for model in dict.fromkeys(models)}
+
+    def _count(self, name, reason=None):
+        with self._lock:
+            self.counters[name] += 1
+            if reason is not None:
+                self.escalation_reasons[reason] += 1
+
+    def _triage_escalation_reason(self, report: dict):
+        if report.get("risk_category") != TRIAGE_ACCEPTED_CATEGORY:
+            return "risk_verdict"
+        try:
+            confidence = float(report.get("confidence"))
+        except (TypeError, ValueError):
+            return "low_confidence"
+        if confidence < self.min_confidence:
+            return "low_confidence"
+        return None
+
+    def investigate(self, prompt: str, has_risk_signals: bool, on_chunk=None, on_escalate=None) -> dict:
+        """
+        Returns the report for a prompt, annotated with a `model_routing`
+        entry describing which tier produced it and why.
+        `on_escalate(reason)` is called before the pro model is used.
+        Raises LLMError if the pro model fails.
+        """
+        self._count("analyses")
+        routing = {"triage_model": None, "triage_confidence": None, "escalation_reason": None}
+
+        reason = None
+        if not self.enabled:
+            pass
+        elif has_risk_signals:
+            # The triage verdict would be escalated anyway; save the call.
+            reason = "risk_signals"
+        else:
+            self._count("triage_calls")
+            routing["triage_model"] = self.triage_model
+            try:
+                report = get_llm_gateway(self.triage_model).generate_report(
+                    prompt, on_chunk=on_chunk, response_schema=TRIAGE_REPORT_SCHEMA
+                )
+                routing["triage_confidence"] = report.get("confidence")
+                reason = self._triage_escalation_reason(report)
+                if reason is None:
+                    self._count("triage_accepted")
+                    report.pop("confidence", None)
+                    report["model_routing"] = dict(routing, model=self.triage_model, tier="fast")
+                    return report
+            except LLMError as e:
+                logger.warning(f"Triage with {self.triage_model} failed: {e}")
+                reason = "triage_failed"
+
+        if reason is not None:
+            self._count("escalations", reason)
+            routing["escalation_reason"] = reason
+            logger.info(f"Escalating to {self.escalation_model} ({reason})")
+            if on_escalate is not None:
+                on_escalate(reason)
+
+        report = get_llm_gateway(self.escalation_model).generate_report(prompt, on_chunk=on_chunk)
+        report["model_routing"] = dict(routing, model=self.escalation_model, tier="pro")
+        return report
+
+    def stats(self) -> dict:
+        """Returns triage/escalation counters and the escalation rate."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["escalation_reasons"] = dict(self.escalation_reasons)
+        stats["escalation_rate"] = round(stats["escalations"] / stats["analyses"], 4) if stats["analyses"] else 0.0
+        return stats
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Returns the process-wide model router, creating it on first use."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
@@ -0,0 +1,244 @@
+# =================================================================
+# Vira Engine - Logging, Timing Spans and Metrics
+# =================================================================
+# Purpose: Replace synchronous print() logging on the request path and
+# record where each request's time goes.
+#
+# - Logging: records are handed to a bounded queue and written to stdout
+#   by a background listener thread, so request threads never block on
+#   I/O. If the queue is full, records are dropped and counted.
+# - Spans: `with span("deed_read"):` times a stage into the
+#   vera_stage_duration_seconds histogram.
+# - Metrics: a small Prometheus-compatible registry (counters,
+#   histograms and collector callbacks) rendered by GET /metrics.
+# =================================================================
+
+import os
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv('VERA_LOG_LEVEL', 'INFO').upper()
+LOG_QUEUE_SIZE = int(os.getenv('VERA_LOG_QUEUE_SIZE', '10000'))
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Default latency buckets (seconds), from sub-millisecond stages to LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+# ========================================
+# METRICS
+# ========================================
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            samples = [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+        return [(self.name, "counter", self.documentation, samples)]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def collect(self):
+        samples = []
+        with self._lock:
+            series_items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in series_items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", dict(labels, le=_format_value(float(bound))), cumulative))
+            samples.append((f"{self.name}_bucket", dict(labels, le="+Inf"), series[-1]))
+            samples.append((f"{self.name}_sum", labels, series[-2]))
+            samples.append((f"{self.name}_count", labels, series[-1]))
+        return [(self.name, "histogram", self.documentation, samples)]
+
+
+class MetricsRegistry:
+    """
+    Holds metrics and collector callbacks and renders the Prometheus text format.
+
+    A collector is a function returning a list of
+    (name, type, help, [(sample_name, labels, value), ...]) families, used
+    for values that live elsewhere (cache counters, LLM usage, breaker state).
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            sources = [metric.collect for metric in self._metrics] + list(self._collectors)
+        lines = []
+        for source in sources:
+            try:
+                families = source()
+            except Exception as e:
+                get_logger("metrics").warning(f"Metrics collector failed: {e}")
+                continue
+            for name, metric_type, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for sample_name, labels, value in samples:
+                    lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_DURATION = REGISTRY.histogram(
+    "vera_stage_duration_seconds", "Time spent in each analysis stage", ("stage", "detail")
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "vera_http_request_duration_seconds", "HTTP request latency until the response starts",
+    ("method", "route", "status")
+)
+FALLBACKS = REGISTRY.counter(
+    "vera_fallback_total", "Requests served from local files instead of MongoDB", ("reason",)
+)
+ANALYSES = REGISTRY.counter(
+    "vera_analysis_total", "Completed analyses by the path that produced the report", ("path",)
+)
+REFRESHES = REGISTRY.counter(
+    "vera_refresh_total", "Background report refreshes by trigger and outcome", ("trigger", "outcome")
+)
+JOBS = REGISTRY.counter(
+    "vera_jobs_total", "Analysis job queue events by kind", ("event",)
+)
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    "vera_log_records_dropped_total", "Log records dropped because the log queue was full"
+)
+
+
+@contextmanager
+def span(stage: str, detail: str = ""):
+    """Times the enclosed block into vera_stage_duration_seconds{stage, detail}."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.observe(elapsed, stage=stage, detail=detail)
+        _span_logger.debug(f"{stage}{'/' + detail if detail else ''} took {elapsed * 1000:.2f} ms")
+
+
+# ========================================
+# NON-BLOCKING LOGGING
+# ========================================
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when full."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """Routes the `vera` loggers through a queue to a background stdout writer (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is not None:
+            return
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root = logging.getLogger("vera")
+        root.setLevel(level)
+        root.addHandler(_DroppingQueueHandler(log_queue))
+        root.propagate = False
+        _listener = QueueListener(log_queue, stream_handler)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Returns the `vera.<name>` logger, configuring queued logging on first use."""
+    configure_logging()
+    return logging.getLogger(f"vera.{name}")
+
+
+_span_logger = logging.getLogger("vera.spans")
@@ -0,0 +1,354 @@
+# =================================================================
+# Vira Engine - Materialized Owner -> Alert Links
+# =================================================================
+# Purpose: Precompute which gazette alerts mention which registry owners
+# when alerts are ingested, instead of matching the owner name against
+# the alerts on every request.
+#
+# Collection `owner_alert_links`, one document per owner name:
+#   {_id: "<normalized owner name>", owner_name, alert_ids: [...],
+#    alerts: [{alert_id, date, source, category, headline, summary}], updated_at}
+#
+# The request path then reads an owner's alerts with a single `_id`
+# lookup. Maintenance is incremental:
+# - New alerts are matched once against the owner names (phrase match,
+#   see alert_matcher.py) and added with $addToSet.
+# - Changed alerts are removed from the owners that linked them (found
+#   through the `alert_ids` index) and linked again.
+# - New or renamed owners get a link document computed from the alerts.
+# Links are keyed by owner name, so the same name on several registry
+# records shares one document and existing links never need rewriting
+# when a record changes hands.
+#
+# API workers catch up on inserted alerts from a background thread
+# (`start()`), never from request handling. The `ingest_state` document
+# marks the links as built, even over an empty alert collection. The
+# watermark only sees inserted alerts, so edited and deleted alerts are
+# picked up by a full rebuild every `rebuild_interval` seconds; the time
+# of the last rebuild is kept in `ingest_state` too, so one process per
+# interval does it.
+#
+# Rebuild or catch up from the command line with:
+#   python app/owner_alert_links.py rebuild
+#   python app/owner_alert_links.py sync
+# =================================================================
+
+import os
+import sys
+import time
+import threading
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from alert_matcher import AlertMatcher, CollectionAlertMatcher, tokenize
+from observability import get_logger, span
+
+logger = get_logger("owner_alert_links")
+
+OWNER_ALERT_LINKS_ENABLED = os.getenv('VERA_OWNER_ALERT_LINKS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# How often (in seconds) the background thread links alerts added since the last sync
+OWNER_LINK_SYNC_SECONDS = float(os.getenv('VERA_OWNER_LINK_SYNC_SECONDS', '30'))
+# How often (in seconds) the links are rebuilt from all alerts, to pick up edits and deletions (0 = never)
+OWNER_LINK_REBUILD_SECONDS = float(os.getenv('VERA_OWNER_LINK_REBUILD_SECONDS', '600'))
+
+OWNER_ALERT_LINKS_COLLECTION = 'owner_alert_links'
+INGEST_STATE_COLLECTION = 'ingest_state'
+ALERT_SNAPSHOT_FIELDS = ("alert_id", "date", "source", "category", "headline", "summary")
+
+
+def owner_key(owner_name: str) -> str:
+    """Returns the link document key for an owner name (names that match alike share a key)."""
+    return " ".join(tokenize(owner_name or ""))
+
+
+def alert_snapshot(alert: dict) -> dict:
+    return {field: alert[field] for field in ALERT_SNAPSHOT_FIELDS if field in alert}
+
+
+# ========================================
+# REQUEST PATH
+# ========================================
+def get_linked_alerts(db, owner_name: str):
+    """Returns the alerts linked to an owner, or None if no links exist for that owner yet."""
+    key = owner_key(owner_name)
+    if not key:
+        return []
+    with span("mongo_query", OWNER_ALERT_LINKS_COLLECTION):
+        document = db[OWNER_ALERT_LINKS_COLLECTION].find_one({"_id": key}, {"alerts": 1})
+    return None if document is None else document.get("alerts", [])
+
+
+def get_linked_alerts_bulk(db, owner_names) -> dict:
+    """Returns {owner_name: alerts} for the owners that have links, in one `$in` query."""
+    keys = {owner_name: owner_key(owner_name) for owner_name in owner_names if owner_name}
+    if not keys:
+        return {}
+    with span("mongo_query", OWNER_ALERT_LINKS_COLLECTION):
+        documents = {
+            document["_id"]: document.get("alerts", [])
+            for document in db[OWNER_ALERT_LINKS_COLLECTION].find(
+                {"_id": {"$in": list(set(keys.values()))}}, {"alerts": 1}
+            )
+        }
+    return {owner_name: documents[key] for owner_name, key in keys.items() if key in documents}
+
+
+# ========================================
+# INCREMENTAL MAINTENANCE
+# ========================================
+class OwnerAlertLinker:
+    """Keeps `owner_alert_links` up to date as alerts and owners change."""
+
+    def __init__(self, sync_interval: float = OWNER_LINK_SYNC_SECONDS,
+                 rebuild_interval: float = OWNER_LINK_REBUILD_SECONDS):
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        # Every alert, for computing the links of new owners
+        self._all_alerts = CollectionAlertMatcher(sync_interval=0)
+        self._last_sync = 0.0
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def owner_names(self, db) -> list:
+        return [name for name in db['land_registry'].distinct("owner_name") if name]
+
+    def _add_links(self, db, links: dict) -> int:
+        """Adds {owner_name: [alerts]} to the link documents."""
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"_id": owner_key(owner_name)},
+                {
+                    "$addToSet": {
+                        "alert_ids": {"$each": [alert["alert_id"] for alert in alerts]},
+                        "alerts": {"$each": [alert_snapshot(alert) for alert in alerts]},
+                    },
+                    "$set": {"owner_name": owner_name, "updated_at": now},
+                },
+                upsert=True
+            )
+            for owner_name, alerts in links.items() if alerts
+        ]
+        if operations:
+            db[OWNER_ALERT_LINKS_COLLECTION].bulk_write(operations, ordered=False)
+        return sum(len(alerts) for alerts in links.values())
+
+    def link_alerts(self, db, alerts: list, owner_names=None) -> int:
+        """
+        Links new alerts to every owner they mention. Returns the number of links added.
+
+        The alerts are indexed on their own, so each owner name costs a
+        few dictionary lookups rather than a scan of the alert corpus.
+        """
+        alerts = [alert for alert in alerts if alert.get("alert_id")]
+        if not alerts:
+            return 0
+        with span("owner_link", "alerts"):
+            batch = AlertMatcher(alerts)
+            links = {}
+            for owner_name in owner_names if owner_names is not None else self.owner_names(db):
+                matched = batch.match_alerts(owner_name)
+                if matched:
+                    links[owner_name] = matched
+            added = self._add_links(db, links)
+        self._all_alerts.add_alerts(alerts)
+        return added
+
+    def unlink_alerts(self, db, alert_ids: list) -> int:
+        """Removes alerts from the owners that link them. Returns the number of owners updated."""
+        alert_ids = set(alert_ids)
+        if not alert_ids:
+            return 0
+        collection = db[OWNER_ALERT_LINKS_COLLECTION]
+        updated = 0
+        for document in collection.find({"alert_ids": {"$in": list(alert_ids)}}, {"alert_ids": 1, "alerts": 1}):
+            collection.update_one({"_id": document["_id"]}, {"$set": {
+                "alert_ids": [alert_id for alert_id in document.get("alert_ids", []) if alert_id not in alert_ids],
+                "alerts": [alert for alert in document.get("alerts", []) if alert.get("alert_id") not in alert_ids],
+                "updated_at": datetime.utcnow(),
+            }})
+            updated += 1
+        return updated
+
+    def update_alerts(self, db, alerts: list, owner_names=None) -> int:
+        """Re-links alerts that may have been added or edited. Returns the number of links added."""
+        self.unlink_alerts(db, [alert.get("alert_id") for alert in alerts if alert.get("alert_id")])
+        return self.link_alerts(db, alerts, owner_names)
+
+    def link_owners(self, db, owner_names, only_missing: bool = False) -> int:
+        """
+        Computes the link documents of the given owners from all alerts.
+        With `only_missing`, owners that already have a link document are
+        skipped (their links do not depend on which record they own).
+        Returns the number of owners written.
+        """
+        names_by_key = {}
+        for owner_name in owner_names:
+            key = owner_key(owner_name)
+            if key:
+                names_by_key.setdefault(key, owner_name)
+        if not names_by_key:
+            return 0
+        collection = db[OWNER_ALERT_LINKS_COLLECTION]
+        if only_missing:
+            existing = {document["_id"] for document in collection.find({"_id": {"$in": list(names_by_key)}}, {"_id": 1})}
+            names_by_key = {key: name for key, name in names_by_key.items() if key not in existing}
+            if not names_by_key:
+                return 0
+        with span("owner_link", "owners"):
+            self._all_alerts.sync(db['news_alerts'], force=True)
+            now = datetime.utcnow()
+            operations = []
+            for key, owner_name in names_by_key.items():
+                alerts = [alert_snapshot(alert) for alert in self._all_alerts.match_alerts(owner_name)]
+                operations.append(UpdateOne(
+                    {"_id": key},
+                    {"$set": {
+                        "owner_name": owner_name,
+                        "alert_ids": [alert["alert_id"] for alert in alerts],
+                        "alerts": alerts,
+                        "updated_at": now,
+                    }},
+                    upsert=True
+                ))
+            collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    # --- Catch-up by watermark ---
+    def _state(self, db):
+        """The sync state, or None if the links have never been built."""
+        return db[INGEST_STATE_COLLECTION].find_one({"_id": OWNER_ALERT_LINKS_COLLECTION})
+
+    def _set_watermark(self, db, last_alert_id, rebuilt: bool = False):
+        now = datetime.utcnow()
+        update = {"last_alert_id": last_alert_id, "updated_at": now}
+        if rebuilt:
+            update["rebuilt_at"] = now
+        db[INGEST_STATE_COLLECTION].update_one(
+            {"_id": OWNER_ALERT_LINKS_COLLECTION}, {"$set": update}, upsert=True
+        )
+
+    def _claim_rebuild(self, db, state: dict) -> bool:
+        """True if a periodic rebuild is due and this process won it from the others."""
+        if self.rebuild_interval <= 0:
+            return False
+        rebuilt_at = state.get("rebuilt_at")
+        now = datetime.utcnow()
+        if rebuilt_at is not None and (now - rebuilt_at).total_seconds() < self.rebuild_interval:
+            return False
+        result = db[INGEST_STATE_COLLECTION].update_one(
+            {"_id": OWNER_ALERT_LINKS_COLLECTION, "rebuilt_at": rebuilt_at},
+            {"$set": {"rebuilt_at": now}}
+        )
+        return result.modified_count == 1
+
+    def sync_due(self) -> bool:
+        return time.monotonic() - self._last_sync >= self.sync_interval
+
+    def sync(self, db, force: bool = False) -> int:
+        """
+        Links alerts inserted since the last sync, at most once every
+        `sync_interval` seconds. Returns the number of links added.
+        If the links have never been built, or the periodic rebuild is
+        due, rebuilds them instead.
+        """
+        if not force and not self.sync_due():
+            return 0
+        if not self._sync_lock.acquire(blocking=force):
+            return 0
+        try:
+            state = self._state(db)
+            if state is None or self._claim_rebuild(db, state):
+                self.rebuild(db)
+                self._last_sync = time.monotonic()
+                return 0
+            # A null watermark means the links were built before any alert existed.
+            last_id = state.get("last_alert_id")
+            query = {} if last_id is None else {"_id": {"$gt": last_id}}
+            new_alerts = list(db['news_alerts'].find(query, CollectionAlertMatcher.PROJECTION).sort("_id", 1))
+            added = 0
+            if new_alerts:
+                added = self.link_alerts(db, new_alerts)
+                self._set_watermark(db, new_alerts[-1]["_id"])
+                logger.info(f"Linked {len(new_alerts)} new alerts to owners ({added} links)")
+            self._last_sync = time.monotonic()
+            return added
+        finally:
+            self._sync_lock.release()
+
+    def rebuild(self, db) -> int:
+        """
+        Recomputes every owner's links from the current alerts, drops the
+        links of owners no longer in the registry and resets the watermark.
+        Returns the number of owners.
+        """
+        last = list(db['news_alerts'].find({}, {"_id": 1}).sort("_id", -1).limit(1))
+        # Re-read every alert: the incremental index never sees edits or deletions.
+        self._all_alerts.rebuild(db['news_alerts'])
+        owner_names = self.owner_names(db)
+        owners = self.link_owners(db, owner_names)
+        keys = list({owner_key(owner_name) for owner_name in owner_names})
+        db[OWNER_ALERT_LINKS_COLLECTION].delete_many({"_id": {"$nin": keys}})
+        # Written even without alerts, so the next sync does not rebuild again.
+        self._set_watermark(db, last[0]["_id"] if last else None, rebuilt=True)
+        logger.info(f"Rebuilt alert links for {owners} owners")
+        return owners
+
+    # --- Background catch-up ---
+    def start(self, get_db):
+        """Syncs in a background thread now and then every `sync_interval` seconds."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(get_db,), name="vera-owner-links", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self, get_db):
+        while True:
+            try:
+                db = get_db()
+                if db is not None:
+                    self.sync(db, force=True)
+            except Exception as e:
+                logger.warning(f"Owner link sync failed: {e}")
+            if self._stop.wait(self.sync_interval):
+                return
+
+
+_linker = None
+_linker_lock = threading.Lock()
+
+
+def get_owner_alert_linker() -> OwnerAlertLinker:
+    """Returns the process-wide linker, creating it on first use."""
+    global _linker
+    if _linker is None:
+        with _linker_lock:
+            if _linker is None:
+                _linker = OwnerAlertLinker()
+    return _linker
+
+
+if __name__ == "__main__":
+    from database import ViraDatabase
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("rebuild", "sync"):
+        print("Usage: python app/owner_alert_links.py rebuild|sync")
+        sys.exit(1)
+    database = ViraDatabase()
+    try:
+        linker = OwnerAlertLinker()
+        if sys.argv[1] == "rebuild":
+            print(f"Rebuilt links for {linker.rebuild(database.db)} owners")
+        else:
+            print(f"Added {linker.sync(database.db, force=True)} links")
+    finally:
+        database.close_connection()
@@ -0,0 +1,230 @@
+# =================================================================
+# Vira Engine - Rule-Based Pre-Screen
+# =================================================================
+# Purpose: Most tokens are clean: a "Verified" registry record, no
+# matched gazette alerts and a deed without encumbrance or dispute
+# language. This module checks the evidence bundle against configurable
+# keyword/phrase rules before the LLM is called, and produces a report
+# in the same schema as the AI for clear-cut clean cases, so those
+# never pay for a Gemini round trip.
+#
+# Key Features:
+# - Phrase rules per risk category over deed text and alert text
+# - Negation handling ("no identified encumbrances" is not a hit, but
+#   "Plot No 12 is held as collateral" is)
+# - A clean verdict only for a deed that was actually loaded
+# - Registry status and alert category rules
+# - Rules overridable with a JSON file (VERA_PRESCREEN_RULES_PATH)
+# =================================================================
+
+import os
+import re
+import json
+
+PRESCREEN_ENABLED = os.getenv('VERA_PRESCREEN_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+PRESCREEN_RULES_PATH = os.getenv('VERA_PRESCREEN_RULES_PATH')
+
+DEFAULT_RULES = {
+    "version": "prescreen-v2",
+    # Registry statuses that count as a clean title.
+    "clean_registry_statuses": ["Verified"],
+    # Registry statuses that point at a specific risk category.
+    "risk_registry_statuses": {
+        "Under Dispute": "Title Dispute",
+        "Pledged as Collateral": "Financial Pledge",
+        "Revoked": "Government Revocation"
+    },
+    # Alert categories that point at a specific risk category.
+    "risk_alert_categories": {
+        "Legal Notice": "Title Dispute",
+        "Corporate Finance": "Financial Pledge",
+        "Government Notice": "Government Revocation"
+    },
+    # Phrases that signal a risk category when found in deed or alert text.
+    "risk_phrases": {
+        "Title Dispute": [
+            "dispute", "litigation", "lawsuit", "suit", "competing claim",
+            "adverse claim", "caveat", "injunction", "court order"
+        ],
+        "Financial Pledge": [
+            "collateral", "mortgage", "pledge", "pledged", "lien", "encumbrance",
+            "charge in favour of", "loan", "security interest"
+        ],
+        "Government Revocation": [
+            "revoke", "revoked", "revocation", "acquisition", "compulsory acquisition",
+            "seizure", "overriding public interest"
+        ]
+    },
+    # A phrase directly governed by one of these (at most `negation_window_tokens`
+    # words before it, with no scope breaker in between) is not a hit. Commas and
+    # list conjunctions carry the cue over a list ("no liens, disputes or
+    # acquisition risks"). "No" followed by a number is the abbreviation in
+    # "Plot No 12", not a negation.
+    "negation_cues": ["no", "not", "without", "free of", "free from", "nil", "none", "neither", "nor"],
+    "negation_list_conjunctions": ["or", "nor"],
+    "negation_scope_breakers": ["but", "however", "although", "though", "except", "whereas", "yet"],
+    "negation_window_tokens": 4,
+    # The clean verdict is only issued with at most this many matched alerts.
+    "max_alerts_for_clean": 0,
+    "clean_risk_score": 20
+}
+
+
+_LINE_BREAK_PATTERN = re.compile(r"\n\s*(?:\n|[-*\u2022])")
+_WORD_PATTERN = re.compile(r"[\w'#]+|,")
+_NUMBER_PATTERN = re.compile(r"#?\d")
+
+
+def load_rules(path: str = None) -> dict:
+    """Returns the default rules, overlaid with the JSON file at `path` if given."""
+    rules = dict(DEFAULT_RULES)
+    if path:
+        with open(path, 'r') as f:
+            rules.update(json.load(f))
+    return rules
+
+
+class PrescreenResult:
+    """Outcome of the pre-screen: signals found and, if clear-cut, a verdict."""
+    __slots__ = ("verdict", "confidence", "signals")
+
+    def __init__(self, verdict, confidence, signals):
+        self.verdict = verdict          # risk category, or None if the LLM must decide
+        self.confidence = confidence    # 0.0 - 1.0
+        self.signals = signals          # list of {"source", "category", "evidence"}
+
+    @property
+    def has_risk_signals(self) -> bool:
+        return bool(self.signals)
+
+
+class PrescreenEngine:
+    """Applies the pre-screen rules to an evidence bundle (see `main.build_evidence_bundle`)."""
+
+    def __init__(self, rules: dict = None):
+        self.rules = rules or load_rules(PRESCREEN_RULES_PATH)
+        self.version = self.rules.get("version", "custom")
+        self._phrase_patterns = [
+            (category, phrase, re.compile(r"\b" + re.escape(phrase.lower()) + r"(?:s|es|d|ed)?\b"))
+            for category, phrases in self.rules["risk_phrases"].items()
+            for phrase in phrases
+        ]
+        self._cues = sorted((tuple(cue.lower().split()) for cue in self.rules["negation_cues"]), key=len, reverse=True)
+        self._list_separators = {","} | set(self.rules.get("negation_list_conjunctions", ()))
+        self._scope_breakers = set(self.rules.get("negation_scope_breakers", ()))
+        self._window = self.rules["negation_window_tokens"]
+
+    def _is_negated(self, text: str, start: int) -> bool:
+        # Only look back within the current clause and a few words.
+        sentence_start = max(text.rfind(mark, 0, start) for mark in (".", ";", ":")) + 1
+        words = _WORD_PATTERN.findall(text[sentence_start:start])
+        distance = 0
+        for position in range(len(words) - 1, -1, -1):
+            word = words[position]
+            if word in self._scope_breakers:
+                return False
+            for cue in self._cues:
+                if tuple(words[max(position - len(cue) + 1, 0):position + 1]) != cue:
+                    continue
+                next_word = words[position + 1] if position + 1 < len(words) else ""
+                if cue == ("no",) and _NUMBER_PATTERN.match(next_word):
+                    continue  # "Plot No 12", "Certificate No #443"
+                return True
+            if word in self._list_separators:
+                distance = 0
+                continue
+            distance += 1
+            if distance >= self._window:
+                return False
+        return False
+
+    def find_phrase_signals(self, text: str, source: str) -> list:
+        """Returns the un-negated risk phrases found in a piece of text."""
+        signals = []
+        # Bullets and blank lines end a sentence; other line breaks are just wrapping.
+        lowered = _LINE_BREAK_PATTERN.sub(". ", (text or "").lower()).replace("\n", " ")
+        for category, phrase, pattern in self._phrase_patterns:
+            for match in pattern.finditer(lowered):
+                if not self._is_negated(lowered, match.start()):
+                    signals.append({"source": source, "category": category, "evidence": phrase})
+                    break
+        return signals
+
+    def evaluate(self, evidence: dict, *, deed_loaded: bool) -> PrescreenResult:
+        """
+        Collects risk signals and returns a verdict only for clear-cut clean assets.
+        Without a loaded deed (`deed_loaded=False`) there is nothing to vouch for,
+        so the decision is always left to the LLM.
+        """
+        signals = []
+        status = evidence["registry"].get("status")
+        if status in self.rules["risk_registry_statuses"]:
+            signals.append({
+                "source": "Nigerian Land Registry",
+                "category": self.rules["risk_registry_statuses"][status],
+                "evidence": f"status '{status}'"
+            })
+
+        for alert in evidence["alerts"]:
+            category = self.rules["risk_alert_categories"].get(alert.get("category"))
+            if category:
+                signals.append({
+                    "source": "Nigerian Gazette Alerts",
+                    "category": category,
+                    "evidence": f"{alert.get('alert_id')} ({alert.get('category')})"
+                })
+            signals.extend(self.find_phrase_signals(
+                f"{alert.get('headline', '')}. {alert.get('summary', '')}", "Nigerian Gazette Alerts"
+            ))
+
+        signals.extend(self.find_phrase_signals(evidence["deed"], "Deed of Assignment"))
+
+        clean = (
+            deed_loaded
+            and not signals
+            and status in self.rules["clean_registry_statuses"]
+            and len(evidence["alerts"]) <= self.rules["max_alerts_for_clean"]
+        )
+        if clean:
+            return PrescreenResult("No Risk Found", 0.95, signals)
+        return PrescreenResult(None, 0.0, signals)
+
+    def build_report(self, token_id: str, evidence: dict, result: PrescreenResult) -> dict:
+        """Builds a report in the same schema as the AI investigator's output."""
+        registry = evidence["registry"]
+        alert_count = len(evidence["alerts"])
+        return {
+            "risk_score": self.rules["clean_risk_score"],
+            "risk_category": result.verdict,
+            "summary": (
+                f"Property {token_id} ({registry.get('c_of_o_id')}) is registered as "
+                f"'{registry.get('status')}' to {registry.get('owner_name')}. The deed of assignment "
+                f"contains no encumbrance, dispute or revocation language and no gazette alerts "
+                f"mention the owner. Only baseline Nigerian market and regulatory risk applies."
+            ),
+            "evidence_summary": [
+                {"source": "Nigerian Land Registry", "result": "Success",
+                 "detail": f"Record {registry.get('c_of_o_id')} found with status '{registry.get('status')}', "
+                           f"registered {registry.get('date_registered')} in {registry.get('area_name')}, {registry.get('state')}."},
+                {"source": "Deed of Assignment", "result": "Success",
+                 "detail": "No encumbrance, dispute or revocation language found in the deed."},
+                {"source": "Nigerian Gazette Alerts", "result": "Success",
+                 "detail": f"{alert_count} gazette alerts mention the owner."}
+            ],
+            "data_source": evidence["data_source"],
+            "property_id": token_id,
+            "potential_risk_type": result.verdict,
+            "analysis_path": "rules_prescreen",
+            "prescreen": {"rules_version": self.version, "confidence": result.confidence}
+        }
+
+
+_engine = None
+
+
+def get_prescreen_engine() -> PrescreenEngine:
+    """Returns the process-wide pre-screen engine, loading its rules on first use."""
+    global _engine
+    if _engine is None:
+        _engine = PrescreenEngine()
+    return _engine
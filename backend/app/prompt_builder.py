@@ -0,0 +1,240 @@
+# =================================================================
+# Vira Engine - Investigation Prompt Assembly
+# =================================================================
+# Purpose: Builds the Gemini investigation prompt from an evidence
+# bundle while keeping its size bounded. A common owner name can match
+# hundreds of gazette alerts, so alerts are ranked by relevance and the
+# evidence is packed greedily into a configurable token budget; what
+# did not fit is reported instead of silently cut.
+#
+# Alert relevance combines:
+# - name-match strength (owner in headline vs. summary, C-of-O/plot mentioned)
+# - category (legal, revocation, finance notices rank above general news)
+# - recency (exponential decay with a configurable half-life)
+# - source (official gazettes and courts rank above general outlets)
+# =================================================================
+
+import os
+import re
+import json
+import math
+from datetime import date, datetime
+
+from alert_matcher import tokenize
+
+# Total budget (estimated tokens) for the evidence sections of the prompt
+PROMPT_EVIDENCE_TOKEN_BUDGET = int(os.getenv('VERA_PROMPT_EVIDENCE_TOKEN_BUDGET', '3000'))
+
+# Upper bound for the deed excerpt within that budget
+PROMPT_DEED_TOKEN_BUDGET = int(os.getenv('VERA_PROMPT_DEED_TOKEN_BUDGET', '1000'))
+
+# Half-life (days) used to decay the relevance of older alerts
+ALERT_RECENCY_HALF_LIFE_DAYS = float(os.getenv('VERA_ALERT_RECENCY_HALF_LIFE_DAYS', '365'))
+
+# Rough size estimate used for budgeting: about 4 characters per token
+CHARS_PER_TOKEN = 4
+
+SCORE_WEIGHTS = {"name": 0.4, "category": 0.3, "recency": 0.2, "source": 0.1}
+
+CATEGORY_RELEVANCE = {
+    "Legal Notice": 1.0,
+    "Government Notice": 1.0,
+    "Corporate Finance": 0.9,
+    "Economic Development": 0.5,
+}
+DEFAULT_CATEGORY_RELEVANCE = 0.2
+
+# Words in an alert that make it relevant whatever its category says
+RISK_TERMS_PATTERN = re.compile(
+    r"\b(?:revocation|revoked|acquisition|dispute|litigation|lawsuit|court|collateral|mortgage|loan|lien)\b"
+)
+
+OFFICIAL_SOURCE_PATTERN = re.compile(r"\b(?:gazette|court|ministry|agency|government)\b", re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for budgeting (no tokenizer round trip)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _contains_phrase(text: str, phrase: str) -> bool:
+    """True if the phrase's word tokens appear contiguously in the text."""
+    phrase_tokens = tokenize(phrase)
+    text_tokens = tokenize(text)
+    size = len(phrase_tokens)
+    if not size:
+        return False
+    return any(text_tokens[i:i + size] == phrase_tokens for i in range(len(text_tokens) - size + 1))
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def score_alert(alert: dict, registry: dict, reference_date: date = None) -> float:
+    """Returns a 0-1 relevance score of an alert for a registry record."""
+    reference_date = reference_date or date.today()
+    headline = alert.get('headline', '') or ''
+    summary = alert.get('summary', '') or ''
+    text = f"{headline} {summary}"
+
+    # Name-match strength: the owner in the headline beats the summary, and a
+    # mention of this exact C-of-O or plot makes the alert property-specific.
+    owner_name = registry.get('owner_name') or ''
+    name_score = 0.0
+    if owner_name:
+        name_score = 0.7 if _contains_phrase(headline, owner_name) else 0.5
+    c_of_o_id = registry.get('c_of_o_id')
+    if c_of_o_id and c_of_o_id.lower() in text.lower():
+        name_score = 1.0
+    elif registry.get('plot_number') is not None and f"plot {registry.get('plot_number')}" in text.lower():
+        name_score = max(name_score, 0.85)
+
+    category_score = CATEGORY_RELEVANCE.get(alert.get('category'), DEFAULT_CATEGORY_RELEVANCE)
+    if RISK_TERMS_PATTERN.search(text.lower()):
+        category_score = max(category_score, 0.8)
+
+    alert_date = _parse_date(alert.get('date'))
+    if alert_date is None:
+        recency_score = 0.5
+    else:
+        age_days = max((reference_date - alert_date).days, 0)
+        recency_score = 0.5 ** (age_days / ALERT_RECENCY_HALF_LIFE_DAYS)
+
+    source_score = 1.0 if OFFICIAL_SOURCE_PATTERN.search(alert.get('source', '') or '') else 0.5
+
+    return round(
+        SCORE_WEIGHTS["name"] * name_score
+        + SCORE_WEIGHTS["category"] * category_score
+        + SCORE_WEIGHTS["recency"] * recency_score
+        + SCORE_WEIGHTS["source"] * source_score,
+        4
+    )
+
+
+class PromptAssembly:
+    """The assembled prompt plus a record of what was included and dropped."""
+    __slots__ = ("prompt", "estimated_tokens", "alerts_included", "alerts_dropped", "deed_truncated")
+
+    def __init__(self, prompt, estimated_tokens, alerts_included, alerts_dropped, deed_truncated):
+        self.prompt = prompt
+        self.estimated_tokens = estimated_tokens
+        self.alerts_included = alerts_included
+        self.alerts_dropped = alerts_dropped
+        self.deed_truncated = deed_truncated
+
+    def summary(self) -> dict:
+        """Compact description of the budget decisions, attached to the report."""
+        return {
+            "estimated_prompt_tokens": self.estimated_tokens,
+            "alerts_included": len(self.alerts_included),
+            "alerts_dropped": self.alerts_dropped,
+            "deed_truncated": self.deed_truncated,
+        }
+
+
+def assemble_investigation_prompt(token_id: str, evidence: dict,
+                                  token_budget: int = PROMPT_EVIDENCE_TOKEN_BUDGET,
+                                  deed_token_budget: int = PROMPT_DEED_TOKEN_BUDGET,
+                                  reference_date: date = None) -> PromptAssembly:
+    """
+    Packs the evidence into the investigation prompt within `token_budget`.
+
+    The registry record is always included. The deed excerpt gets up to
+    `deed_token_budget`, then alerts are added in relevance order while
+    they fit; alerts that do not fit are skipped (a smaller one may still fit).
+    """
+    registry_json = json.dumps(evidence["registry"])
+    remaining = token_budget - estimate_tokens(registry_json)
+
+    # Deed excerpt
+    deed_content = evidence["deed"]
+    deed_chars = max(min(deed_token_budget, remaining), 0) * CHARS_PER_TOKEN
+    deed_truncated = len(deed_content) > deed_chars
+    deed_data_json = {
+        "document_type": "Deed of Assignment",
+        "property_id": token_id,
+        "content_length": len(deed_content),
+        "full_content": deed_content[:deed_chars] + "..." if deed_truncated else deed_content
+    }
+    deed_json = json.dumps(deed_data_json)
+    remaining -= estimate_tokens(deed_json)
+
+    # Alerts by relevance
+    ranked = sorted(
+        evidence["alerts"],
+        key=lambda alert: score_alert(alert, evidence["registry"], reference_date),
+        reverse=True
+    )
+    included, dropped = [], []
+    for alert in ranked:
+        cost = estimate_tokens(json.dumps(alert)) + 1
+        if cost <= remaining:
+            included.append(alert)
+            remaining -= cost
+        else:
+            dropped.append(alert.get('alert_id'))
+    alerts_json = json.dumps(included)
+
+    dropped_note = ""
+    if dropped:
+        dropped_note = (
+            f"\n   NOTE: {len(dropped)} lower-relevance alerts mentioning the owner were omitted "
+            f"to fit the prompt budget; the alerts above are the most relevant."
+        )
+
+    data_source_info = evidence["data_source"]
+    prompt = f"""
+You are VERA-AI, a professional risk oracle for Nigerian real estate assets. Your task is to analyze the provided data from three sources and generate a realistic structured JSON report for property {token_id}.
+
+CONTEXT: Nigerian real estate carries inherent risks due to complex land laws, documentation challenges, and regulatory environment. Even the cleanest properties should reflect baseline investment risks.
+
+--- INSTRUCTIONS ---
+1. Assess the risk based on all three data sources.
+2. The 'risk_score' must be an integer using these REALISTIC ranges:
+   - "No Risk Found": 15-25 (Even clean properties have baseline market/regulatory risks)
+   - "Financial Pledge": 45-65 (Moderate risk due to financial encumbrances)
+   - "Title Dispute": 70-85 (High risk due to ownership conflicts)
+   - "Government Revocation": 80-95 (Very high risk due to potential seizure)
+3. The 'risk_category' must be one of: "Title Dispute", "Financial Pledge", "Government Revocation", or "No Risk Found".
+4. The 'summary' must be a concise, one-paragraph explanation of your findings and why this risk score was assigned.
+5. The 'evidence_summary' must detail the findings from each of the three sources.
+6. IMPORTANT: Always assign realistic risk scores that reflect real-world property investment risks.
+7. Data retrieved from: {data_source_info}
+
+--- NIGERIAN PROPERTY DATA ---
+1. NIGERIAN LAND REGISTRY DATA: {registry_json}
+2. DEED OF ASSIGNMENT DOCUMENT: {deed_json}
+3. NIGERIAN GAZETTE ALERTS (most relevant first): {alerts_json}{dropped_note}
+
+--- RISK SCORING EXAMPLES ---
+- Property with clear title, recent registration, no news alerts: Risk Score 18-22
+- Property with financial encumbrance mentioned in deed: Risk Score 50-60
+- Property with ownership disputes in deed/news: Risk Score 75-82
+- Property with government acquisition notices: Risk Score 85-92
+
+--- REQUIRED JSON OUTPUT FORMAT ---
+Provide only the JSON object, nothing else.
+{{
+    "risk_score": <integer>,
+    "risk_category": "<string>",
+    "summary": "<string>",
+    "evidence_summary": [
+        {{"source": "Nigerian Land Registry", "result": "Success/Failure", "detail": "<string>"}},
+        {{"source": "Deed of Assignment", "result": "Success/Failure", "detail": "<string>"}},
+        {{"source": "Nigerian Gazette Alerts", "result": "Success/Failure", "detail": "<string>"}}
+    ],
+    "data_source": "{data_source_info}",
+    "property_id": "{token_id}"
+}}
+"""
+    return PromptAssembly(
+        prompt=prompt,
+        estimated_tokens=estimate_tokens(prompt),
+        alerts_included=[alert.get('alert_id') for alert in included],
+        alerts_dropped=dropped,
+        deed_truncated=deed_truncated
+    )
@@ -0,0 +1,316 @@
+# =================================================================
+# Vira Engine - Proof Registry
+# =================================================================
+# Purpose: Keep every proof returned by /analyze, together with the
+# canonical bytes of the report it was computed over, so a report can be
+# verified later by recomputing its SHA-256 instead of re-running the
+# analysis.
+#
+# Tiers (same layout as the report cache):
+# - In-process LRU keyed by proof hash, so repeat lookups are a dict hit
+# - Persistent MongoDB collection (`proof_registry`) keyed by proof hash
+#   (`_id`), shared by every worker and surviving restarts. Writes are
+#   handed to the io pool so the response is not held up by them.
+#
+# Batch verification fetches all memory misses in a single `$in` query
+# and then only hashes bytes, so thousands of proofs cost one round trip.
+#
+# Sealed Merkle proof batches (zk_proof_simulator.py) are kept in the
+# `proof_batches` collection as their leaf hashes, so a worker that did
+# not build a batch can still serve its inclusion proofs.
+# =================================================================
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from pymongo.errors import ConnectionFailure
+
+from database import get_shared_database
+from executors import io_executor
+from observability import get_logger, span
+from zk_proof_simulator import MerkleBatch, canonical_report_bytes
+
+logger = get_logger("proof_registry")
+
+PROOF_REGISTRY_MAX_ENTRIES = int(os.getenv('VERA_PROOF_REGISTRY_MAX_ENTRIES', '100000'))
+PROOF_REGISTRY_PERSISTENT = os.getenv('VERA_PROOF_REGISTRY_PERSISTENT', 'true').lower() in ('1', 'true', 'yes')
+PROOF_REGISTRY_COLLECTION = 'proof_registry'
+PROOF_BATCHES_COLLECTION = 'proof_batches'
+
+
+def normalize_proof_hash(proof_hash: str) -> str:
+    """Returns the hash in the "0x" + lowercase hex form used as the registry key."""
+    proof_hash = (proof_hash or "").strip().lower()
+    return proof_hash if proof_hash.startswith("0x") else "0x" + proof_hash
+
+
+def _sha256_hex(data) -> str:
+    return "0x" + hashlib.sha256(data).hexdigest()
+
+
+class ProofRegistry:
+    """Two-tier (memory, then MongoDB) store of proofs and the report bytes they commit to."""
+
+    def __init__(self, max_entries=PROOF_REGISTRY_MAX_ENTRIES, persistent=PROOF_REGISTRY_PERSISTENT):
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self._entries = OrderedDict()  # proof_hash -> record dict
+        self._lock = threading.Lock()
+        self.counters = {
+            "registered": 0,
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "verified": 0,
+            "mismatches": 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    # --- Memory tier ---
+    def _memory_get(self, proof_hash):
+        with self._lock:
+            record = self._entries.get(proof_hash)
+            if record is not None:
+                self._entries.move_to_end(proof_hash)
+            return record
+
+    def _memory_put(self, proof_hash, record):
+        with self._lock:
+            self._entries[proof_hash] = record
+            self._entries.move_to_end(proof_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # --- Persistent tier ---
+    def _collection(self, name=PROOF_REGISTRY_COLLECTION):
+        if not self.persistent:
+            return None
+        db = get_shared_database().get_db()
+        if db is None:
+            return None
+        return db[name]
+
+    def _persistent_put(self, record):
+        try:
+            collection = self._collection()
+            if collection is None:
+                return
+            # The first registration wins; the same report always has the same hash.
+            collection.update_one(
+                {"_id": record["proof_hash"]},
+                {"$setOnInsert": {
+                    "token_id": record["token_id"],
+                    "report_bytes": record["report_bytes"],
+                    "proof": record["proof"],
+                    "created_at": datetime.utcnow(),
+                }},
+                upsert=True
+            )
+        except ConnectionFailure as e:
+            logger.warning(f"Persistent proof registry unavailable: {e}")
+            get_shared_database().record_failure()
+        except Exception as e:
+            logger.warning(f"Persistent proof registration failed: {e}")
+
+    def _persistent_get_many(self, proof_hashes):
+        if not proof_hashes:
+            return {}
+        try:
+            collection = self._collection()
+            if collection is None:
+                return {}
+            records = {}
+            with span("mongo_query", PROOF_REGISTRY_COLLECTION):
+                cursor = collection.find(
+                    {"_id": {"$in": list(proof_hashes)}},
+                    {"token_id": 1, "report_bytes": 1, "proof": 1}
+                )
+                for document in cursor:
+                    records[document["_id"]] = {
+                        "proof_hash": document["_id"],
+                        "token_id": document.get("token_id"),
+                        "report_bytes": bytes(document["report_bytes"]),
+                        "proof": document.get("proof", {}),
+                    }
+            return records
+        except ConnectionFailure as e:
+            logger.warning(f"Persistent proof registry unavailable: {e}")
+            get_shared_database().record_failure()
+        except Exception as e:
+            logger.warning(f"Persistent proof lookup failed: {e}")
+        return {}
+
+    def _persistent_put_batch(self, document):
+        try:
+            collection = self._collection(PROOF_BATCHES_COLLECTION)
+            if collection is None:
+                return
+            collection.update_one({"_id": document["_id"]}, {"$setOnInsert": document}, upsert=True)
+        except ConnectionFailure as e:
+            logger.warning(f"Persistent proof registry unavailable: {e}")
+            get_shared_database().record_failure()
+        except Exception as e:
+            logger.warning(f"Persistent proof batch registration failed: {e}")
+
+    # --- Public API ---
+    def register(self, report: dict, proof: dict, token_id: str = None):
+        """
+        Stores a proof and the canonical bytes of its report.
+
+        The memory tier is updated immediately; the MongoDB write runs on
+        the io pool.
+        """
+        proof_hash = proof.get("proof_hash")
+        if not proof_hash:
+            return
+        proof_hash = normalize_proof_hash(proof_hash)
+        if self._memory_get(proof_hash) is not None:
+            return
+        record = {
+            "proof_hash": proof_hash,
+            "token_id": token_id or report.get("token_id"),
+            "report_bytes": canonical_report_bytes(report),
+            "proof": dict(proof),
+        }
+        self._memory_put(proof_hash, record)
+        self._count("registered")
+        if self.persistent:
+            try:
+                io_executor.submit(self._persistent_put, record)
+            except RuntimeError:
+                # The pool is shutting down; write inline instead of losing the proof.
+                self._persistent_put(record)
+
+    def lookup_many(self, proof_hashes) -> dict:
+        """Returns {proof_hash: record} for the registered hashes among `proof_hashes`."""
+        records = {}
+        misses = []
+        with self._lock:
+            for proof_hash in proof_hashes:
+                record = self._entries.get(proof_hash)
+                if record is not None:
+                    records[proof_hash] = record
+                else:
+                    misses.append(proof_hash)
+        self._count("memory_hits", len(records))
+        found = self._persistent_get_many(set(misses))
+        for proof_hash, record in found.items():
+            self._memory_put(proof_hash, record)
+        records.update(found)
+        self._count("persistent_hits", len(found))
+        self._count("misses", len(set(misses)) - len(found))
+        return records
+
+    def verify_many(self, items: list) -> list:
+        """
+        Verifies proofs against the registry.
+
+        Args:
+            items (list): [{"proof_hash": str, "report": dict or None}, ...].
+                With a report, its hash is recomputed and must equal the
+                claimed hash; without one, the stored report bytes are
+                re-hashed.
+
+        Returns:
+            list: One result per item, in input order, with `registered`,
+            `verified` and (on failure) a `reason`.
+        """
+        with span("proof_verify", "batch" if len(items) > 1 else "single"):
+            proof_hashes = [normalize_proof_hash(item.get("proof_hash")) for item in items]
+            records = self.lookup_many(proof_hashes)
+            results = []
+            verified_count = 0
+            for proof_hash, item in zip(proof_hashes, items):
+                record = records.get(proof_hash)
+                result = {"proof_hash": proof_hash, "registered": record is not None, "verified": False}
+                if record is None:
+                    result["reason"] = "not_registered"
+                elif _sha256_hex(record["report_bytes"]) != proof_hash:
+                    result["reason"] = "stored_report_corrupted"
+                elif item.get("report") is not None:
+                    recomputed = _sha256_hex(canonical_report_bytes(item["report"]))
+                    result["recomputed_hash"] = recomputed
+                    if recomputed == proof_hash:
+                        result["verified"] = True
+                    else:
+                        result["reason"] = "report_hash_mismatch"
+                else:
+                    result["recomputed_hash"] = proof_hash
+                    result["verified"] = True
+                if record is not None:
+                    result["token_id"] = record["token_id"]
+                verified_count += result["verified"]
+                results.append(result)
+        self._count("verified", verified_count)
+        self._count("mismatches", len(results) - verified_count)
+        return results
+
+    def get_record(self, proof_hash: str):
+        """Returns the registered record for a hash (report bytes included), or None."""
+        proof_hash = normalize_proof_hash(proof_hash)
+        return self.lookup_many([proof_hash]).get(proof_hash)
+
+    def register_batch(self, batch: MerkleBatch):
+        """Stores a sealed proof batch (the ProofBatcher `on_seal` callback); written on the io pool."""
+        if not self.persistent or not batch.sealed:
+            return
+        document = {
+            "_id": batch.batch_id,
+            "root": batch.root,
+            "leaf_hashes": batch.leaf_hashes(),
+            "opened_at": batch.opened_at,
+            "sealed_at": batch.sealed_at,
+            "created_at": datetime.utcnow(),
+        }
+        try:
+            io_executor.submit(self._persistent_put_batch, document)
+        except RuntimeError:
+            self._persistent_put_batch(document)
+
+    def get_batch(self, batch_id: str):
+        """Returns a sealed proof batch stored by any worker, or None."""
+        try:
+            collection = self._collection(PROOF_BATCHES_COLLECTION)
+            if collection is None:
+                return None
+            with span("mongo_query", PROOF_BATCHES_COLLECTION):
+                document = collection.find_one({"_id": batch_id})
+        except ConnectionFailure as e:
+            logger.warning(f"Persistent proof registry unavailable: {e}")
+            get_shared_database().record_failure()
+            return None
+        except Exception as e:
+            logger.warning(f"Persistent proof batch lookup failed: {e}")
+            return None
+        if document is None:
+            return None
+        batch = MerkleBatch.from_leaves(batch_id, document["leaf_hashes"], document.get("opened_at"), document.get("sealed_at"))
+        if batch.root != document.get("root"):
+            logger.warning(f"Stored proof batch {batch_id} does not match its root; ignoring it")
+            return None
+        return batch
+
+    def stats(self) -> dict:
+        stats = dict(self.counters)
+        stats["entries"] = len(self._entries)
+        return stats
+
+
+_proof_registry = None
+_proof_registry_lock = threading.Lock()
+
+
+def get_proof_registry() -> ProofRegistry:
+    """Returns the process-wide proof registry, creating it on first use."""
+    global _proof_registry
+    if _proof_registry is None:
+        with _proof_registry_lock:
+            if _proof_registry is None:
+                _proof_registry = ProofRegistry()
+    return _proof_registry
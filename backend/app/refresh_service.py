@@ -0,0 +1,592 @@
+# =================================================================
+# Vira Engine - Background Report Refresh
+# =================================================================
+# Purpose: Re-analyze assets in the background when their source data
+# changes, so the report cache already holds the new report when the
+# next visitor arrives instead of that visitor waiting on Gemini.
+#
+# - Change detection: MongoDB change streams on land_registry,
+#   news_alerts and property_metadata. Where change streams are not
+#   available (standalone server, in-memory stand-in), new documents are
+#   polled by `_id`; while MongoDB is down, the local fallback files are
+#   polled by mtime. A periodic sweep re-checks every token as a safety
+#   net (and re-warms reports whose cache entries expired).
+# - Affected tokens: a metadata change affects its token, a registry
+#   change the tokens registered under that C-of-O, and an alert change
+#   the tokens whose owner the alert mentions (or mentioned).
+# - Priority: tokens are refreshed most-important first, where
+#   importance = popularity (decayed request count) + staleness (seconds
+#   since the change / REFRESH_STALENESS_WEIGHT_SECONDS).
+# - Only popular tokens (popularity >= REFRESH_MIN_POPULARITY) are
+#   warmed at startup, by the sweep and by other re-checks of every
+#   token; changes to a token's own data always queue it.
+# - One process refreshes: every API worker records requests and
+#   publishes its popularity counts to `token_popularity`, but only the
+#   holder of the `refresh_service` lease in `ingest_state` (renewed
+#   every poll) watches for changes and re-analyzes. Another worker takes
+#   over once the lease expires. The holder keeps refreshing while MongoDB
+#   is down; without MongoDB at startup no worker refreshes.
+#
+# Re-analyzing a token whose evidence did not change is only a report
+# cache hit, so over-approximating the affected set is cheap.
+# =================================================================
+
+import os
+import time
+import heapq
+import socket
+import itertools
+import threading
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+
+import main
+from alert_matcher import AlertMatcher
+from fallback_store import get_fallback_store
+from owner_alert_links import (
+    INGEST_STATE_COLLECTION, OWNER_ALERT_LINKS_COLLECTION, OWNER_ALERT_LINKS_ENABLED, get_owner_alert_linker, owner_key
+)
+from observability import REFRESHES, get_logger, span
+
+logger = get_logger("refresh")
+
+REFRESH_ENABLED = os.getenv('VERA_REFRESH_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+REFRESH_WORKERS = int(os.getenv('VERA_REFRESH_WORKERS', '1'))
+REFRESH_POLL_SECONDS = float(os.getenv('VERA_REFRESH_POLL_SECONDS', '10'))
+REFRESH_SWEEP_SECONDS = float(os.getenv('VERA_REFRESH_SWEEP_SECONDS', '3600'))
+# One recent request outweighs this many seconds of staleness
+REFRESH_STALENESS_WEIGHT_SECONDS = float(os.getenv('VERA_REFRESH_STALENESS_WEIGHT_SECONDS', '60'))
+POPULARITY_HALF_LIFE_SECONDS = float(os.getenv('VERA_POPULARITY_HALF_LIFE_SECONDS', '3600'))
+# Tokens below this popularity are not warmed at startup or by the sweep
+REFRESH_MIN_POPULARITY = float(os.getenv('VERA_REFRESH_MIN_POPULARITY', '1'))
+# How long the refreshing process holds its lease without renewing it
+REFRESH_LEASE_SECONDS = float(os.getenv('VERA_REFRESH_LEASE_SECONDS', '60'))
+
+TOKEN_POPULARITY_COLLECTION = 'token_popularity'
+REFRESH_LEASE_ID = 'refresh_service'
+
+WATCHED_COLLECTIONS = ("land_registry", "news_alerts", "property_metadata")
+CHANGE_STREAMS_UNSUPPORTED = 40573  # "$changeStream is only supported on replica sets"
+
+
+class PopularityTracker:
+    """Request counts per token with exponential decay."""
+
+    def __init__(self, half_life_seconds: float = POPULARITY_HALF_LIFE_SECONDS):
+        self.half_life_seconds = half_life_seconds
+        self._counts = {}  # token_id -> (count, as of monotonic time)
+        self._lock = threading.Lock()
+
+    def _decayed(self, entry, now):
+        count, since = entry
+        return count * 0.5 ** ((now - since) / self.half_life_seconds)
+
+    def record(self, token_id: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._counts.get(token_id)
+            self._counts[token_id] = ((self._decayed(entry, now) if entry else 0.0) + 1.0, now)
+
+    def score(self, token_id: str) -> float:
+        with self._lock:
+            entry = self._counts.get(token_id)
+        return self._decayed(entry, time.monotonic()) if entry else 0.0
+
+    def snapshot(self, min_score: float = 0.01) -> dict:
+        """Returns {token_id: score} as of now, dropping tokens that have decayed below `min_score`."""
+        now = time.monotonic()
+        with self._lock:
+            scores = {token_id: self._decayed(entry, now) for token_id, entry in self._counts.items()}
+            for token_id, score in scores.items():
+                if score < min_score:
+                    del self._counts[token_id]
+        return {token_id: score for token_id, score in scores.items() if score >= min_score}
+
+
+class RefreshQueue:
+    """
+    Priority queue of tokens to refresh, one entry per token.
+
+    Importance at time t is popularity + (t - dirty_since) / weight. The
+    time term grows equally for every entry, so ordering by the constant
+    popularity - dirty_since / weight gives the same order at any t and
+    fits a heap. Re-queuing a token keeps its earliest dirty_since and
+    supersedes its older heap entry.
+    """
+
+    def __init__(self, staleness_weight_seconds: float = REFRESH_STALENESS_WEIGHT_SECONDS):
+        self.staleness_weight_seconds = staleness_weight_seconds
+        self._heap = []
+        self._entries = {}  # token_id -> (priority, dirty_since, trigger)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._entries)
+
+    def push(self, token_id: str, popularity: float, trigger: str, dirty_since: float = None):
+        dirty_since = time.monotonic() if dirty_since is None else dirty_since
+        with self._condition:
+            previous = self._entries.get(token_id)
+            if previous is not None:
+                dirty_since = min(dirty_since, previous[1])
+                trigger = previous[2]
+            priority = -(popularity - dirty_since / self.staleness_weight_seconds)
+            self._entries[token_id] = (priority, dirty_since, trigger)
+            heapq.heappush(self._heap, (priority, next(self._sequence), token_id))
+            self._condition.notify()
+
+    def pop(self, timeout: float = None):
+        """Returns (token_id, dirty_since, trigger) for the most important token, or None on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                while self._heap:
+                    priority, _, token_id = heapq.heappop(self._heap)
+                    entry = self._entries.get(token_id)
+                    if entry is not None and entry[0] == priority:
+                        del self._entries[token_id]
+                        return token_id, entry[1], entry[2]
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    def wake_all(self):
+        with self._condition:
+            self._condition.notify_all()
+
+
+class TokenIndex:
+    """Which tokens depend on which registry record and owner name."""
+
+    def __init__(self):
+        self._tokens = {}  # token_id -> (registry_key, owner_name)
+        self._lock = threading.Lock()
+
+    def all_tokens(self) -> list:
+        with self._lock:
+            return list(self._tokens)
+
+    def tokens_for_registry_key(self, registry_key: str) -> list:
+        with self._lock:
+            return [token_id for token_id, (key, _) in self._tokens.items() if key == registry_key]
+
+    def tokens_for_owners(self, owner_keys) -> list:
+        owner_keys = set(owner_keys)
+        with self._lock:
+            return [token_id for token_id, (_, owner) in self._tokens.items() if owner_key(owner) in owner_keys]
+
+    def tokens_for_alert(self, alert: dict) -> list:
+        """Tokens whose owner the alert mentions."""
+        matcher = AlertMatcher([alert])
+        with self._lock:
+            items = list(self._tokens.items())
+        return [token_id for token_id, (_, owner) in items if owner and matcher.match(owner)]
+
+    def set_token(self, token_id: str, registry_key, owner_name):
+        with self._lock:
+            self._tokens[token_id] = (registry_key, owner_name)
+
+    def set_owner(self, registry_key: str, owner_name: str):
+        with self._lock:
+            for token_id, (key, _) in list(self._tokens.items()):
+                if key == registry_key:
+                    self._tokens[token_id] = (key, owner_name)
+
+    def remove_token(self, token_id: str):
+        with self._lock:
+            self._tokens.pop(token_id, None)
+
+    def rebuild(self, db):
+        """Reloads the index from MongoDB, or from the local fallback files if `db` is None."""
+        tokens = {}
+        if db is not None:
+            metadata_by_token = {
+                metadata["token_id"]: metadata
+                for metadata in db['property_metadata'].find({}, {"token_id": 1, "attributes": 1})
+            }
+            keys = {token_id: main.get_registry_search_key(metadata) for token_id, metadata in metadata_by_token.items()}
+            owners = {
+                record["c_of_o_id"]: record.get("owner_name")
+                for record in db['land_registry'].find(
+                    {"c_of_o_id": {"$in": [key for key in keys.values() if key]}}, {"c_of_o_id": 1, "owner_name": 1}
+                )
+            }
+            tokens = {token_id: (key, owners.get(key)) for token_id, key in keys.items()}
+        else:
+            store = get_fallback_store(main.DATA_FOLDER)
+            for file_name in sorted(os.listdir(store.metadata_folder)):
+                if not file_name.endswith(".json"):
+                    continue
+                token_id = file_name[:-len(".json")]
+                metadata = store.get_metadata(token_id) or {}
+                key = main.get_registry_search_key(metadata)
+                record = store.get_registry_record(key) if key else None
+                tokens[token_id] = (key, record.get("owner_name") if record else None)
+        with self._lock:
+            self._tokens = tokens
+        return len(tokens)
+
+
+class RefreshService:
+    """Watches the source data and keeps the affected tokens' reports warm."""
+
+    def __init__(self, analyze=None, workers: int = REFRESH_WORKERS,
+                 poll_seconds: float = REFRESH_POLL_SECONDS, sweep_seconds: float = REFRESH_SWEEP_SECONDS,
+                 min_popularity: float = REFRESH_MIN_POPULARITY, lease_seconds: float = REFRESH_LEASE_SECONDS,
+                 worker_id: str = None):
+        self.analyze = analyze or main.perform_asset_analysis
+        self.workers = max(1, workers)
+        self.poll_seconds = poll_seconds
+        self.sweep_seconds = sweep_seconds
+        self.min_popularity = min_popularity
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.popularity = PopularityTracker()
+        self.queue = RefreshQueue()
+        self.index = TokenIndex()
+        self.last_refreshed = {}  # token_id -> wall-clock time of the last refresh
+        self.leading = False
+        self._other_popularity = {}       # token_id -> summed popularity in the other processes
+        self._threads = []
+        self._leader_thread = None
+        self._stop = threading.Event()    # stops the refresh threads
+        self._shutdown = threading.Event()
+        self._watching = set()            # collections with an open change stream
+        self._streams_unsupported = False
+        self._mongo_watermarks = {}       # collection -> last polled _id
+        self._file_signatures = None
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+
+    # --- Public API ---
+    def record_request(self, token_id: str):
+        self.popularity.record(token_id)
+
+    def popularity_score(self, token_id: str) -> float:
+        """Decayed request count of a token across every API worker."""
+        return self.popularity.score(token_id) + self._other_popularity.get(token_id, 0.0)
+
+    def popular_tokens(self) -> list:
+        return [token_id for token_id in self.index.all_tokens() if self.popularity_score(token_id) >= self.min_popularity]
+
+    def enqueue(self, token_ids, trigger: str):
+        count = 0
+        for token_id in token_ids:
+            self.queue.push(token_id, self.popularity_score(token_id), trigger)
+            count += 1
+        if count:
+            logger.debug(f"Queued {count} tokens for refresh ({trigger})")
+        return count
+
+    def stats(self) -> dict:
+        return {
+            "leading": self.leading,
+            "queue_depth": len(self.queue),
+            "change_streams": sorted(self._watching),
+            "tracked_tokens": len(self.index.all_tokens()),
+        }
+
+    def start(self):
+        """Publishes popularity and competes for the refresh lease from a background thread."""
+        if self._leader_thread is not None:
+            return
+        self._shutdown.clear()
+        self._leader_thread = threading.Thread(target=self._leader_loop, name="vera-refresh-lease", daemon=True)
+        self._leader_thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._shutdown.set()
+        if self._leader_thread is not None:
+            self._leader_thread.join(timeout)
+            self._leader_thread = None
+        self._stop_refreshing(timeout)
+        if self.leading:
+            self.leading = False
+            try:
+                db = main.get_mongodb_connection()
+                if db is not None:
+                    # Hand over at once instead of after the lease expires.
+                    db[INGEST_STATE_COLLECTION].update_one(
+                        {"_id": REFRESH_LEASE_ID, "holder": self.worker_id},
+                        {"$set": {"lease_expires_at": datetime.utcnow()}}
+                    )
+            except PyMongoError as e:
+                logger.warning(f"Could not release the refresh lease: {e}")
+
+    def _start_refreshing(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        self._rebuild_index()
+        # Warm the popular tokens once when taking over.
+        self.enqueue(self.popular_tokens(), "startup")
+        self._last_sweep = time.monotonic()
+        targets = [(self._monitor_loop, "vera-refresh-monitor")]
+        targets += [(self._worker_loop, f"vera-refresh-{i}") for i in range(self.workers)]
+        targets += [(lambda name=name: self._watch_loop(name), f"vera-watch-{name}") for name in WATCHED_COLLECTIONS]
+        for target, name in targets:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Refresh service started with {self.workers} workers, tracking {len(self.index.all_tokens())} tokens")
+
+    def _stop_refreshing(self, timeout: float = 5.0):
+        self._stop.set()
+        self.queue.wake_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # --- Lease and shared popularity ---
+    def _claim_lease(self, db) -> bool:
+        """Takes or renews the refresh lease. True if this process holds it."""
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=self.lease_seconds)
+        collection = db[INGEST_STATE_COLLECTION]
+        result = collection.update_one(
+            {"_id": REFRESH_LEASE_ID, "$or": [{"holder": self.worker_id}, {"lease_expires_at": {"$lt": now}}]},
+            {"$set": {"holder": self.worker_id, "lease_expires_at": expires}}
+        )
+        if result.matched_count:
+            return True
+        try:
+            collection.insert_one({"_id": REFRESH_LEASE_ID, "holder": self.worker_id, "lease_expires_at": expires})
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def _publish_popularity(self, db):
+        db[TOKEN_POPULARITY_COLLECTION].update_one(
+            {"_id": self.worker_id},
+            {"$set": {"scores": list(self.popularity.snapshot().items()), "as_of": datetime.utcnow()}},
+            upsert=True
+        )
+
+    def _load_popularity(self, db):
+        """Sums the popularity published by the other processes, decayed to now."""
+        now = datetime.utcnow()
+        half_life = self.popularity.half_life_seconds
+        horizon = now - timedelta(seconds=10 * half_life)
+        collection = db[TOKEN_POPULARITY_COLLECTION]
+        # Processes that stopped publishing long ago have decayed to nothing.
+        collection.delete_many({"as_of": {"$lt": horizon}})
+        totals = {}
+        for document in collection.find({"_id": {"$ne": self.worker_id}}):
+            decay = 0.5 ** ((now - document["as_of"]).total_seconds() / half_life)
+            for token_id, score in document.get("scores", []):
+                totals[token_id] = totals.get(token_id, 0.0) + score * decay
+        self._other_popularity = totals
+
+    def _leader_loop(self):
+        while True:
+            try:
+                db = main.get_mongodb_connection()
+                if db is not None:
+                    self._publish_popularity(db)
+                    # While MongoDB is down the lease cannot change hands, so the holder keeps refreshing.
+                    self.leading = self._claim_lease(db)
+                    if self.leading:
+                        self._load_popularity(db)
+                if self.leading:
+                    self._start_refreshing()
+                elif self._threads:
+                    logger.info("Refresh lease lost; another worker refreshes reports now")
+                    self._stop_refreshing()
+            except Exception as e:
+                logger.warning(f"Refresh lease pass failed: {e}")
+            if self._shutdown.wait(self.poll_seconds):
+                return
+
+    # --- Workers ---
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            item = self.queue.pop(timeout=1.0)
+            if item is None:
+                continue
+            token_id, dirty_since, trigger = item
+            try:
+                with span("refresh", trigger):
+                    report = self.analyze(token_id)
+                status = report.get("status")
+                outcome = {"Success": "success", "Not Found": "not_found"}.get(status, "failed")
+                if status == "Not Found":
+                    self.index.remove_token(token_id)
+                self.last_refreshed[token_id] = time.time()
+                logger.debug(f"Refreshed {token_id} ({trigger}) {time.monotonic() - dirty_since:.1f}s after the change")
+            except Exception as e:
+                outcome = "error"
+                logger.warning(f"Refresh of {token_id} failed: {e}")
+            REFRESHES.inc(trigger=trigger, outcome=outcome)
+
+    def _rebuild_index(self):
+        try:
+            count = self.index.rebuild(main.get_mongodb_connection())
+            logger.debug(f"Token index holds {count} tokens")
+        except Exception as e:
+            logger.warning(f"Could not rebuild the token index: {e}")
+
+    # --- Change handling ---
+    def handle_change(self, db, collection_name: str, change: dict) -> list:
+        """Works out the tokens a change event affects, updates derived state and queues them."""
+        operation = change.get("operationType")
+        document = change.get("fullDocument")
+        if operation not in ("insert", "update", "replace", "delete"):
+            return []
+        if collection_name == "property_metadata":
+            if document is None:
+                self._rebuild_index()
+                return []
+            token_id = document.get("token_id")
+            registry_key = main.get_registry_search_key(document)
+            record = db['land_registry'].find_one({"c_of_o_id": registry_key}, {"owner_name": 1}) if registry_key else None
+            self.index.set_token(token_id, registry_key, record.get("owner_name") if record else None)
+            tokens = [token_id]
+        elif collection_name == "land_registry":
+            if document is None:
+                self._rebuild_index()
+                tokens = self.popular_tokens()
+            else:
+                owner_name = document.get("owner_name")
+                self.index.set_owner(document.get("c_of_o_id"), owner_name)
+                if OWNER_ALERT_LINKS_ENABLED and owner_name:
+                    get_owner_alert_linker().link_owners(db, [owner_name], only_missing=True)
+                tokens = self.index.tokens_for_registry_key(document.get("c_of_o_id"))
+        else:
+            if document is None:
+                # Without the deleted alert we cannot tell whom it mentioned.
+                if OWNER_ALERT_LINKS_ENABLED:
+                    get_owner_alert_linker().rebuild(db)
+                tokens = self.popular_tokens()
+            else:
+                tokens = set(self.index.tokens_for_alert(document))
+                if OWNER_ALERT_LINKS_ENABLED:
+                    # Owners linked to the previous version of the alert are affected too.
+                    previous_owners = [
+                        link["_id"] for link in db[OWNER_ALERT_LINKS_COLLECTION].find(
+                            {"alert_ids": document.get("alert_id")}, {"_id": 1}
+                        )
+                    ]
+                    tokens.update(self.index.tokens_for_owners(previous_owners))
+                    get_owner_alert_linker().update_alerts(db, [document])
+        tokens = [token_id for token_id in tokens if token_id]
+        self.enqueue(tokens, collection_name)
+        return tokens
+
+    # --- Change streams ---
+    def _watch_loop(self, collection_name: str):
+        resume_token = None
+        while not self._stop.is_set() and not self._streams_unsupported:
+            db = main.get_mongodb_connection()
+            if db is None:
+                self._stop.wait(self.poll_seconds)
+                continue
+            try:
+                with db[collection_name].watch(full_document="updateLookup", resume_after=resume_token,
+                                               max_await_time_ms=1000) as stream:
+                    self._watching.add(collection_name)
+                    logger.info(f"Watching {collection_name} for changes")
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        resume_token = stream.resume_token
+                        if change is not None:
+                            self.handle_change(db, collection_name, change)
+            except (AttributeError, NotImplementedError) as e:
+                self._streams_unsupported = True
+                logger.info(f"Change streams are not available ({e}); polling for new documents instead")
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    self._streams_unsupported = True
+                    logger.info("Change streams need a replica set; polling for new documents instead")
+                else:
+                    # E.g. the resume point fell off the oplog: start over and re-check everything.
+                    logger.warning(f"Change stream on {collection_name} failed: {e}")
+                    resume_token = None
+                    self.enqueue(self.popular_tokens(), "resync")
+                    self._stop.wait(self.poll_seconds)
+            except PyMongoError as e:
+                logger.warning(f"Change stream on {collection_name} interrupted: {e}")
+                self._stop.wait(self.poll_seconds)
+            finally:
+                self._watching.discard(collection_name)
+
+    # --- Polling stand-ins ---
+    def _poll_mongo(self, db):
+        """Handles documents inserted since the last poll as insert events."""
+        for collection_name in WATCHED_COLLECTIONS:
+            collection = db[collection_name]
+            watermark = self._mongo_watermarks.get(collection_name)
+            if watermark is None:
+                newest = list(collection.find({}, {"_id": 1}).sort("_id", -1).limit(1))
+                self._mongo_watermarks[collection_name] = newest[0]["_id"] if newest else None
+                if newest:
+                    continue
+            query = {} if watermark is None else {"_id": {"$gt": watermark}}
+            for document in collection.find(query).sort("_id", 1):
+                self._mongo_watermarks[collection_name] = document["_id"]
+                self.handle_change(db, collection_name, {"operationType": "insert", "fullDocument": document})
+
+    def _data_file_signatures(self) -> dict:
+        signatures = {}
+        for folder in (main.DATA_FOLDER, os.path.join(main.DATA_FOLDER, "metadata")):
+            for entry in os.scandir(folder):
+                if entry.is_file():
+                    stat = entry.stat()
+                    signatures[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return signatures
+
+    def _poll_files(self):
+        """Queues the tokens affected by changed local fallback files."""
+        signatures = self._data_file_signatures()
+        previous, self._file_signatures = self._file_signatures, signatures
+        if previous is None:
+            return
+        changed = {path for path in signatures.keys() | previous.keys() if signatures.get(path) != previous.get(path)}
+        if not changed:
+            return
+        tokens = set()
+        shared_file_changed = False
+        for path in changed:
+            file_name = os.path.basename(path)
+            if file_name.endswith("_Deed_of_Assignment.txt"):
+                tokens.add(file_name.split("_")[0])
+            elif os.path.dirname(path).endswith("metadata") and file_name.endswith(".json"):
+                tokens.add(file_name[:-len(".json")])
+            else:
+                shared_file_changed = True
+        self.index.rebuild(None)
+        if shared_file_changed:
+            tokens.update(self.popular_tokens())
+        self.enqueue(sorted(tokens), "files")
+
+    def _monitor_loop(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                db = main.get_mongodb_connection()
+                if db is None:
+                    self._poll_files()
+                elif self._streams_unsupported:
+                    self._poll_mongo(db)
+                if time.monotonic() - self._last_sweep >= self.sweep_seconds:
+                    self._last_sweep = time.monotonic()
+                    self._rebuild_index()
+                    self.enqueue(self.popular_tokens(), "sweep")
+            except Exception as e:
+                logger.warning(f"Refresh monitor pass failed: {e}")
+
+
+_refresh_service = None
+_refresh_service_lock = threading.Lock()
+
+
+def get_refresh_service() -> RefreshService:
+    """Returns the process-wide refresh service, creating it on first use."""
+    global _refresh_service
+    if _refresh_service is None:
+        with _refresh_service_lock:
+            if _refresh_service is None:
+                _refresh_service = RefreshService()
+    return _refresh_service
@@ -0,0 +1,192 @@
+# =================================================================
+# Vira Engine - Risk Report Cache
+# =================================================================
+# Purpose: Gemini reports are expensive (seconds per call) and fully
+# determined by the evidence sent to the model. This module caches
+# reports under a content hash of the normalized evidence bundle plus
+# the prompt version, so identical inputs are answered from cache and
+# any change to the inputs produces a new key (and a fresh analysis).
+#
+# Tiers:
+# - In-process LRU with a TTL
+# - Persistent MongoDB collection (`report_cache`) with a TTL index,
+#   shared by every worker and surviving restarts
+# =================================================================
+
+import os
+import copy
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from pymongo.errors import ConnectionFailure
+
+from database import get_shared_database
+from observability import get_logger
+
+logger = get_logger("report_cache")
+
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv('VERA_REPORT_CACHE_MAX_ENTRIES', '1024'))
+REPORT_CACHE_TTL_SECONDS = float(os.getenv('VERA_REPORT_CACHE_TTL_SECONDS', '86400'))
+REPORT_CACHE_PERSISTENT = os.getenv('VERA_REPORT_CACHE_PERSISTENT', 'true').lower() in ('1', 'true', 'yes')
+REPORT_CACHE_COLLECTION = 'report_cache'
+
+
+def evidence_cache_key(evidence: dict, prompt_version: str) -> str:
+    """Returns a stable SHA-256 key for an evidence bundle and prompt version."""
+    material = json.dumps(
+        {"prompt_version": prompt_version, "evidence": evidence},
+        sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ReportCache:
+    """Two-tier (memory, then MongoDB) cache of LLM risk reports."""
+
+    def __init__(self, max_entries=REPORT_CACHE_MAX_ENTRIES, ttl_seconds=REPORT_CACHE_TTL_SECONDS,
+                 persistent=REPORT_CACHE_PERSISTENT):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self._entries = OrderedDict()  # key -> (expires_at_monotonic, report)
+        self._lock = threading.Lock()
+        self._index_ready = False
+        self.counters = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    # --- Memory tier ---
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _memory_put(self, key, report, ttl_seconds):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, report)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    # --- Persistent tier ---
+    def _collection(self):
+        if not self.persistent:
+            return None
+        db = get_shared_database().get_db()
+        if db is None:
+            return None
+        collection = db[REPORT_CACHE_COLLECTION]
+        if not self._index_ready:
+            # MongoDB removes documents once `expires_at` has passed.
+            collection.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+        return collection
+
+    def _persistent_get(self, key):
+        try:
+            collection = self._collection()
+            if collection is None:
+                return None, 0
+            document = collection.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+                {"report": 1, "expires_at": 1}
+            )
+            if document is None:
+                return None, 0
+            remaining = (document["expires_at"] - datetime.utcnow()).total_seconds()
+            return document["report"], remaining
+        except ConnectionFailure as e:
+            logger.warning(f"Persistent tier unavailable: {e}")
+            get_shared_database().record_failure()
+        except Exception as e:
+            logger.warning(f"Persistent lookup failed: {e}")
+        return None, 0
+
+    def _persistent_put(self, key, report, token_id):
+        try:
+            collection = self._collection()
+            if collection is None:
+                return
+            now = datetime.utcnow()
+            collection.replace_one(
+                {"_id": key},
+                {
+                    "_id": key,
+                    "token_id": token_id,
+                    "report": report,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                },
+                upsert=True
+            )
+        except ConnectionFailure as e:
+            logger.warning(f"Persistent tier unavailable: {e}")
+            get_shared_database().record_failure()
+        except Exception as e:
+            logger.warning(f"Persistent store failed: {e}")
+
+    # --- Public API ---
+    def get(self, key: str):
+        """Returns a copy of the cached report for a key, or None on a miss."""
+        report = self._memory_get(key)
+        if report is not None:
+            self._count("memory_hits")
+            return copy.deepcopy(report)
+
+        report, remaining = self._persistent_get(key)
+        if report is not None:
+            self._count("persistent_hits")
+            self._memory_put(key, report, min(remaining, self.ttl_seconds))
+            return copy.deepcopy(report)
+
+        self._count("misses")
+        return None
+
+    def put(self, key: str, report: dict, token_id: str = None):
+        """Stores a report in both tiers."""
+        report = copy.deepcopy(report)
+        self._memory_put(key, report, self.ttl_seconds)
+        self._persistent_put(key, report, token_id)
+        self._count("stores")
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the hit rate."""
+        stats = dict(self.counters)
+        hits = stats["memory_hits"] + stats["persistent_hits"]
+        lookups = hits + stats["misses"]
+        stats["entries"] = len(self._entries)
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_report_cache = None
+_report_cache_lock = threading.Lock()
+
+
+def get_report_cache() -> ReportCache:
+    """Returns the process-wide report cache, creating it on first use."""
+    global _report_cache
+    if _report_cache is None:
+        with _report_cache_lock:
+            if _report_cache is None:
+                _report_cache = ReportCache()
+    return _report_cache
@@ -0,0 +1,40 @@
+# =================================================================
+# Vira Engine - Analysis Response Format
+# =================================================================
+# Purpose: Turn a successful analysis into the response body served by
+# GET /analyze/{token_id}: generate its ZK-proof, add it to a Merkle
+# proof batch, register it for verification and wrap it all up.
+#
+# Kept apart from api.py so the job workers (job_queue.py) build the
+# same body without importing the web app.
+# =================================================================
+
+import os
+from datetime import datetime
+
+from zk_proof_simulator import generate_mock_zk_proof, get_proof_batcher
+from proof_registry import get_proof_registry
+
+# Merkle-batched proofs: each report's proof hash also joins a batch whose
+# root commits to every report in the window (see zk_proof_simulator.py)
+PROOF_BATCHING_ENABLED = os.getenv('VERA_PROOF_BATCHING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+
+def build_success_response(token_id: str, analysis_result: dict) -> dict:
+    """Wraps a successful analysis with its ZK-proof into the API response format."""
+    # Generate ZK-proof for successful analysis
+    mock_proof = generate_mock_zk_proof(analysis_result)
+    if PROOF_BATCHING_ENABLED and mock_proof.get("proof_hash"):
+        # The inclusion path is served by /proofs/batches/... once the batch is sealed
+        mock_proof["merkle_batch"] = get_proof_batcher().add(analysis_result)
+    get_proof_registry().register(analysis_result, mock_proof, token_id)
+
+    # Create enhanced API response
+    return {
+        "token_id": token_id,
+        "status": "Success",
+        "analysis_report": analysis_result,
+        "onchain_proof_simulation": mock_proof,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "api_version": "2.0_enhanced"
+    }
@@ -0,0 +1,72 @@
+# =================================================================
+# Vira Engine - Single-Flight Request Coalescing
+# =================================================================
+# Purpose: When several clients request the same token at once, only
+# one analysis should run. Later callers for a key that is already in
+# flight wait for the same result instead of starting their own
+# ingestion and Gemini session.
+#
+# Semantics:
+# - The first caller for a key starts the work as a shared task
+# - Every caller (including the first) gets the same result or exception
+# - A caller that is cancelled stops waiting without cancelling the work
+#   for the others; the work is cancelled only once no caller is left
+# - The key is released as soon as the work finishes, so a later call
+#   starts a fresh analysis
+# =================================================================
+
+import asyncio
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates concurrent async calls that share a key."""
+
+    def __init__(self):
+        self._calls = {}
+        self.coalesced = 0
+
+    def in_flight(self) -> int:
+        """Returns how many distinct keys are currently running."""
+        return len(self._calls)
+
+    async def do(self, key, coroutine_factory):
+        """
+        Runs `coroutine_factory()` for the key, or joins the call already
+        running for it. Returns the shared result or raises its exception.
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(coroutine_factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _task, key=key, call=call: self._release(key, call))
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done() and call.waiters == 1:
+                # Last interested caller went away, so stop the work too and
+                # let the next caller start a fresh call.
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _release(self, key, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.task.cancelled():
+            # Mark the exception as retrieved when no caller is left to see it.
+            call.task.exception()
@@ -0,0 +1,568 @@
+# =================================================================
+# Vira Engine - Offline Stand-ins
+# =================================================================
+# Purpose: Run the analysis pipeline without network access, for the
+# benchmark suite (backend/benchmarks) and local development.
+#
+# - FakeGenerativeModel: deterministic Gemini stand-in that replays
+#   recorded reports (keyed by token_id) with configurable latency
+# - RecordingModel: wraps a real Gemini model and saves its replies in
+#   the format FakeGenerativeModel replays
+# - InMemoryDatabase: MongoDB stand-in loaded from mongodb_ready_data/*.json,
+#   supporting the subset of the pymongo API used by the engine
+#
+# install_offline_backends() wires both into the shared gateways and
+# the shared database connection.
+# =================================================================
+
+import os
+import re
+import copy
+import json
+import time
+import random
+import threading
+from types import SimpleNamespace
+
+from bson import ObjectId
+from pymongo import InsertOne, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from database import SharedDatabase, set_shared_database
+from llm_gateway import get_llm_gateway
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+READY_DATA_FOLDER = os.path.join(BASE_DIR, "..", "mongodb_ready_data")
+
+# File name in mongodb_ready_data -> collection name
+READY_DATA_COLLECTIONS = {
+    "land_registry_prepared.json": "land_registry",
+    "news_alerts_prepared.json": "news_alerts",
+    "property_metadata_prepared.json": "property_metadata",
+}
+
+_PROPERTY_ID_PATTERN = re.compile(r'"property_id":\s*"([^"]+)"')
+
+
+# ========================================
+# FAKE GEMINI
+# ========================================
+class _FakeResponse:
+    def __init__(self, text, prompt_tokens):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=len(text) // 4
+        )
+
+
+class FakeGenerativeModel:
+    """
+    Deterministic stand-in for `genai.GenerativeModel`.
+
+    Replies come from `recordings` (token_id -> report dict) when the
+    prompt's property id is recorded, otherwise a clean default report
+    is generated. Each call sleeps `latency_seconds` plus up to
+    `jitter_seconds` drawn from a seeded generator.
+    """
+
+    def __init__(self, recordings=None, latency_seconds=0.0, jitter_seconds=0.0, seed=0,
+                 chunk_size=64):
+        self.recordings = recordings or {}
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, 'r') as f:
+            return cls(recordings=json.load(f), **kwargs)
+
+    def _reply(self, prompt: str) -> str:
+        match = _PROPERTY_ID_PATTERN.search(prompt)
+        token_id = match.group(1) if match else "UNKNOWN"
+        report = self.recordings.get(token_id)
+        if report is None:
+            report = {
+                "risk_score": 20,
+                "risk_category": "No Risk Found",
+                "summary": f"Offline replay: no recorded report for {token_id}; baseline risk only.",
+                "evidence_summary": [
+                    {"source": "Nigerian Land Registry", "result": "Success", "detail": "Offline replay."},
+                    {"source": "Deed of Assignment", "result": "Success", "detail": "Offline replay."},
+                    {"source": "Nigerian Gazette Alerts", "result": "Success", "detail": "Offline replay."}
+                ],
+                "property_id": token_id,
+                "confidence": 0.9
+            }
+        return json.dumps(report)
+
+    def generate_content(self, contents, *, generation_config=None, stream=False, request_options=None, **kwargs):
+        prompt = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+        with self._lock:
+            self.calls += 1
+            delay = self.latency_seconds + self._random.uniform(0, self.jitter_seconds)
+        if delay > 0:
+            time.sleep(delay)
+        text = self._reply(prompt)
+        prompt_tokens = len(prompt) // 4
+        if not stream:
+            return _FakeResponse(text, prompt_tokens)
+        return [
+            _FakeResponse(text[i:i + self.chunk_size], prompt_tokens)
+            for i in range(0, len(text), self.chunk_size)
+        ]
+
+
+class RecordingModel:
+    """Wraps a real model and stores each parsed reply under its token_id."""
+
+    def __init__(self, model, path):
+        self.model = model
+        self.path = path
+        self.recordings = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.recordings = json.load(f)
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, **kwargs):
+        response = self.model.generate_content(contents, **kwargs)
+        if kwargs.get("stream"):
+            response = list(response)
+            text = "".join(chunk.text for chunk in response)
+        else:
+            text = response.text
+        match = _PROPERTY_ID_PATTERN.search(contents if isinstance(contents, str) else "")
+        try:
+            report = json.loads(text)
+        except ValueError:
+            return response
+        if match:
+            with self._lock:
+                self.recordings[match.group(1)] = report
+                with open(self.path, 'w') as f:
+                    json.dump(self.recordings, f, indent=2)
+        return response
+
+
+# ========================================
+# IN-MEMORY MONGODB
+# ========================================
+def _get_field(document, path):
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _compare(value, operator, argument):
+    if isinstance(value, list) and operator in ("$eq", "$in"):
+        # Array fields match if any element matches, as in MongoDB.
+        return any(_compare(element, operator, argument) for element in value)
+    if operator == "$eq":
+        return value == argument
+    if operator == "$ne":
+        return value != argument
+    if operator == "$in":
+        return value in argument
+    if operator == "$nin":
+        return value not in argument
+    if operator == "$exists":
+        return (value is not None) == bool(argument)
+    if value is None:
+        return False
+    if operator == "$gt":
+        return value > argument
+    if operator == "$gte":
+        return value >= argument
+    if operator == "$lt":
+        return value < argument
+    if operator == "$lte":
+        return value <= argument
+    raise NotImplementedError(f"Operator {operator} is not supported by the in-memory database")
+
+
+def matches_filter(document, query) -> bool:
+    """True if the document matches a (subset of) MongoDB query."""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches_filter(document, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(document, sub) for sub in condition):
+                return False
+            continue
+        value = _get_field(document, key)
+        if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            if not all(_compare(value, op, arg) for op, arg in condition.items()):
+                return False
+        elif isinstance(value, list) and not isinstance(condition, list):
+            if condition not in value:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _project(document, projection):
+    if not projection:
+        return copy.deepcopy(document)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = projection.get("_id", 1)
+    included = [field for field, flag in projection.items() if flag and field != "_id"]
+    if included:
+        result = {field: copy.deepcopy(document[field]) for field in included if field in document}
+    else:
+        excluded = {field for field, flag in projection.items() if not flag}
+        result = {field: copy.deepcopy(value) for field, value in document.items() if field not in excluded}
+    if include_id and "_id" in document:
+        result["_id"] = document["_id"]
+    elif not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def _apply_update(document, update, inserting=False):
+    for operator, fields in update.items():
+        for field, argument in fields.items():
+            if operator == "$set" or (operator == "$setOnInsert" and inserting):
+                document[field] = copy.deepcopy(argument)
+            elif operator == "$inc":
+                document[field] = document.get(field, 0) + argument
+            elif operator == "$unset":
+                document.pop(field, None)
+            elif operator == "$push":
+                document.setdefault(field, []).append(copy.deepcopy(argument))
+            elif operator == "$addToSet":
+                values = argument["$each"] if isinstance(argument, dict) and "$each" in argument else [argument]
+                current = document.setdefault(field, [])
+                for value in values:
+                    if value not in current:
+                        current.append(copy.deepcopy(value))
+            elif operator != "$setOnInsert":
+                raise NotImplementedError(f"Update operator {operator} is not supported by the in-memory database")
+
+
+class _Result(SimpleNamespace):
+    pass
+
+
+class InMemoryCursor:
+    """Lazy result set supporting sort/skip/limit and iteration."""
+
+    def __init__(self, documents, projection):
+        self._documents = documents
+        self._projection = projection
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            self._documents.sort(
+                key=lambda d: (_get_field(d, field) is not None, _get_field(d, field)),
+                reverse=order < 0
+            )
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def __iter__(self):
+        documents = self._documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return (_project(d, self._projection) for d in documents)
+
+
+class InMemoryCollection:
+    """A list of documents behind the subset of the pymongo Collection API used here."""
+
+    def __init__(self, name):
+        self.name = name
+        self._documents = []
+        self._by_id = {}  # _id -> document, like MongoDB's implicit _id index
+        self._unique = []  # (fields, partial filter) of unique indexes, checked on insert
+        # Single-field indexes created with create_index, so equality lookups
+        # cost what they would on a server instead of a scan of every document.
+        self._indexed_fields = set()
+        self._field_indexes = {}  # field -> {value: [documents]}, built on first use
+        self._lock = threading.RLock()
+
+    def _field_index(self, field):
+        index = self._field_indexes.get(field)
+        if index is None:
+            index = {}
+            for document in self._documents:
+                self._index_document(index, field, document)
+            self._field_indexes[field] = index
+        return index
+
+    @staticmethod
+    def _index_document(index, field, document):
+        value = _get_field(document, field)
+        for item in value if isinstance(value, list) else [value]:
+            try:
+                postings = index.setdefault(item, [])
+            except TypeError:
+                continue  # unhashable values never equal a scalar lookup
+            if not postings or postings[-1] is not document:
+                postings.append(document)
+
+    def _changed(self):
+        """Drops the field indexes after documents changed in place."""
+        self._field_indexes = {}
+
+    def _candidates(self, query):
+        """Documents that may match: those found through an index on an equality condition, otherwise all."""
+        if query and "_id" in query and not isinstance(query["_id"], dict):
+            document = self._by_id.get(query["_id"])
+            return [] if document is None else [document]
+        for field, condition in (query or {}).items():
+            if field in self._indexed_fields and not isinstance(condition, (dict, list)):
+                return list(self._field_index(field).get(condition, ()))
+        return self._documents
+
+    def _snapshot(self, query):
+        with self._lock:
+            return [d for d in self._candidates(query) if matches_filter(d, query)]
+
+    def find(self, query=None, projection=None):
+        return InMemoryCursor(self._snapshot(query), projection)
+
+    def find_one(self, query=None, projection=None):
+        with self._lock:
+            for document in self._candidates(query):
+                if matches_filter(document, query):
+                    return _project(document, projection)
+        return None
+
+    def distinct(self, key, query=None):
+        values = []
+        for document in self._snapshot(query):
+            value = _get_field(document, key)
+            for item in value if isinstance(value, list) else [value]:
+                if item is not None and item not in values:
+                    values.append(item)
+        return values
+
+    def count_documents(self, query):
+        return len(self._snapshot(query))
+
+    def _check_unique(self, document):
+        for fields, partial in self._unique:
+            if partial and not matches_filter(document, partial):
+                continue
+            key = [_get_field(document, field) for field in fields]
+            others = self._documents
+            if len(fields) == 1 and fields[0] in self._indexed_fields and not isinstance(key[0], (dict, list)):
+                others = self._field_index(fields[0]).get(key[0], ())
+            for other in others:
+                if (not partial or matches_filter(other, partial)) and \
+                        [_get_field(other, field) for field in fields] == key:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name}")
+
+    def insert_one(self, document):
+        document = copy.deepcopy(document)
+        document.setdefault("_id", ObjectId())
+        with self._lock:
+            if document["_id"] in self._by_id:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_")
+            self._check_unique(document)
+            self._documents.append(document)
+            self._by_id[document["_id"]] = document
+            for field, index in self._field_indexes.items():
+                self._index_document(index, field, document)
+        return _Result(inserted_id=document["_id"])
+
+    def insert_many(self, documents, ordered=True):
+        inserted_ids, write_errors = [], []
+        for index, document in enumerate(documents):
+            try:
+                inserted_ids.append(self.insert_one(document).inserted_id)
+            except DuplicateKeyError as e:
+                write_errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors, "nInserted": len(inserted_ids)})
+        return _Result(inserted_ids=inserted_ids)
+
+    def replace_one(self, query, replacement, upsert=False):
+        with self._lock:
+            for document in self._candidates(query):
+                if matches_filter(document, query):
+                    replacement = copy.deepcopy(replacement)
+                    replacement["_id"] = document["_id"]
+                    # Replace in place so the _id index keeps pointing at it.
+                    document.clear()
+                    document.update(replacement)
+                    self._changed()
+                    return _Result(matched_count=1, modified_count=1, upserted_id=None)
+            if upsert:
+                return _Result(matched_count=0, modified_count=0,
+                               upserted_id=self.insert_one(replacement).inserted_id)
+        return _Result(matched_count=0, modified_count=0, upserted_id=None)
+
+    def update_one(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=False)
+
+    def update_many(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=True)
+
+    def _update(self, query, update, upsert, many):
+        matched = 0
+        with self._lock:
+            for document in self._candidates(query):
+                if matches_filter(document, query):
+                    _apply_update(document, update)
+                    self._changed()
+                    matched += 1
+                    if not many:
+                        break
+            if not matched and upsert:
+                document = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+                _apply_update(document, update, inserting=True)
+                return _Result(matched_count=0, modified_count=0,
+                               upserted_id=self.insert_one(document).inserted_id)
+        return _Result(matched_count=matched, modified_count=matched, upserted_id=None)
+
+    def find_one_and_update(self, query, update, projection=None, sort=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE):
+        with self._lock:
+            candidates = [d for d in self._candidates(query) if matches_filter(d, query)]
+            if sort:
+                candidates = list(InMemoryCursor(candidates, None).sort(sort)._documents)
+            if not candidates:
+                if not upsert:
+                    return None
+                inserted_id = self._update(query, update, upsert=True, many=False).upserted_id
+                return None if return_document == ReturnDocument.BEFORE else _project(self._by_id[inserted_id], projection)
+            document = candidates[0]
+            before = _project(document, projection)
+            _apply_update(document, update)
+            self._changed()
+            return before if return_document == ReturnDocument.BEFORE else _project(document, projection)
+
+    def delete_many(self, query):
+        with self._lock:
+            kept = [d for d in self._documents if not matches_filter(d, query)]
+            deleted = len(self._documents) - len(kept)
+            self._documents = kept
+            self._by_id = {d["_id"]: d for d in kept}
+            self._changed()
+        return _Result(deleted_count=deleted)
+
+    def bulk_write(self, requests, ordered=True):
+        counts = {"inserted_count": 0, "matched_count": 0, "modified_count": 0, "upserted_count": 0}
+        for request in requests:
+            # pymongo keeps each operation's arguments in private attributes.
+            if isinstance(request, InsertOne):
+                self.insert_one(request._doc)
+                counts["inserted_count"] += 1
+                continue
+            if isinstance(request, ReplaceOne):
+                result = self.replace_one(request._filter, request._doc, upsert=request._upsert)
+            elif isinstance(request, UpdateOne):
+                result = self.update_one(request._filter, request._doc, upsert=request._upsert)
+            else:
+                raise NotImplementedError(f"{type(request).__name__} is not supported in memory")
+            counts["matched_count"] += result.matched_count
+            counts["modified_count"] += result.modified_count
+            counts["upserted_count"] += result.upserted_id is not None
+        return _Result(**counts)
+
+    def drop(self):
+        with self._lock:
+            self._documents = []
+            self._by_id = {}
+            self._changed()
+
+    def create_index(self, keys, **kwargs):
+        # Unique indexes reject duplicate inserts; single-field ones also
+        # serve equality lookups (see _candidates).
+        fields = [keys] if isinstance(keys, str) else [field for field, _ in keys]
+        if isinstance(keys, str) or (len(keys) == 1 and keys[0][1] in (1, -1)):
+            with self._lock:
+                self._indexed_fields.add(fields[0])
+        if kwargs.get("unique"):
+            index = (fields, kwargs.get("partialFilterExpression"))
+            with self._lock:
+                if index not in self._unique:
+                    self._unique.append(index)
+        if "name" in kwargs:
+            return kwargs["name"]
+        return keys if isinstance(keys, str) else "_".join(str(k) for k in keys)
+
+
+class InMemoryDatabase:
+    """Dictionary of InMemoryCollections, created on first access like pymongo."""
+
+    def __init__(self, name="vira_engine"):
+        self.name = name
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = InMemoryCollection(name)
+            return self._collections[name]
+
+    def list_collection_names(self):
+        return list(self._collections)
+
+    @classmethod
+    def from_ready_data(cls, folder=READY_DATA_FOLDER):
+        """Loads the mongodb_ready_data/*.json exports into a new database, with the loader's indexes."""
+        from bulk_loader import INDEXES
+
+        database = cls()
+        for collection_name, indexes in INDEXES.items():
+            for keys, options in indexes:
+                database[collection_name].create_index(keys, **options)
+        for file_name, collection_name in READY_DATA_COLLECTIONS.items():
+            path = os.path.join(folder, file_name)
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    database[collection_name].insert_many(json.load(f))
+        return database
+
+
+class InMemorySharedDatabase(SharedDatabase):
+    """SharedDatabase whose connection is an InMemoryDatabase (never fails)."""
+
+    def __init__(self, database):
+        super().__init__(mongo_uri="memory://vira_engine")
+        self._database = SimpleNamespace(db=database, close_connection=lambda: None)
+
+
+def install_offline_backends(recordings=None, latency_seconds=0.0, jitter_seconds=0.0,
+                             database=None, model_names=None):
+    """
+    Points the shared database at an in-memory copy of mongodb_ready_data
+    and every Gemini gateway in `model_names` at a FakeGenerativeModel.
+    Returns (database, fake_model).
+    """
+    from model_router import ESCALATION_MODEL, TRIAGE_MODEL
+
+    database = database if database is not None else InMemoryDatabase.from_ready_data()
+    set_shared_database(InMemorySharedDatabase(database))
+
+    fake_model = FakeGenerativeModel(recordings, latency_seconds, jitter_seconds)
+    for model_name in model_names or (TRIAGE_MODEL, ESCALATION_MODEL):
+        get_llm_gateway(model_name).install_model(fake_model)
+    return database, fake_model
@@ -0,0 +1,83 @@
+# =================================================================
+# Vira Engine - Startup Warm-up and Readiness
+# =================================================================
+# Purpose: Do the expensive first-use work (mapping the data snapshot,
+# loading the fallback data, opening the MongoDB pool, indexing the
+# gazette alerts, importing the Gemini SDK) in the background when a worker starts, instead of inside
+# the first request that needs it.
+#
+# /health answers as soon as the process is up (liveness); /ready only
+# once the warm-up has finished, so a load balancer can hold traffic
+# back from a cold worker. Components that are unavailable (no MongoDB,
+# no API key) are reported but do not block readiness: the request
+# paths already fall back without them.
+# =================================================================
+
+import time
+import threading
+
+from observability import get_logger
+
+logger = get_logger("warmup")
+
+
+class Readiness:
+    """Runs the warm-up steps once and reports their outcome."""
+
+    def __init__(self):
+        self.ready = False
+        self.checks = {}
+        self.started_at = None
+        self.duration_ms = None
+        self._lock = threading.Lock()
+
+    def _step(self, name: str, func):
+        started = time.perf_counter()
+        try:
+            check = {"status": "ok", "detail": func()}
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {e}")
+            check = {"status": "unavailable", "detail": str(e)}
+        check["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        with self._lock:
+            self.checks[name] = check
+
+    def run(self):
+        """Runs every warm-up step (blocking; call it off the event loop)."""
+        import main
+        from deed_store import get_deed_store
+        from fallback_store import get_fallback_store
+        from model_router import get_model_router
+
+        self.started_at = time.perf_counter()
+        self._step("local_data", lambda: get_fallback_store(main.DATA_FOLDER).warm())
+        self._step("deed_store", lambda: {"documents": len(get_deed_store(main.DEED_STORE_PATH) or [])})
+        self._step("database", lambda: {"connected": main.get_mongodb_connection() is not None})
+        self._step("alert_index", main.warm_alert_index)
+        self._step("llm", lambda: get_model_router().warm())
+        self.duration_ms = round((time.perf_counter() - self.started_at) * 1000, 1)
+        self.ready = True
+        logger.info(f"Warm-up finished in {self.duration_ms:.0f} ms")
+
+    def status(self) -> dict:
+        with self._lock:
+            checks = dict(self.checks)
+        return {
+            "status": "ready" if self.ready else "starting",
+            "warmup_ms": self.duration_ms,
+            "checks": checks,
+        }
+
+
+_readiness = None
+_readiness_lock = threading.Lock()
+
+
+def get_readiness() -> Readiness:
+    """Returns the process-wide readiness state, creating it on first use."""
+    global _readiness
+    if _readiness is None:
+        with _readiness_lock:
+            if _readiness is None:
+                _readiness = Readiness()
+    return _readiness
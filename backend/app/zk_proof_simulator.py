@@ -1,10 +1,57 @@
 # VERA AI - SPRINT 3, TASK 3.1: ZK-PROOF SIMULATOR
 # This module simulates the creation of a ZK-proof by generating a verifiable hash.
 
+#
+# Merkle batching: instead of one on-chain anchor per report, reports can be
+# collected into a batch (closed after VERA_PROOF_BATCH_MAX_LEAVES reports or
+# VERA_PROOF_BATCH_WINDOW_SECONDS, whichever comes first). Each report's
+# proof hash becomes a leaf of a Merkle tree that is extended as leaves
+# arrive; a single root then commits to the whole batch, and each report
+# carries an inclusion path that `verify_inclusion` checks against it.
+# Batch ids carry a per-process tag, and sealed batches are persisted next
+# to the proof registry (proof_registry.py), so any worker can serve them.
+
+import os
 import json
+import time
 import hashlib
+import uuid
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
+from observability import get_logger, span
+
+logger = get_logger("zk_proof")
+
+PROOF_BATCH_MAX_LEAVES = int(os.getenv('VERA_PROOF_BATCH_MAX_LEAVES', '1024'))
+PROOF_BATCH_WINDOW_SECONDS = float(os.getenv('VERA_PROOF_BATCH_WINDOW_SECONDS', '5'))
+PROOF_BATCH_RETAINED = int(os.getenv('VERA_PROOF_BATCH_RETAINED', '256'))
+
+# Interior nodes are hashed as sha256(0x01 || left || right). Leaves are
+# sha256 of canonical JSON (which starts with "{"), so a leaf preimage can
+# never be mistaken for an interior node.
+_NODE_PREFIX = b"\x01"
+
+
+def canonical_report_bytes(report: dict) -> bytes:
+    """Returns the stable byte encoding of a report that its proof hash is computed over."""
+    # Sorted keys and no whitespace give the same bytes for the same report.
+    return json.dumps(report, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def report_leaf_hash(report: dict) -> str:
+    """Returns the report's proof hash ("0x" + hex SHA-256), used as its Merkle leaf."""
+    return "0x" + hashlib.sha256(canonical_report_bytes(report)).hexdigest()
+
+
+def _to_bytes(hex_hash: str) -> bytes:
+    return bytes.fromhex(hex_hash[2:] if hex_hash.startswith("0x") else hex_hash)
+
+
+def _hash_pair(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(_NODE_PREFIX + left + right).digest()
+
 def generate_mock_zk_proof(report: dict) -> dict:
     """
     Simulates generating a ZK-proof for a given analysis report.
@@ -23,36 +70,25 @@ def generate_mock_zk_proof(report: dict) -> dict:
     Returns:
         dict: A dictionary containing the mock proof hash and related info.
     """
-    print(f"\n[ZK Simulator] Generating mock proof for token: {report.get('token_id')}")
+    logger.debug(f"Generating mock proof for token: {report.get('token_id')}")
 
     try:
-        # To ensure the hash is always the same for the same report, we need to
-        # sort the dictionary keys. This creates a consistent string representation.
-        # The `separators` argument removes whitespace for a more compact string.
-        report_string = json.dumps(report, sort_keys=True, separators=(',', ':'))
-
-        # Create a SHA-256 hash object.
-        hasher = hashlib.sha256()
-
-        # Update the hasher with the byte representation of our report string.
-        hasher.update(report_string.encode('utf-8'))
-
-        # Get the hexadecimal representation of the hash.
-        proof_hash = hasher.hexdigest()
+        with span("proof_hash"):
+            proof_hash = report_leaf_hash(report)
 
         # Assemble the final proof object.
         mock_proof_object = {
-            "proof_hash": f"0x{proof_hash}",
+            "proof_hash": proof_hash,
             "hash_algorithm": "sha256",
             "prover": "Vera_AI_Mock_Prover_v1.0",
             "timestamp": datetime.utcnow().isoformat() + "Z" # Use UTC for consistency
         }
         
-        print(f"[ZK Simulator] Mock proof generated successfully. Hash: 0x{proof_hash[:10]}...")
+        logger.debug(f"Mock proof generated successfully. Hash: {proof_hash[:12]}...")
         return mock_proof_object
 
     except Exception as e:
-        print(f"[ZK Simulator] Error: Failed to generate mock proof: {e}")
+        logger.error(f"Failed to generate mock proof: {e}")
         return {
             "proof_hash": None,
             "hash_algorithm": "sha256",
@@ -60,6 +96,294 @@ def generate_mock_zk_proof(report: dict) -> dict:
             "error": str(e)
         }
 
+
+# ========================================
+# MERKLE BATCHING
+# ========================================
+class IncrementalMerkleTree:
+    """
+    Merkle tree over 32-byte leaves, extended one leaf at a time.
+
+    Only complete pairs are hashed on append, so adding a leaf costs
+    O(log n). An unpaired node at the end of a level is carried up
+    unchanged, which is resolved when the root or a path is requested.
+    """
+
+    def __init__(self):
+        self._levels = [[]]  # _levels[0] = leaves, _levels[k + 1] = parents of complete pairs in _levels[k]
+
+    def __len__(self):
+        return len(self._levels[0])
+
+    def append(self, leaf: bytes) -> int:
+        """Adds a leaf and returns its index."""
+        level = 0
+        self._levels[0].append(leaf)
+        while len(self._levels[level]) % 2 == 0:
+            nodes = self._levels[level]
+            parent = _hash_pair(nodes[-2], nodes[-1])
+            if level + 1 == len(self._levels):
+                self._levels.append([])
+            self._levels[level + 1].append(parent)
+            level += 1
+        return len(self._levels[0]) - 1
+
+    def _carries(self):
+        """Returns the node carried into each level from the partial right edge below it."""
+        carries = []
+        carry = None
+        for nodes in self._levels:
+            carries.append(carry)
+            if len(nodes) % 2 == 1:
+                carry = nodes[-1] if carry is None else _hash_pair(nodes[-1], carry)
+        carries.append(carry)
+        return carries
+
+    def root(self) -> bytes:
+        if not self._levels[0]:
+            raise ValueError("Cannot compute the root of an empty tree")
+        top = self._levels[-1]
+        carry = self._carries()[len(self._levels) - 1]
+        if carry is None:
+            return top[0]
+        return _hash_pair(top[0], carry)
+
+    def inclusion_path(self, index: int) -> list:
+        """Returns [(sibling, "left" | "right"), ...] from the leaf at `index` up to the root."""
+        if not 0 <= index < len(self):
+            raise IndexError(f"Leaf index {index} out of range for {len(self)} leaves")
+        carries = self._carries()
+        path = []
+        level = 0
+        while True:
+            nodes = self._levels[level] if level < len(self._levels) else []
+            width = len(nodes) + (1 if carries[level] is not None else 0)
+            if width <= 1:
+                return path
+            sibling_index = index ^ 1
+            if sibling_index < width:
+                sibling = nodes[sibling_index] if sibling_index < len(nodes) else carries[level]
+                path.append((sibling, "left" if sibling_index < index else "right"))
+            index //= 2
+            level += 1
+
+
+def verify_inclusion(leaf_hash: str, path: list, root: str) -> bool:
+    """
+    Checks that `leaf_hash` is committed to by `root` through `path`.
+
+    Args:
+        leaf_hash (str): The report's proof hash ("0x..." hex).
+        path (list): Inclusion path as returned in a batch proof:
+            [{"hash": "0x...", "position": "left" | "right"}, ...].
+        root (str): The batch root ("0x..." hex).
+
+    Returns:
+        bool: True if the path recomputes the root.
+    """
+    try:
+        node = _to_bytes(leaf_hash)
+        for step in path:
+            sibling = _to_bytes(step["hash"])
+            node = _hash_pair(sibling, node) if step["position"] == "left" else _hash_pair(node, sibling)
+        return node == _to_bytes(root)
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def _format_path(path: list) -> list:
+    return [{"hash": "0x" + sibling.hex(), "position": position} for sibling, position in path]
+
+
+class MerkleBatch:
+    """One window of report leaves; immutable once sealed."""
+
+    def __init__(self, batch_id: str):
+        self.batch_id = batch_id
+        self.tree = IncrementalMerkleTree()
+        self.opened_at = time.time()
+        self.sealed_at = None
+        self.root = None
+
+    @property
+    def sealed(self) -> bool:
+        return self.root is not None
+
+    @classmethod
+    def from_leaves(cls, batch_id: str, leaf_hashes: list, opened_at: float = None,
+                    sealed_at: float = None) -> "MerkleBatch":
+        """Rebuilds a sealed batch from its leaf hashes (as returned by `leaf_hashes`)."""
+        batch = cls(batch_id)
+        for leaf_hash in leaf_hashes:
+            batch.tree.append(_to_bytes(leaf_hash))
+        batch.root = "0x" + batch.tree.root().hex()
+        batch.opened_at = opened_at if opened_at is not None else batch.opened_at
+        batch.sealed_at = sealed_at if sealed_at is not None else time.time()
+        return batch
+
+    def leaf_hashes(self) -> list:
+        return ["0x" + leaf.hex() for leaf in self.tree._levels[0]]
+
+    def inclusion_proof(self, leaf_index: int) -> dict:
+        """Returns the leaf hash, batch root and inclusion path for one leaf of a sealed batch."""
+        return {
+            "batch_id": self.batch_id,
+            "leaf_index": leaf_index,
+            "leaf_hash": "0x" + self.tree._levels[0][leaf_index].hex(),
+            "root": self.root,
+            "path": _format_path(self.tree.inclusion_path(leaf_index)),
+            "batch_size": len(self.tree),
+            "hash_algorithm": "sha256",
+        }
+
+
+class ProofBatcher:
+    """
+    Collects report hashes into Merkle batches.
+
+    A batch is sealed when it reaches `max_leaves` or when `window_seconds`
+    have passed since its first leaf, whichever comes first. `on_seal`, if
+    given, is called with each sealed batch (for example to anchor the root).
+    The most recent `retained` sealed batches are kept for proof lookups.
+    """
+
+    def __init__(self, max_leaves: int = PROOF_BATCH_MAX_LEAVES,
+                 window_seconds: float = PROOF_BATCH_WINDOW_SECONDS,
+                 retained: int = PROOF_BATCH_RETAINED, on_seal=None):
+        self.max_leaves = max(1, max_leaves)
+        self.window_seconds = window_seconds
+        self.retained = retained
+        self.on_seal = on_seal
+        self._open = None
+        self._batches = OrderedDict()  # batch_id -> MerkleBatch (open and sealed)
+        # Tells apart the batches of different processes (and restarts) opened in the same second
+        self._instance = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def add(self, report: dict) -> dict:
+        """
+        Adds a report to the open batch.
+
+        Returns:
+            dict: {"batch_id", "leaf_index", "leaf_hash"}. The inclusion proof
+            is available from `inclusion_proof` once the batch is sealed.
+        """
+        with span("proof_hash"):
+            leaf_hash = report_leaf_hash(report)
+        sealed = None
+        with self._lock:
+            batch = self._open
+            if batch is None:
+                batch = self._open_batch()
+            leaf_index = batch.tree.append(_to_bytes(leaf_hash))
+            if len(batch.tree) >= self.max_leaves:
+                sealed = self._seal_locked(batch)
+        if sealed is not None:
+            self._notify(sealed)
+        return {"batch_id": batch.batch_id, "leaf_index": leaf_index, "leaf_hash": leaf_hash}
+
+    def _open_batch(self) -> MerkleBatch:
+        self._sequence += 1
+        batch = MerkleBatch(f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{self._instance}-{self._sequence:06d}")
+        self._open = batch
+        self._batches[batch.batch_id] = batch
+        if self.window_seconds > 0:
+            timer = threading.Timer(self.window_seconds, self._seal_on_timer, args=(batch,))
+            timer.daemon = True
+            timer.start()
+        return batch
+
+    def _seal_locked(self, batch: MerkleBatch) -> MerkleBatch:
+        with span("merkle_seal"):
+            batch.root = "0x" + batch.tree.root().hex()
+        batch.sealed_at = time.time()
+        if self._open is batch:
+            self._open = None
+        sealed_count = sum(1 for b in self._batches.values() if b.sealed)
+        while sealed_count > self.retained:
+            oldest_id = next(batch_id for batch_id, b in self._batches.items() if b.sealed)
+            del self._batches[oldest_id]
+            sealed_count -= 1
+        logger.info(f"Sealed proof batch {batch.batch_id} with {len(batch.tree)} leaves, root {batch.root[:12]}...")
+        return batch
+
+    def _seal_on_timer(self, batch: MerkleBatch):
+        with self._lock:
+            if batch.sealed or self._open is not batch:
+                return
+            sealed = self._seal_locked(batch)
+        self._notify(sealed)
+
+    def _notify(self, batch: MerkleBatch):
+        if self.on_seal is None:
+            return
+        try:
+            self.on_seal(batch)
+        except Exception as e:
+            logger.warning(f"Proof batch seal callback failed for {batch.batch_id}: {e}")
+
+    def seal(self):
+        """Seals the open batch now (if it has leaves) and returns it, or None."""
+        with self._lock:
+            if self._open is None or not len(self._open.tree):
+                return None
+            sealed = self._seal_locked(self._open)
+        self._notify(sealed)
+        return sealed
+
+    def get_batch(self, batch_id: str):
+        with self._lock:
+            return self._batches.get(batch_id)
+
+    def inclusion_proof(self, batch_id: str, leaf_index: int):
+        """
+        Returns the inclusion proof for a leaf, or None if the batch is unknown or still open.
+
+        Raises:
+            IndexError: If the batch has no leaf at `leaf_index`.
+        """
+        batch = self.get_batch(batch_id)
+        if batch is None or not batch.sealed:
+            return None
+        return batch.inclusion_proof(leaf_index)
+
+
+def build_merkle_batch_proofs(reports: list) -> list:
+    """
+    Builds one Merkle batch over a known list of reports in one go.
+
+    Returns:
+        list: The inclusion proof of each report, in input order.
+    """
+    batch = MerkleBatch(f"adhoc-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}")
+    with span("proof_hash"):
+        for report in reports:
+            batch.tree.append(_to_bytes(report_leaf_hash(report)))
+    if not reports:
+        return []
+    with span("merkle_seal"):
+        batch.root = "0x" + batch.tree.root().hex()
+    batch.sealed_at = time.time()
+    return [batch.inclusion_proof(i) for i in range(len(reports))]
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_proof_batcher() -> ProofBatcher:
+    """Returns the process-wide proof batcher; sealed batches go to the proof registry."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                from proof_registry import get_proof_registry
+
+                _batcher = ProofBatcher(on_seal=get_proof_registry().register_batch)
+    return _batcher
+
+
 # --- Standalone Test Block ---
 # This allows us to test this file directly if needed.
 if __name__ == "__main__":
@@ -89,3 +413,12 @@ if __name__ == "__main__":
     print(f"Proof 1 Hash: {proof1['proof_hash']}")
     print(f"Proof 2 Hash: {proof2['proof_hash']}")
     print(f"Hashes are identical: {proof1['proof_hash'] == proof2['proof_hash']}")
+
+    # Batch a few reports into one Merkle root and verify each inclusion path
+    print("\n--- Merkle Batch Test ---")
+    reports = [dict(sample_report, token_id=f"NGA-LAG-{i:03d}") for i in range(1, 6)]
+    batch_proofs = build_merkle_batch_proofs(reports)
+    print(f"Batch root: {batch_proofs[0]['root']}")
+    for batch_proof in batch_proofs:
+        valid = verify_inclusion(batch_proof["leaf_hash"], batch_proof["path"], batch_proof["root"])
+        print(f"Leaf {batch_proof['leaf_index']}: path length {len(batch_proof['path'])}, valid: {valid}")
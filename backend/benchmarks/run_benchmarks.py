@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Per-stage micro-benchmarks for the Vera AI analysis pipeline.
+
+Runs fully offline: MongoDB is replaced by an in-memory copy of
+mongodb_ready_data/*.json and Gemini by a deterministic fake (see
+app/stubs.py). Each stage reports throughput and latency percentiles and
+is compared against saved baselines; a stage whose p50 or p95 is slower
+than its baseline by more than the tolerance fails the run (exit code 1).
+
+Baselines are recorded on one machine and checked on another (CI runners),
+so every run also times a fixed pure-Python calibration workload. Limits
+are scaled by how much slower that workload ran than when the baselines
+were recorded; a faster machine keeps the recorded limits.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --iterations 500 --stages prompt_assembly,zk_proof
+    python benchmarks/run_benchmarks.py --update-baselines
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import hashlib
+import argparse
+import contextlib
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCHMARKS_DIR, "..", "app")
+DEFAULT_BASELINES_PATH = os.path.join(BENCHMARKS_DIR, "baselines.json")
+
+# Measure the pipeline itself, not cache hits or a real connection.
+os.environ.setdefault("VERA_REPORT_CACHE_PERSISTENT", "false")
+os.environ.setdefault("VERA_REPORT_CACHE_MAX_ENTRIES", "0")
+os.environ.setdefault("VERA_LOG_LEVEL", "ERROR")
+sys.path.insert(0, APP_DIR)
+
+from stubs import install_offline_backends  # noqa: E402
+import main  # noqa: E402
+from prescreen import get_prescreen_engine  # noqa: E402
+from prompt_builder import assemble_investigation_prompt  # noqa: E402
+from zk_proof_simulator import generate_mock_zk_proof  # noqa: E402
+from owner_alert_links import get_owner_alert_linker  # noqa: E402
+
+CALIBRATION_STAGE = "calibration"
+
+TOKEN_IDS = sorted(
+    name.split("_")[0]
+    for name in os.listdir(main.DATA_FOLDER)
+    if name.endswith("_Deed_of_Assignment.txt")
+)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def run_stage(name, operation, iterations, warmup):
+    """Times `operation(i)` and returns throughput and latency stats in ms."""
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        for i in range(warmup):
+            operation(i)
+        samples = []
+        started = time.perf_counter()
+        for i in range(iterations):
+            op_started = time.perf_counter_ns()
+            operation(i)
+            samples.append((time.perf_counter_ns() - op_started) / 1e6)
+        total = time.perf_counter() - started
+    samples.sort()
+    return {
+        "stage": name,
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / total, 1) if total else 0.0,
+        "p50_ms": round(percentile(samples, 0.50), 4),
+        "p95_ms": round(percentile(samples, 0.95), 4),
+        "p99_ms": round(percentile(samples, 0.99), 4),
+        "max_ms": round(samples[-1], 4),
+    }
+
+
+_CALIBRATION_PAYLOAD = {
+    "alerts": [
+        {"alert_id": f"CAL-{n}", "headline": f"Gazette notice {n}", "summary": "Revocation of title " * 8}
+        for n in range(20)
+    ],
+}
+
+
+def calibration_workload(i):
+    """Fixed CPU work (JSON, hashing, string handling) to gauge the machine's speed."""
+    encoded = json.dumps(_CALIBRATION_PAYLOAD, sort_keys=True)
+    hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+    json.loads(encoded)
+    return sum(len(word) for word in encoded.lower().split())
+
+
+def build_stages():
+    """Returns {stage name: operation(i)} over the demo tokens."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        asset_data = {token_id: main.get_asset_data_fallback(token_id) for token_id in TOKEN_IDS}
+        evidence = {token_id: main.build_evidence_bundle(token_id, asset_data[token_id]) for token_id in TOKEN_IDS}
+    prescreen_engine = get_prescreen_engine()
+    sample_report = {
+        "token_id": TOKEN_IDS[0],
+        "status": "Success",
+        "risk_assessment": {"risk_score": 20, "risk_category": "No Risk Found"},
+        "details": "Benchmark report",
+    }
+
+    def token(i):
+        return TOKEN_IDS[i % len(TOKEN_IDS)]
+
+    return {
+        CALIBRATION_STAGE: calibration_workload,
+        "ingest_fallback": lambda i: main.get_asset_data_fallback(token(i)),
+        "ingest_mongodb": lambda i: main.get_asset_data_from_mongodb(token(i)),
+        "evidence_bundle": lambda i: main.build_evidence_bundle(token(i), asset_data[token(i)]),
+        "prescreen": lambda i: prescreen_engine.evaluate(evidence[token(i)], deed_loaded=asset_data[token(i)].deed_loaded),
+        "prompt_assembly": lambda i: assemble_investigation_prompt(token(i), evidence[token(i)]),
+        "zk_proof": lambda i: generate_mock_zk_proof(sample_report),
+        "analysis_end_to_end": lambda i: main.perform_asset_analysis(token(i)),
+    }
+
+
+def machine_scale(results, baselines) -> float:
+    """How much slower this machine ran the calibration workload than the baseline machine (>= 1)."""
+    calibration = next((r for r in results if r["stage"] == CALIBRATION_STAGE), None)
+    baseline = baselines.get(CALIBRATION_STAGE)
+    if not calibration or not baseline or not baseline["p50_ms"]:
+        return 1.0
+    return max(1.0, calibration["p50_ms"] / baseline["p50_ms"])
+
+
+def compare_to_baselines(results, baselines, tolerance, min_slack_ms, scale=1.0):
+    """
+    Returns a list of regression messages (empty if everything is within tolerance).
+    Baselines are multiplied by `scale` (see machine_scale) before the tolerance
+    is applied. `min_slack_ms` keeps microsecond-scale stages from failing on
+    timer noise.
+    """
+    regressions = []
+    for result in results:
+        baseline = baselines.get(result["stage"])
+        if not baseline or result["stage"] == CALIBRATION_STAGE:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            expected = baseline[metric] * scale
+            limit = max(expected * (1 + tolerance), expected + min_slack_ms)
+            if result[metric] > limit:
+                regressions.append(
+                    f"{result['stage']}: {metric} {result[metric]:.4f} > {limit:.4f} "
+                    f"(baseline {baseline[metric]:.4f} x{scale:.2f})"
+                )
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline per-stage benchmarks for the Vera AI pipeline")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--stages", help="Comma-separated subset of stages to run")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0,
+                        help="Simulated Gemini latency for the end-to-end stage")
+    parser.add_argument("--baselines", default=DEFAULT_BASELINES_PATH)
+    parser.add_argument("--tolerance", type=float, default=1.0,
+                        help="Allowed slowdown vs. baseline before failing (1.0 = 2x)")
+    parser.add_argument("--min-slack-ms", type=float, default=0.05,
+                        help="Allowed absolute slowdown for very fast stages")
+    parser.add_argument("--update-baselines", action="store_true")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    database, _ = install_offline_backends(latency_seconds=args.llm_latency_ms / 1000)
+    # Build the owner -> alert links up front, as a loaded deployment would have them.
+    get_owner_alert_linker().sync(database, force=True)
+    stages = build_stages()
+    selected = args.stages.split(",") if args.stages else list(stages)
+    unknown = [name for name in selected if name not in stages]
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(unknown)} (available: {', '.join(stages)})")
+
+    results = []
+    print(f"{'stage':<22}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    # The calibration stage always runs, so limits can be scaled to this machine.
+    for name in [CALIBRATION_STAGE] + [name for name in selected if name != CALIBRATION_STAGE]:
+        result = run_stage(name, stages[name], args.iterations, args.warmup)
+        results.append(result)
+        print(f"{name:<22}{result['ops_per_sec']:>10}{result['p50_ms']:>10.3f}"
+              f"{result['p95_ms']:>10.3f}{result['p99_ms']:>10.3f}{result['max_ms']:>10.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baselines:
+        baselines = {}
+        if os.path.exists(args.baselines):
+            with open(args.baselines, 'r') as f:
+                baselines = json.load(f)
+        baselines.update({r["stage"]: {"p50_ms": r["p50_ms"], "p95_ms": r["p95_ms"]} for r in results})
+        with open(args.baselines, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"\nBaselines written to {args.baselines}")
+        return 0
+
+    if not os.path.exists(args.baselines):
+        print("\nNo baselines found; run with --update-baselines to create them.")
+        return 0
+    with open(args.baselines, 'r') as f:
+        baselines = json.load(f)
+    scale = machine_scale(results, baselines)
+    print(f"\nMachine speed vs. baselines: limits scaled x{scale:.2f}")
+    regressions = compare_to_baselines(results, baselines, args.tolerance, args.min_slack_ms, scale)
+    if regressions:
+        print("\nRegressions:")
+        for message in regressions:
+            print(f"  - {message}")
+        return 1
+    print("\nAll stages within tolerance of baselines.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
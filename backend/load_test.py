@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Load generator for the Vera AI API.
+
+Drives /analyze/{token_id}, /health and /analyze/batch from an async
+client and records latency histograms, error rates and throughput per
+endpoint. Results are printed and can be written as JSON for comparing runs.
+
+Arrival patterns:
+- closed:   --clients N workers, each sending its next request as soon as
+            the previous one returns
+- constant: open loop at --rate requests/second
+- ramp:     open loop from --rate to --ramp-to requests/second over --duration
+
+In the open-loop patterns latency is measured from each request's scheduled
+start, so time spent queued behind a slow server is counted (no coordinated
+omission). --max-in-flight caps the concurrent connections.
+
+Token choice follows a Zipf distribution (--skew 0 is uniform, higher
+values concentrate traffic on a few hot tokens).
+
+Usage:
+    # Against a local server with stubbed Gemini and MongoDB
+    python load_test.py --spawn-server --pattern closed --clients 100 --duration 30
+
+    # Ramp a deployed server from 10 to 200 req/s with hot-token skew
+    python load_test.py http://localhost:8000 --pattern ramp --rate 10 --ramp-to 200 --skew 1.2
+
+    # Compare with an earlier run
+    python load_test.py --spawn-server --output run2.json --compare run1.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime
+
+import httpx
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FOLDER = os.path.join(BASE_DIR, "nigeria_demo_data")
+
+
+# ========================================
+# LATENCY HISTOGRAM
+# ========================================
+class LatencyHistogram:
+    """
+    HDR-style histogram of latencies in microseconds.
+
+    Values are bucketed to `significant_digits` significant figures, so the
+    relative error is bounded (1% at 2 digits) over any range, memory stays
+    small, and histograms from several runs or workers can be merged.
+    """
+
+    def __init__(self, significant_digits=2):
+        self.significant_digits = significant_digits
+        self.counts = {}
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value):
+        if value <= 0:
+            return 0
+        step = 10 ** max(math.floor(math.log10(value)) - self.significant_digits, 0)
+        return math.ceil(value / step) * step
+
+    def record(self, value_us):
+        value_us = int(value_us)
+        bucket = self._bucket(value_us)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        self.min = value_us if self.min is None else min(self.min, value_us)
+        self.max = value_us if self.max is None else max(self.max, value_us)
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given quantile, in microseconds."""
+        if not self.total:
+            return 0
+        rank = max(1, math.ceil(fraction * self.total))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(bucket, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.total,
+            "min_ms": round((self.min or 0) / 1000, 3),
+            "p50_ms": round(self.percentile(0.50) / 1000, 3),
+            "p90_ms": round(self.percentile(0.90) / 1000, 3),
+            "p99_ms": round(self.percentile(0.99) / 1000, 3),
+            "p999_ms": round(self.percentile(0.999) / 1000, 3),
+            "max_ms": round((self.max or 0) / 1000, 3),
+        }
+
+    def to_dict(self):
+        return {
+            "significant_digits": self.significant_digits,
+            "buckets_us": [[bucket, self.counts[bucket]] for bucket in sorted(self.counts)],
+        }
+
+
+class EndpointStats:
+    """Latency histogram, status codes and errors for one endpoint."""
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.status_counts = {}
+        self.errors = 0
+        self.requests = 0
+
+    def record(self, latency_us, status):
+        self.requests += 1
+        self.histogram.record(latency_us)
+        key = str(status)
+        self.status_counts[key] = self.status_counts.get(key, 0) + 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors += 1
+
+    def to_dict(self, elapsed_seconds):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            "throughput_rps": round(self.requests / elapsed_seconds, 2) if elapsed_seconds else 0.0,
+            "status_counts": self.status_counts,
+            "latency": self.histogram.summary(),
+            "histogram": self.histogram.to_dict(),
+        }
+
+
+# ========================================
+# WORKLOAD
+# ========================================
+def load_token_ids():
+    return sorted(
+        name.split("_")[0]
+        for name in os.listdir(DATA_FOLDER)
+        if name.endswith("_Deed_of_Assignment.txt")
+    )
+
+
+class Workload:
+    """Chooses the endpoint and tokens for each request."""
+
+    def __init__(self, token_ids, mix, skew, batch_size, seed):
+        self.token_ids = token_ids
+        self.endpoints = list(mix)
+        self.endpoint_weights = [mix[name] for name in self.endpoints]
+        # Zipf weights: rank r gets 1 / r^skew
+        self.token_weights = [1 / (rank ** skew) for rank in range(1, len(token_ids) + 1)]
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+
+    def _token(self):
+        return self.random.choices(self.token_ids, weights=self.token_weights)[0]
+
+    def next_request(self):
+        endpoint = self.random.choices(self.endpoints, weights=self.endpoint_weights)[0]
+        if endpoint == "health":
+            return endpoint, "GET", "/health", None
+        if endpoint == "batch":
+            tokens = [self._token() for _ in range(self.batch_size)]
+            return endpoint, "POST", "/analyze/batch", {"token_ids": tokens}
+        return endpoint, "GET", f"/analyze/{self._token()}", None
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("analyze", "health", "batch"):
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}' in --mix")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ========================================
+# RUNNER
+# ========================================
+class LoadRunner:
+    def __init__(self, base_url, workload, args):
+        self.base_url = base_url.rstrip("/")
+        self.workload = workload
+        self.args = args
+        self.stats = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def _send(self, client, scheduled_at):
+        endpoint, method, path, body = self.workload.next_request()
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if method == "GET":
+                response = await client.get(path)
+            else:
+                # Batch results stream as NDJSON; wait for the last line.
+                response = await client.post(path, json=body)
+            status = response.status_code
+        except httpx.TimeoutException:
+            status = "timeout"
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        finally:
+            self.in_flight -= 1
+        latency_us = (time.perf_counter() - scheduled_at) * 1e6
+        self.stats.setdefault(endpoint, EndpointStats()).record(latency_us, status)
+
+    async def _closed_loop(self, client, deadline):
+        async def worker():
+            while time.perf_counter() < deadline:
+                await self._send(client, time.perf_counter())
+        await asyncio.gather(*(worker() for _ in range(self.args.clients)))
+
+    def _rate_at(self, elapsed):
+        if self.args.pattern == "ramp":
+            progress = min(elapsed / self.args.duration, 1.0)
+            return self.args.rate + (self.args.ramp_to - self.args.rate) * progress
+        return self.args.rate
+
+    async def _open_loop(self, client, started, deadline):
+        slots = asyncio.Semaphore(self.args.max_in_flight)
+        tasks = set()
+
+        async def fire(scheduled_at):
+            async with slots:
+                await self._send(client, scheduled_at)
+
+        next_at = started
+        while next_at < deadline:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.ensure_future(fire(next_at))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            next_at += 1.0 / max(self._rate_at(next_at - started), 0.001)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def run(self):
+        limits = httpx.Limits(
+            max_connections=max(self.args.clients, self.args.max_in_flight),
+            max_keepalive_connections=max(self.args.clients, self.args.max_in_flight)
+        )
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits,
+                                     timeout=self.args.timeout) as client:
+            started = time.perf_counter()
+            deadline = started + self.args.duration
+            if self.args.pattern == "closed":
+                await self._closed_loop(client, deadline)
+            else:
+                await self._open_loop(client, started, deadline)
+            elapsed = time.perf_counter() - started
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        overall = EndpointStats()
+        for endpoint_stats in self.stats.values():
+            overall.histogram.merge(endpoint_stats.histogram)
+            overall.requests += endpoint_stats.requests
+            overall.errors += endpoint_stats.errors
+            for status, count in endpoint_stats.status_counts.items():
+                overall.status_counts[status] = overall.status_counts.get(status, 0) + count
+        config = {key: value for key, value in vars(self.args).items() if key not in ("output", "compare")}
+        return {
+            "started_at": datetime.utcnow().isoformat() + "Z",
+            "base_url": self.base_url,
+            "config": config,
+            "elapsed_seconds": round(elapsed, 3),
+            "peak_in_flight": self.peak_in_flight,
+            "overall": overall.to_dict(elapsed),
+            "endpoints": {name: stats.to_dict(elapsed) for name, stats in sorted(self.stats.items())},
+        }
+
+
+# ========================================
+# LOCAL SERVER WITH OFFLINE BACKENDS
+# ========================================
+def spawn_offline_server(port, llm_latency_ms, workers):
+    env = dict(os.environ)
+    env["VERA_OFFLINE_BACKENDS"] = "true"
+    env["VERA_OFFLINE_LLM_LATENCY_MS"] = str(llm_latency_ms)
+    env.setdefault("VERA_REPORT_CACHE_PERSISTENT", "false")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.api:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Offline server did not become healthy")
+
+
+def print_report(report, baseline=None):
+    print(f"\nElapsed {report['elapsed_seconds']}s, peak in flight {report['peak_in_flight']}")
+    header = f"{'endpoint':<10}{'reqs':>8}{'err%':>8}{'rps':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    rows = [("overall", report["overall"])] + list(report["endpoints"].items())
+    for name, stats in rows:
+        latency = stats["latency"]
+        print(f"{name:<10}{stats['requests']:>8}{stats['error_rate'] * 100:>8.2f}{stats['throughput_rps']:>9.1f}"
+              f"{latency['p50_ms']:>10.2f}{latency['p90_ms']:>10.2f}{latency['p99_ms']:>10.2f}{latency['max_ms']:>10.2f}")
+        if baseline is not None:
+            previous = baseline["overall"] if name == "overall" else baseline["endpoints"].get(name)
+            if previous:
+                deltas = [
+                    f"{metric} {latency[metric] - previous['latency'][metric]:+.2f}"
+                    for metric in ("p50_ms", "p99_ms")
+                ]
+                print(f"{'':<10}vs baseline: rps {stats['throughput_rps'] - previous['throughput_rps']:+.1f}, "
+                      f"{', '.join(deltas)}, err% {(stats['error_rate'] - previous['error_rate']) * 100:+.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async HTTP load generator for the Vera AI API")
+    parser.add_argument("base_url", nargs="?", default="http://localhost:8000")
+    parser.add_argument("--pattern", choices=("closed", "constant", "ramp"), default="closed")
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent clients (closed loop)")
+    parser.add_argument("--rate", type=float, default=50, help="Requests/second (open loop start rate)")
+    parser.add_argument("--ramp-to", type=float, default=500, help="Final requests/second for --pattern ramp")
+    parser.add_argument("--max-in-flight", type=int, default=500, help="Open-loop connection cap")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to generate load")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("analyze=0.9,health=0.05,batch=0.05"),
+                        help="Endpoint weights, e.g. analyze=0.9,health=0.05,batch=0.05")
+    parser.add_argument("--skew", type=float, default=0.0, help="Zipf exponent for token choice (0 = uniform)")
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--tokens", help="Comma-separated token ids (default: the demo tokens)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--spawn-server", action="store_true",
+                        help="Start a local server with stubbed Gemini and MongoDB")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--llm-latency-ms", type=float, default=800,
+                        help="Simulated Gemini latency for --spawn-server")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier JSON result to compare against")
+    args = parser.parse_args()
+
+    token_ids = args.tokens.split(",") if args.tokens else load_token_ids()
+    workload = Workload(token_ids, args.mix, args.skew, args.batch_size, args.seed)
+
+    process = None
+    base_url = args.base_url
+    if args.spawn_server:
+        process, base_url = spawn_offline_server(args.port, args.llm_latency_ms, args.server_workers)
+        print(f"🧪 Started offline server at {base_url}")
+    try:
+        print(f"🧪 Load testing {base_url}: pattern={args.pattern}, duration={args.duration}s")
+        report = asyncio.run(LoadRunner(base_url, workload, args).run())
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
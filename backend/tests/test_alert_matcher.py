@@ -0,0 +1,50 @@
+"""Background syncing of the MongoDB-backed alert index."""
+
+import time
+
+from alert_matcher import CollectionAlertMatcher
+from stubs import InMemoryDatabase
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def alert(alert_id, summary):
+    return {"alert_id": alert_id, "date": "2024-01-01", "source": "Gazette", "category": "Legal Notice",
+            "headline": "Notice", "summary": summary}
+
+
+def test_thread_builds_the_index_immediately():
+    collection = InMemoryDatabase()["news_alerts"]
+    collection.insert_one(alert("A-1", "Suit filed against Adaeze Okafor"))
+    matcher = CollectionAlertMatcher(sync_interval=60.0)
+
+    matcher.start(lambda: collection)
+    try:
+        assert wait_until(lambda: matcher.maintained)
+        assert [a["alert_id"] for a in matcher.match_alerts("Adaeze Okafor")] == ["A-1"]
+    finally:
+        matcher.stop()
+
+
+def test_index_is_not_maintained_until_the_thread_has_built_it():
+    collection = InMemoryDatabase()["news_alerts"]
+    collection.insert_one(alert("A-1", "Suit filed against Adaeze Okafor"))
+    matcher = CollectionAlertMatcher(sync_interval=60.0)
+
+    # MongoDB is down when the thread starts, so the callers still sync themselves.
+    matcher.start(lambda: None)
+    try:
+        time.sleep(0.05)
+        assert not matcher.maintained
+        matcher.sync(collection)
+        assert matcher.maintained
+        assert len(matcher) == 1
+    finally:
+        matcher.stop()
@@ -0,0 +1,79 @@
+"""State transitions of the MongoDB circuit breaker and its recovery probe."""
+
+import time
+from types import SimpleNamespace
+
+from database import CircuitBreaker, SharedDatabase
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3)
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert not breaker.record_failure()
+    assert not breaker.record_failure()
+    assert breaker.allow_request()
+
+    assert breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.opened_at is not None
+    # Only the failure that opened the breaker reports it.
+    assert not breaker.record_failure()
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+
+    assert not breaker.record_failure()
+    assert breaker.allow_request()
+
+
+def test_success_closes_an_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record_failure()
+
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 0
+    assert breaker.opened_at is None
+    assert breaker.allow_request()
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_shared_database_falls_back_while_open_and_probe_closes_it():
+    shared = SharedDatabase(mongo_uri="mongodb://unreachable", failure_threshold=2, probe_interval=0.01)
+    mongo_up = False
+    connects = []
+
+    def connect():
+        connects.append(1)
+        if not mongo_up:
+            raise ConnectionError("no server")
+        return SimpleNamespace(db="vira_engine", close_connection=lambda: None)
+
+    shared._connect = connect
+
+    assert shared.get_db() is None
+    assert shared.get_db() is None
+    assert shared.breaker.state == CircuitBreaker.OPEN
+
+    # While open, requests skip MongoDB without trying to connect.
+    attempts = len(connects)
+    assert shared.get_db() is None
+    assert len(connects) == attempts
+
+    mongo_up = True
+    assert wait_until(lambda: shared.breaker.allow_request())
+    assert shared.get_db() == "vira_engine"
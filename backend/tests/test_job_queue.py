@@ -0,0 +1,151 @@
+"""Lease, retry, expiry and dead-letter behaviour of the analysis job queue."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+from job_queue import (
+    DEAD_LETTER_COLLECTION, DEAD_LETTERED, FAILED, JOBS_COLLECTION, QUEUED, RUNNING, SUCCEEDED, JobQueue, JobWorker
+)
+from stubs import InMemoryDatabase
+
+
+@pytest.fixture
+def db():
+    return InMemoryDatabase()
+
+
+@pytest.fixture
+def queue():
+    return JobQueue(visibility_timeout=60, max_attempts=2, retry_backoff=10, result_ttl=3600)
+
+
+def stored(db, job):
+    return db[JOBS_COLLECTION].find_one({"_id": job["_id"]})
+
+
+def expire_lease(db, job):
+    db[JOBS_COLLECTION].update_one({"_id": job["_id"]}, {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+
+
+def test_claim_leases_the_job_to_one_worker(db, queue):
+    job = queue.enqueue(db, "NGA-001")
+
+    claimed = queue.claim(db, "worker-a")
+
+    assert claimed["_id"] == job["_id"]
+    assert claimed["status"] == RUNNING
+    assert claimed["attempts"] == 1
+    assert claimed["worker_id"] == "worker-a"
+    assert claimed["lease_expires_at"] > datetime.utcnow() + timedelta(seconds=55)
+    assert queue.claim(db, "worker-b") is None
+
+
+def test_enqueue_returns_the_active_job_for_the_same_token(db, queue):
+    first = queue.enqueue(db, "NGA-001")
+    queue.claim(db, "worker-a")
+
+    assert queue.enqueue(db, "NGA-001")["_id"] == first["_id"]
+    assert db[JOBS_COLLECTION].count_documents({}) == 1
+
+
+def test_renewing_the_lease_extends_it(db, queue):
+    queue.enqueue(db, "NGA-001")
+    claimed = queue.claim(db, "worker-a")
+    db[JOBS_COLLECTION].update_one({"_id": claimed["_id"]}, {"$set": {"lease_expires_at": datetime.utcnow()}})
+
+    assert queue.renew_lease(db, claimed)
+    assert stored(db, claimed)["lease_expires_at"] > datetime.utcnow() + timedelta(seconds=55)
+
+
+def test_expired_lease_is_reclaimed_and_the_old_worker_loses_it(db, queue):
+    queue.enqueue(db, "NGA-001")
+    first = queue.claim(db, "worker-a")
+    expire_lease(db, first)
+
+    second = queue.claim(db, "worker-b")
+
+    assert second["_id"] == first["_id"]
+    assert second["attempts"] == 2
+    assert second["lease_token"] != first["lease_token"]
+    # The first worker's late writes no longer match the job.
+    assert not queue.renew_lease(db, first)
+    assert not queue.complete(db, first, {"status": "Success"})
+    assert queue.complete(db, second, {"status": "Success"})
+    assert stored(db, second)["status"] == SUCCEEDED
+
+
+def test_lease_expiring_on_the_final_attempt_dead_letters_the_job(db, queue):
+    queue.enqueue(db, "NGA-001")
+    for worker in ("worker-a", "worker-b"):
+        job = queue.claim(db, worker)
+        expire_lease(db, job)
+
+    assert queue.claim(db, "worker-c") is None
+    assert stored(db, job)["status"] == DEAD_LETTERED
+    assert db[DEAD_LETTER_COLLECTION].find_one({"_id": job["_id"]}) is not None
+
+
+def test_failed_attempt_is_retried_after_the_backoff(db, queue):
+    queue.enqueue(db, "NGA-001")
+    job = queue.claim(db, "worker-a")
+
+    assert queue.fail(db, job, "Gemini timed out")
+
+    retried = stored(db, job)
+    assert retried["status"] == QUEUED
+    assert retried["last_error"] == "Gemini timed out"
+    assert retried["available_at"] > datetime.utcnow() + timedelta(seconds=9)
+    assert "lease_token" not in retried
+    assert queue.claim(db, "worker-b") is None
+
+    db[JOBS_COLLECTION].update_one({"_id": job["_id"]}, {"$set": {"available_at": datetime.utcnow()}})
+    assert queue.claim(db, "worker-b")["attempts"] == 2
+
+
+def test_failing_the_last_attempt_dead_letters_the_job(db, queue):
+    queue.enqueue(db, "NGA-001")
+    job = queue.claim(db, "worker-a")
+    queue.fail(db, job, "boom")
+    db[JOBS_COLLECTION].update_one({"_id": job["_id"]}, {"$set": {"available_at": datetime.utcnow()}})
+    job = queue.claim(db, "worker-a")
+
+    assert queue.fail(db, job, "boom again")
+    assert stored(db, job)["status"] == DEAD_LETTERED
+    assert db[DEAD_LETTER_COLLECTION].find_one({"_id": job["_id"]})["error"] == "boom again"
+
+
+def test_permanent_failure_is_not_retried(db, queue):
+    queue.enqueue(db, "NGA-404")
+    job = queue.claim(db, "worker-a")
+
+    assert queue.fail(db, job, "not found", retryable=False)
+    assert stored(db, job)["status"] == FAILED
+    assert queue.claim(db, "worker-a") is None
+
+
+def test_finished_job_expires_and_frees_the_token(db, queue):
+    first = queue.enqueue(db, "NGA-001")
+    job = queue.claim(db, "worker-a")
+    queue.complete(db, job, {"status": "Success"})
+
+    finished = stored(db, job)
+    assert finished["expires_at"] - finished["finished_at"] == timedelta(seconds=3600)
+    assert "active" not in finished
+    assert queue.enqueue(db, "NGA-001")["_id"] != first["_id"]
+
+
+def test_worker_survives_mongodb_errors_when_recording_the_outcome(db, queue, monkeypatch):
+    def unreachable(*args, **kwargs):
+        raise AutoReconnect("primary stepped down")
+
+    worker = JobWorker(queue=queue, handler=lambda token_id: {"status": "Success"})
+    queue.enqueue(db, "NGA-001")
+    job = queue.claim(db, "worker-a")
+    monkeypatch.setattr(queue, "complete", unreachable)
+
+    worker.process(db, job)
+
+    # The job keeps its lease until it expires and another worker claims it.
+    assert stored(db, job)["status"] == RUNNING
@@ -0,0 +1,64 @@
+"""Incremental sync and periodic rebuild of the owner -> alert links."""
+
+from datetime import datetime, timedelta
+
+from owner_alert_links import INGEST_STATE_COLLECTION, OWNER_ALERT_LINKS_COLLECTION, OwnerAlertLinker, get_linked_alerts
+from stubs import InMemoryDatabase
+
+
+def alert(alert_id, summary):
+    return {"_id": alert_id, "alert_id": alert_id, "date": "2024-01-01", "source": "Gazette",
+            "category": "Legal Notice", "headline": "Notice", "summary": summary}
+
+
+def linked_ids(db, owner_name):
+    return sorted(a["alert_id"] for a in get_linked_alerts(db, owner_name) or [])
+
+
+def setup_db():
+    db = InMemoryDatabase()
+    db["land_registry"].insert_many([{"owner_name": "Adaeze Okafor"}, {"owner_name": "Tunde Bakare"}])
+    db["news_alerts"].insert_one(alert("A-1", "Suit filed against Adaeze Okafor"))
+    return db
+
+
+def test_sync_links_new_alerts_after_the_first_build():
+    db = setup_db()
+    linker = OwnerAlertLinker(sync_interval=0, rebuild_interval=600)
+    linker.sync(db, force=True)
+    assert linked_ids(db, "Adaeze Okafor") == ["A-1"]
+
+    db["news_alerts"].insert_one(alert("A-2", "Lien registered against Tunde Bakare"))
+    assert linker.sync(db, force=True) == 1
+    assert linked_ids(db, "Tunde Bakare") == ["A-2"]
+
+
+def test_periodic_rebuild_picks_up_edited_and_deleted_alerts():
+    db = setup_db()
+    db["news_alerts"].insert_one(alert("A-2", "Lien registered against Tunde Bakare"))
+    linker = OwnerAlertLinker(sync_interval=0, rebuild_interval=600)
+    linker.sync(db, force=True)
+
+    db["news_alerts"].update_one({"_id": "A-1"}, {"$set": {"summary": "Suit filed against Tunde Bakare"}})
+    db["news_alerts"].delete_many({"_id": "A-2"})
+    linker.sync(db, force=True)
+    # Not due yet: the watermark cannot see edits or deletions.
+    assert linked_ids(db, "Adaeze Okafor") == ["A-1"]
+
+    db[INGEST_STATE_COLLECTION].update_one(
+        {"_id": OWNER_ALERT_LINKS_COLLECTION}, {"$set": {"rebuilt_at": datetime.utcnow() - timedelta(seconds=601)}}
+    )
+    linker.sync(db, force=True)
+    assert linked_ids(db, "Adaeze Okafor") == []
+    assert linked_ids(db, "Tunde Bakare") == ["A-1"]
+
+
+def test_rebuild_drops_owners_no_longer_in_the_registry():
+    db = setup_db()
+    linker = OwnerAlertLinker(sync_interval=0)
+    linker.rebuild(db)
+    db["land_registry"].delete_many({"owner_name": "Adaeze Okafor"})
+
+    linker.rebuild(db)
+
+    assert get_linked_alerts(db, "Adaeze Okafor") is None
@@ -0,0 +1,46 @@
+"""Merkle proof batch ids and sharing sealed batches between workers."""
+
+import time
+
+from proof_registry import PROOF_BATCHES_COLLECTION, ProofRegistry
+from stubs import InMemoryDatabase
+from zk_proof_simulator import ProofBatcher, verify_inclusion
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def report(i):
+    return {"property_id": f"NGA-{i:03d}", "risk_score": i, "risk_category": "No Risk Found"}
+
+
+def test_batchers_in_different_processes_do_not_share_batch_ids():
+    first, second = ProofBatcher(window_seconds=0), ProofBatcher(window_seconds=0)
+
+    assert first.add(report(1))["batch_id"] != second.add(report(1))["batch_id"]
+
+
+def test_sealed_batch_is_served_by_another_worker():
+    db = InMemoryDatabase()
+    registry = ProofRegistry(persistent=True)
+    registry._collection = lambda name: db[name]
+    batcher = ProofBatcher(window_seconds=0, on_seal=registry.register_batch)
+    leaves = [batcher.add(report(i)) for i in range(5)]
+    sealed = batcher.seal()
+    assert wait_until(lambda: db[PROOF_BATCHES_COLLECTION].find_one({"_id": sealed.batch_id}) is not None)
+
+    # A worker that never saw the batch rebuilds it from MongoDB.
+    other_worker = ProofRegistry(persistent=True)
+    other_worker._collection = lambda name: db[name]
+    restored = other_worker.get_batch(sealed.batch_id)
+
+    assert restored.root == sealed.root
+    proof = restored.inclusion_proof(leaves[3]["leaf_index"])
+    assert proof == sealed.inclusion_proof(leaves[3]["leaf_index"])
+    assert verify_inclusion(leaves[3]["leaf_hash"], proof["path"], sealed.root)
@@ -0,0 +1,43 @@
+"""Refresh lease between API workers and the popularity shared through MongoDB."""
+
+from datetime import datetime, timedelta
+
+from owner_alert_links import INGEST_STATE_COLLECTION
+from refresh_service import REFRESH_LEASE_ID, RefreshService
+from stubs import InMemoryDatabase
+
+
+def service(worker_id, **kwargs):
+    return RefreshService(analyze=lambda token_id: {"status": "Success"}, worker_id=worker_id, **kwargs)
+
+
+def test_one_worker_holds_the_refresh_lease_until_it_expires():
+    db = InMemoryDatabase()
+    first, second = service("api-1"), service("api-2")
+
+    assert first._claim_lease(db)
+    assert not second._claim_lease(db)
+    assert first._claim_lease(db)  # renewal
+
+    db[INGEST_STATE_COLLECTION].update_one(
+        {"_id": REFRESH_LEASE_ID}, {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+    )
+    assert second._claim_lease(db)
+    assert not first._claim_lease(db)
+
+
+def test_only_popular_tokens_are_warmed_counting_every_worker():
+    db = InMemoryDatabase()
+    leader, other = service("api-1", min_popularity=1.5), service("api-2")
+    for token_id in ("NGA-001", "NGA-002", "NGA-003"):
+        leader.index.set_token(token_id, None, None)
+    leader.record_request("NGA-001")
+    for _ in range(2):
+        other.record_request("NGA-002")
+    other.record_request("NGA-001")
+
+    other._publish_popularity(db)
+    leader._load_popularity(db)
+
+    assert sorted(leader.popular_tokens()) == ["NGA-001", "NGA-002"]
+    assert leader.enqueue(leader.popular_tokens(), "sweep") == 2